@@ -0,0 +1,91 @@
+import hashlib
+import json
+import threading
+
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Hashable, Iterable, Optional
+
+from src.ba_ragmas_chatbot import logger_config
+from src.ba_ragmas_chatbot.cache import TTLCache
+
+
+# the conversation history is part of every task prompt and private to its user, so it has to match exactly
+EXACT_INPUTS = ("history",)
+
+
+@dataclass
+class RunningArticle:
+    """A generation job, the chat that submitted it and the chats waiting for its article."""
+    job: Future
+    owner: Hashable
+    waiters: set = field(default_factory=set)
+
+
+class ArticleCache:
+    """Caches finished blog articles by their configuration and the content of their sources, and coalesces
+    identical generations that are running at the same time into one job, which runs as long as a chat waits for it."""
+
+    def __init__(self, max_entries: int = 256, ttl: Optional[float] = None, path: Optional[str] = None):
+        self.articles = TTLCache(max_entries=max_entries, ttl=ttl, path=path)
+        self.coalesced = 0
+        self._in_flight: dict[str, RunningArticle] = {}
+        self._waiting: dict[Hashable, str] = {}
+        self._lock = threading.Lock()
+        self.logger = logger_config.get_logger("article cache")
+
+    @staticmethod
+    def key(inputs: dict, source_keys: Iterable[str]) -> str:
+        """Returns the cache key of a configuration, ignoring case and spacing of the answers and the order of the sources.
+        The conversation history takes part as it is, so an article is only reused for the same history."""
+        normalized = {name: str(value) if name in EXACT_INPUTS else " ".join(str(value).split()).casefold() for name, value in inputs.items()}
+        payload = json.dumps({"inputs": normalized, "sources": sorted(set(source_keys))}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached article, or None."""
+        return self.articles.get(key)
+
+    def join(self, key: str, chat_id: Hashable) -> Optional[Future]:
+        """Returns the job that is currently generating this article and adds the chat to its waiters, or None."""
+        with self._lock:
+            running = self._in_flight.get(key)
+            if running is None:
+                return None
+            self.coalesced += 1
+            running.waiters.add(chat_id)
+            self._waiting[chat_id] = key
+            return running.job
+
+    def track(self, key: str, job: Future, chat_id: Hashable):
+        """Registers a running job of the chat, so identical requests can join it, and caches its article once it succeeds."""
+        with self._lock:
+            self._in_flight[key] = RunningArticle(job, chat_id, {chat_id})
+            self._waiting[chat_id] = key
+        job.add_done_callback(lambda done: self._finish(key, done))
+
+    def leave(self, chat_id: Hashable) -> Optional[Hashable]:
+        """Removes the chat from the waiters of its job. Returns the chat that submitted the job if no chat waits
+        for it anymore, so it can be cancelled, or None if other chats still wait for the article."""
+        with self._lock:
+            key = self._waiting.pop(chat_id, None)
+            running = self._in_flight.get(key)
+            if running is None:
+                return None
+            running.waiters.discard(chat_id)
+            if running.waiters:
+                self.logger.info(f"leave: Chat {chat_id} left article {key[:12]}, {len(running.waiters)} chats still wait for it.")
+                return None
+            return running.owner
+
+    def _finish(self, key: str, job: Future):
+        with self._lock:
+            running = self._in_flight.get(key)
+            if running is not None and running.job is job:
+                del self._in_flight[key]
+                for chat_id in running.waiters:
+                    if self._waiting.get(chat_id) == key:
+                        del self._waiting[chat_id]
+        if not job.cancelled() and job.exception() is None:
+            self.articles.set(key, str(job.result()))
+            self.logger.info(f"_finish: Article {key[:12]} cached.")
@@ -0,0 +1,53 @@
+import math
+import re
+
+from collections import Counter
+from typing import Sequence
+
+import numpy as np
+
+
+WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits a text into lowercase words."""
+    return WORD.findall(text.casefold())
+
+
+class InvertedIndex:
+    """Inverted index of the chunks of one source: for every word, the chunks it occurs in and how often.
+    Indexes of several sources can be searched together, as the BM25 statistics are combined at query time."""
+
+    def __init__(self, chunks: Sequence[str]):
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        lengths = []
+        for position, chunk in enumerate(chunks):
+            words = tokenize(chunk)
+            lengths.append(len(words))
+            for word, count in Counter(words).items():
+                self.postings.setdefault(word, []).append((position, count))
+        self.lengths = np.asarray(lengths, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+
+def bm25_scores(query: str, indexes: Sequence[InvertedIndex], k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """Returns the BM25 score of every chunk of the indexes for the query, in the order of the indexes and their chunks."""
+    total = sum(len(index) for index in indexes)
+    scores = np.zeros(total, dtype=np.float32)
+    if not total:
+        return scores
+    average_length = max(float(sum(index.lengths.sum() for index in indexes)) / total, 1.0)
+    offsets = np.cumsum([0] + [len(index) for index in indexes[:-1]])
+    for word in set(tokenize(query)):
+        frequency = sum(len(index.postings.get(word, ())) for index in indexes)
+        if not frequency:
+            continue
+        idf = math.log((total - frequency + 0.5) / (frequency + 0.5) + 1)
+        for offset, index in zip(offsets, indexes):
+            for position, count in index.postings.get(word, ()):
+                length = index.lengths[position]
+                scores[offset + position] += idf * count * (k1 + 1) / (count + k1 * (1 - b + b * length / average_length))
+    return scores
@@ -0,0 +1,146 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from src.ba_ragmas_chatbot import logger_config
+from src.ba_ragmas_chatbot.file_lock import file_lock
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ttl seconds after they were set.
+    If a path is given, the entries are persisted as JSON, so keys must be strings and values JSON serializable.
+    Changes are written behind, at most flush_interval seconds after they were made and when the process exits,
+    so get and set never wait for the file. Several processes can persist to the same path, every save merges the
+    entries the others saved."""
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None, path: Optional[str] = None, flush_interval: float = 5):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.flush_interval = flush_interval
+        self.hits = 0
+        self.misses = 0
+        self.logger = logger_config.get_logger("cache")
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._replace = False
+        self._timer: Optional[threading.Timer] = None
+        if self.path:
+            self._load()
+            atexit.register(self.flush)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the cached value, or default if the key is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry):
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        """Caches the value, evicting the least recently used entries if the cache is full."""
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._changed()
+
+    def items(self) -> list[tuple[Hashable, Any]]:
+        """Returns a snapshot of all entries that are not expired, from least to most recently used."""
+        with self._lock:
+            return [(key, value) for key, (created, value) in self._entries.items() if not self._expired((created, value))]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            # the saved entries are replaced instead of merged, so they do not come back
+            self._replace = True
+            self._changed()
+
+    def flush(self):
+        """Writes the changes to the path now, if there are any."""
+        with self._save_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+            self._save()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _expired(self, entry: tuple[float, Any]) -> bool:
+        return self.ttl is not None and time.time() - entry[0] > self.ttl
+
+    def _changed(self):
+        """Marks the entries as changed and schedules a flush, called while holding the lock."""
+        if not self.path:
+            return
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _load(self):
+        self._merge(self._read())
+
+    def _read(self) -> list:
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return []
+
+    def _merge(self, entries: list):
+        """Takes over the saved entries this cache does not know as the least recently used ones,
+        and the saved values that are newer than its own."""
+        merged = OrderedDict()
+        for key, created, value in entries:
+            own = self._entries.get(key)
+            if own is None and not self._expired((created, value)):
+                merged[key] = (created, value)
+            elif own is not None and created > own[0]:
+                self._entries[key] = (created, value)
+        merged.update(self._entries)
+        self._entries = merged
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self):
+        """Merges the entries other processes saved, then writes them in LRU order to a temporary file first,
+        so a crash never leaves a broken file behind. The file is read and written without holding the lock."""
+        try:
+            with file_lock(self.path):
+                saved = self._read()
+                with self._lock:
+                    if not self._replace:
+                        self._merge(saved)
+                    self._replace = False
+                    entries = [[key, created, value] for key, (created, value) in self._entries.items()]
+                self._write(entries)
+        except (OSError, TypeError) as e:
+            self.logger.warning(f"_save: Cache could not be persisted to {self.path}: {str(e)}")
+
+    def _write(self, entries: list):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(entries, file)
+        os.replace(temp_path, self.path)
@@ -1,14 +1,35 @@
+import asyncio
 import os
-import shutil
-import yaml
+
+from concurrent.futures import Future
+from typing import Optional
 
 from crewai_tools.tools import DOCXSearchTool, PDFSearchTool, TXTSearchTool, WebsiteSearchTool
 from telegram import Update
-from telegram.error import BadRequest
-from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters, CallbackContext, ConversationHandler
+from telegram.constants import ParseMode
+from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters, CallbackContext, ConversationHandler, TypeHandler
 from langchain_ollama import OllamaLLM
+from ollama import Client
 from src.ba_ragmas_chatbot import logger_config
-from src.ba_ragmas_chatbot.crew import BaRagmasChatbot
+from src.ba_ragmas_chatbot.article_cache import ArticleCache
+from src.ba_ragmas_chatbot.configuration import get_configuration, reset_configuration
+from src.ba_ragmas_chatbot.crew import get_crew_factory, kickoff_crew
+from src.ba_ragmas_chatbot.document_storage import DocumentStorage, DocumentTooLarge
+from src.ba_ragmas_chatbot.embedding_store import EmbeddingStore
+from src.ba_ragmas_chatbot.generation_executor import GenerationExecutor, JobAlreadyRunning, JobCancelled
+from src.ba_ragmas_chatbot.history import ASSISTANT, USER, HistoryManager
+from src.ba_ragmas_chatbot.ingestion import ChatProgress, IngestionJobs, IngestionPipeline
+from src.ba_ragmas_chatbot.message_streamer import MessageStreamer
+from src.ba_ragmas_chatbot.persistence import SharedConversationHandler, SQLitePersistence
+from src.ba_ragmas_chatbot.response_cache import ResponseCache
+from src.ba_ragmas_chatbot.send_queue import SendQueue
+from src.ba_ragmas_chatbot.source_catalog import SourceCatalog
+from src.ba_ragmas_chatbot.settings import SettingsError, get_settings
+from src.ba_ragmas_chatbot.task_progress import TaskProgress
+from src.ba_ragmas_chatbot.tool_registry import ToolRegistry
+from src.ba_ragmas_chatbot.tools.hybrid_search_tool import HybridSearchTool
+from src.ba_ragmas_chatbot.tools.store_adapter import StoreAdapter
+from src.ba_ragmas_chatbot.update_processor import ChatUpdateProcessor
 
 
 class TelegramBot:
@@ -18,67 +39,105 @@ class TelegramBot:
         "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
         "text/plain",
     ]
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    yaml_file = os.path.join(current_dir, "config", "configs.yaml")
-    with open(yaml_file, 'r') as file:
-        config = yaml.safe_load(file)
-    token = config['chatbot_token']['token']
-    llm_name = config['chatbot']['llm']['name']
-    llm_provider = config['chatbot']['llm']['provider_name']
-    llm_url = config['chatbot']['llm']['url']
-    embed_model_name = config['chatbot']['embedding_model']['name']
-    embed_model_provider = config['chatbot']['embedding_model']['provider_name']
-    embed_model_url = config['chatbot']['embedding_model']['url']
-
-    tools = []
+    settings = get_settings()
+    token = settings.chatbot_token.token
+    llm_name = settings.chatbot.llm.name
+    llm_provider = settings.chatbot.llm.provider_name
+    llm_url = settings.chatbot.llm.url
+    streaming = settings.chatbot.streaming
+    embed_model_name = settings.chatbot.embedding_model.name
+    embed_model_provider = settings.chatbot.embedding_model.provider_name
+    embed_model_url = settings.chatbot.embedding_model.url
+
+    catalog = SourceCatalog()
+    registry = ToolRegistry(idle_timeout=settings.tool_registry.idle_timeout, max_memory_mb=settings.tool_registry.max_memory_mb, on_remove=catalog.release)
     ai = OllamaLLM(model=llm_name)
+    history = HistoryManager(ai, settings.history.chat_budget, settings.history.crew_budget, settings.history.summary_budget)
+    embedder = Client(host=embed_model_url)
+    responses = ResponseCache(
+        embedder=embedder if settings.chatbot.response_cache.semantic else None,
+        model=embed_model_name,
+        max_entries=settings.chatbot.response_cache.max_entries,
+        ttl=settings.chatbot.response_cache.ttl,
+        similarity_threshold=settings.chatbot.response_cache.similarity_threshold,
+    ) if settings.chatbot.response_cache.enabled else None
+    ingestions = IngestionJobs()
+    pipeline = IngestionPipeline(embedder, embed_model_name, batch_size=settings.ingestion.batch_size, max_in_flight=settings.ingestion.max_in_flight)
+    store = EmbeddingStore(
+        path=settings.embedding_store.path,
+        embedder=f"{embed_model_provider}/{embed_model_name}",
+        chunk_size=settings.embedding_store.chunk_size,
+        chunk_overlap=settings.embedding_store.chunk_overlap,
+        max_size_mb=settings.embedding_store.max_size_mb,
+        max_age_days=settings.embedding_store.max_age_days,
+    )
+    documents = DocumentStorage(
+        path=settings.document_storage.path,
+        max_size_mb=settings.document_storage.max_file_size_mb,
+        max_age_days=settings.document_storage.max_age_days,
+    )
     logger = logger_config.get_logger('telegram bot')
-    retry = False
-
-    def clear_db(self):
-        """Deletes all database files related to ChromaDB."""
-        db_folder = "./db"
-        if os.path.exists(db_folder):
-            shutil.rmtree(db_folder)
-        os.makedirs(db_folder)
+    generator = GenerationExecutor(max_workers=settings.generation.max_workers)
+    waiting = {}
+    articles = ArticleCache(max_entries=settings.generation.cache.max_entries, ttl=settings.generation.cache.ttl, path=settings.generation.cache.path)
+    sender = SendQueue(
+        global_rate=settings.send_queue.global_rate,
+        chat_rate=settings.send_queue.chat_rate,
+        chat_burst=settings.send_queue.chat_burst,
+        max_retries=settings.send_queue.max_retries,
+    )
+    persistence = None
+    worker = 0
+
+    async def reply(self, update: Update, text: str, parse_mode: Optional[str] = None):
+        """Replies to the message of the update through the send queue, split into several messages if it is too long."""
+        return await self.sender.reply(update.message, text, parse_mode)
 
     async def chat(self, update: Update, context: CallbackContext):
         """Interaction with the second not-RAG-MAS llm when the blog article configuration is deactivated"""
         response = ""
         try:
             self.logger.debug(f"chat: Function successfully called with message {str(update.message.text)}")
-            context.user_data['history'] = context.user_data.get('history', []) + [update.message.text]
-            history = "\n".join(context.user_data['history'])
-            response = str(self.ai.invoke(history))
-            await update.message.reply_html(response)
+            history = self.history.get(context.user_data)
+            earlier = self.history.for_chat(history)
+            history.add(USER, update.message.text)
+            prompt = self.history.for_chat(history)
+            cached = await self.responses.get(earlier, update.message.text) if self.responses is not None else None
+            if cached is not None:
+                response = cached
+                await self.reply(update, response, ParseMode.HTML)
+                self.logger.debug(f"chat: Query answered from the response cache, {str(self.responses.stats())}")
+            elif self.streaming.enabled:
+                streamer = MessageStreamer(update.message, self.streaming.edit_interval, self.streaming.edit_tokens, self.sender)
+                response = await streamer.stream(self.ai.astream(prompt))
+            else:
+                response = str(await self.ai.ainvoke(prompt))
+                await self.reply(update, response, ParseMode.HTML)
+            if cached is None and self.responses is not None:
+                await self.responses.set(earlier, update.message.text, response)
             self.logger.debug(f"chat: Query successfully answered with {str(response)}")
-            context.user_data['history'].append(str(response))
-            return self.CHAT
-
-        except BadRequest as b:
-            if b.message == "Message is too long":
-                responses = response.split("\n\n")
-                self.logger.warn(f"confirm: Message is too long, split up into small packets by double line.")
-                for response in responses:
-                    await update.message.reply_text(response)
+            history.add(ASSISTANT, str(response))
+            await self.history.compact(history)
             return self.CHAT
 
         except Exception as e:
-            await update.message.reply_text(f"chat: An error occurred: {str(e)}")
+            await self.reply(update, f"chat: An error occurred: {str(e)}")
             return self.CHAT
 
     async def clear(self, update: Update, context: CallbackContext):
         """Clears the conversation and user history, and returns to chat."""
         try:
             context.user_data.clear()
-            context.user_data['history'] = []
-            self.tools.clear()
+            self.history.reset(context.user_data)
+            self.ingestions.cancel(update.effective_chat.id)
+            self.stop_generation(update.effective_chat.id)
+            self.registry.clear(update.effective_chat.id)
             self.logger.info(f"clear: Conversation successfully cleared.")
-            await update.message.reply_text("Conversation successfully cleared! Your conversation was restarted, so please either restart your configuration or chat with the LLM!")
+            await self.reply(update, "Conversation successfully cleared! Your conversation was restarted, so please either restart your configuration or chat with the LLM!")
             return self.CHAT
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. To re-clear the conversation, please send /clear again.")
+            await self.reply(update, f"An error occurred: {str(e)}. To re-clear the conversation, please send /clear again.")
             self.logger.error(f"clear: Tried to clear conversation, but an exception occurred: {str(e)}")
             return self.CHAT
 
@@ -88,32 +147,33 @@ class TelegramBot:
             user = update.effective_user
             self.logger.info(f"start: Conversation successfully started with user {str(user.mention_html())}. ")
             response = f"Hi {user.mention_html()}! This is a chatbot for creating blog articles using RAG and MAS systems! You have two ways of using this chatbot: Either by chatting with a LLM model, or by using the configuring your blog article and generating it using Reality-Augmented Generation and Multi-Agent Systems. When you are ready to start configuration, use /start_configuration. \n\nAfter starting the configuration, you are asked for: \n- topic or a task \n- website \n- document \n- length \n- language level \n- information level \n- language \n- tone \n- additional information \nFinally, you are asked to confirm the configuration and have a chance to change things. \n\nTo get an overview of all chatbot functionalities, use the command /help any time!"
-            await update.message.reply_html(response)
-            context.user_data['history'] = []
+            await self.reply(update, response, ParseMode.HTML)
+            self.history.reset(context.user_data)
             self.logger.debug(f"start: Response message successfully sent. Message: {str(response)}")
             return self.CHAT
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}")
+            await self.reply(update, f"An error occurred: {str(e)}")
             self.logger.error(f"start: Tried to start conversation, but an exception occurred: {str(e)}")
             return self.CHAT
 
     async def start_configuration(self, update:Update, context: ContextTypes.DEFAULT_TYPE):
         """Starts the article configuration"""
         try:
-            await update.message.reply_text(
+            reset_configuration(context.user_data)
+            await self.reply(update, 
                 "Great, you want to start the blog article configuration! First, what topic should the blog article be about? Or what task should the blog article fulfil? If you have a topic please respond with 'topic', if you have a separate task please respond with 'task'.")
             self.logger.debug("start_configuration: Blog article configuration started.")
             return self.TOPIC_OR_TASK
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. To restart the configuration, please send /start_configuration again.")
+            await self.reply(update, f"An error occurred: {str(e)}. To restart the configuration, please send /start_configuration again.")
             self.logger.error(f"start_configuration: Tried to start configuration, but an exception occurred: {str(e)}")
             return self.CHAT
 
     async def help(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            await update.message.reply_text(
+            await self.reply(update, 
                 f"Welcome to the RAG-MAS-Blog-Article-Generator Bot! Here's how to get started:\n"
                 f"1. /start - Restart the conversation.\n"
                 f"2. /start_configuration - Start the blog article configuration.\n"
@@ -125,342 +185,354 @@ class TelegramBot:
             return self.CHAT
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. To get help, please send /help again.")
+            await self.reply(update, f"An error occurred: {str(e)}. To get help, please send /help again.")
             self.logger.error(f"help: Tried to respond with help, but an exception occurred: {str(e)}")
             return self.CHAT
 
     async def topic_or_task(self, update: Update, context: CallbackContext):
         """Manages if the system should write an article on a topic or if it should do a task"""
         try:
+            configuration = get_configuration(context.user_data)
             self.logger.debug(f"topic_or_task: Function successfully called with message {str(update.message.text)}")
             if update.message.text == "topic":
                 response = "Okay, topic it is! What topic should the blog article be about?"
-                await update.message.reply_text(response)
+                await self.reply(update, response)
                 self.logger.debug(f"topic_or_task: Response message successfully sent. Message: {str(response)}")
                 return self.TOPIC
 
             if update.message.text == "task":
                 response = "Okay, task it is! What task should the blog article fulfil?"
-                await update.message.reply_text(response)
+                await self.reply(update, response)
                 self.logger.debug(f"topic_or_task: Response message successfully sent. Message: {str(response)}")
                 return self.TASK
 
-            if update.message.text == "no" and self.retry == True:
+            if update.message.text == "no" and configuration.reconfigure:
                 # a second route for when the user wants to reconfigure their data
                 response = f"Okay, you want to keep your topic or task! Next, do you want to add another link to a website? If yes, please respond with the new link, if not, please respond with 'no'."
-                await update.message.reply_text(response)
+                await self.reply(update, response)
                 self.logger.debug(f"topic_or_task: Reconfiguration response successfully sent. Message: {str(response)}")
                 return self.WEBSITE
 
             else:
                 response = "Not valid, please respond with either 'topic' or 'task'."
-                await update.message.reply_text(response)
+                await self.reply(update, response)
                 self.logger.debug(f"topic_or_task: Response message successfully sent. Message: {str(response)}")
                 return self.TOPIC_OR_TASK
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. \nPlease answer with 'topic' or 'task' again.")
+            await self.reply(update, f"An error occurred: {str(e)}. \nPlease answer with 'topic' or 'task' again.")
             self.logger.error(f"topic_or_task: An exception occurred: {str(e)}")
             return self.TOPIC_OR_TASK
 
     async def topic(self, update: Update, context: CallbackContext):
         """Saves the topic in the user data"""
         try:
+            configuration = get_configuration(context.user_data)
             self.logger.debug(f"topic: Function successfully called with message {str(update.message.text)}")
-            context.user_data['topic'] = update.message.text
+            configuration.topic = update.message.text
             response = "Great! Do you have a link to a website with information you want to have included? If yes, please reply with the link, if not, please just send 'no'."
-            await update.message.reply_text(response)
+            await self.reply(update, response)
             self.logger.debug(f"topic: Response message successfully sent. Message: {str(response)}")
             return self.WEBSITE
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. \nPlease resend your topic.")
+            await self.reply(update, f"An error occurred: {str(e)}. \nPlease resend your topic.")
             self.logger.error(f"topic: An exception occurred: {str(e)}")
             return self.TOPIC
 
     async def task(self, update: Update, context: CallbackContext):
         """Saves the task in the user data"""
         try:
+            configuration = get_configuration(context.user_data)
             self.logger.debug(f"task: Function successfully called with message {str(update.message.text)}")
-            context.user_data['topic'] = update.message.text
+            configuration.topic = update.message.text
             response = "Great! Do you have a link to a website with information you want to have included? If yes, please reply with the link, if not, please just send 'no'."
-            await update.message.reply_text(response)
+            await self.reply(update, response)
             self.logger.debug(f"task: Response message successfully sent. Message: {str(response)}")
             return self.WEBSITE
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. \nPlease resend your task.")
+            await self.reply(update, f"An error occurred: {str(e)}. \nPlease resend your task.")
             self.logger.error(f"task: An exception occurred: {str(e)}")
             return self.TASK
 
     async def website(self, update: Update, context: CallbackContext):
-        """Saves a website link in the user data if one is sent"""
+        """Starts reading a website in the background if a link is sent"""
         try:
+            configuration = get_configuration(context.user_data)
             self.logger.debug(f"website: Function successfully called with message {str(update.message.text)}")
-            if update.message.text == "no" and self.retry == True:
+            if update.message.text == "no" and configuration.reconfigure:
                 # a second route for when the user wants to reconfigure their data
                 response = "Okay, what about a document? If yes, please reply with the document, if not, please respond with 'no'."
-                await update.message.reply_text(response)
+                await self.reply(update, response)
                 self.logger.debug(f"website: Response message successfully sent. Message: {str(response)}")
                 return self.DOCUMENT
 
-            if update.message.text != "no" and self.retry == True:
+            if update.message.text != "no" and configuration.reconfigure:
                 # a second route for when the user wants to reconfigure their data
                 response = "Okay, do you have a another link to a website? If yes, please reply with the website, if not, please respond with 'no'."
-                self.tools.append(self.addWebsite(update.message.text))
-                await update.message.reply_text(response)
+                self.ingestions.start(update.effective_chat.id, update.message.text, self.ingest(update, context, update.message.text, self.addWebsite, update.message.text))
+                await self.reply(update, response)
                 self.logger.debug(f"website: Response message successfully sent. Message: {str(response)}")
                 return self.WEBSITE
 
             if update.message.text.lower() != "no":
-                self.tools.append(self.addWebsite(update.message.text))
+                self.ingestions.start(update.effective_chat.id, update.message.text, self.ingest(update, context, update.message.text, self.addWebsite, update.message.text))
                 response = "Okay, do you have another link to a website with information you want to have included? If yes, please reply with the link, if not, please just send 'no'."
-                await update.message.reply_text(response)
+                await self.reply(update, response)
                 self.logger.debug(f"website: Response message successfully sent. Message: {str(response)}")
                 return self.WEBSITE
 
             response = "Great! Do you have a document with information you want to have included? If yes, please reply with the document, if not, please just send 'no'."
-            await update.message.reply_text(response)
+            await self.reply(update, response)
             self.logger.debug(f"website: Response message successfully sent. Message: {str(response)}")
             return self.DOCUMENT
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. \nPlease resend your link or 'no'.")
+            await self.reply(update, f"An error occurred: {str(e)}. \nPlease resend your link or 'no'.")
             self.logger.error(f"website: An exception occurred: {str(e)}")
             return self.WEBSITE
 
     async def document(self, update: Update, context: CallbackContext):
-        """Saves a document in the 'documents' folder and the storage link in the user data if one is sent"""
+        """Starts downloading a document into the document storage and reading it in the background if one is sent"""
         try:
+            configuration = get_configuration(context.user_data)
             self.logger.debug(f"document: Function successfully called.")
             document = update.message.document
-            file_path = ""
             if document:
                 if document.mime_type not in self.VALID_MIME_TYPES:
-                    await update.message.reply_text(
+                    await self.reply(update, 
                         f"Unsupported file type: {document.mime_type}. \nPlease upload a valid document (PDF, Word, TXT)."
                     )
                     return self.DOCUMENT
+                try:
+                    # checked before the download, telegram tells the size of the document with the message
+                    self.documents.check_size(document.file_size)
+                except DocumentTooLarge as e:
+                    await self.reply(update, f"{str(e)} \nPlease send a smaller document or 'no'.")
+                    self.logger.debug(f"document: Document rejected: {str(e)}")
+                    return self.DOCUMENT
 
-                base_dir = os.path.dirname(__file__)
-                file_path = os.path.join(base_dir, "documents", document.file_name)
-                self.logger.debug(f"document: File saved at: {str(file_path)}")
                 file_id = document.file_id
                 self.logger.debug(f"document: File_id: {str(file_id)}")
-                file = await context.bot.get_file(file_id)
-                await file.download_to_drive(file_path)
 
                 match document.mime_type:
                     case "application/pdf":
-                        self.addPDF(file_path)
+                        add = self.addPDF
                     case "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                        self.addDOCX(file_path)
+                        add = self.addDOCX
                     case "text/plain":
-                        self.addTxt(file_path)
+                        add = self.addTxt
                     case _:
-                        await update.message.reply_text("Invalid file type, only acceptable file endings are: PDF, TXT and DOXC. Please convert and send your document again.")
+                        await self.reply(update, "Invalid file type, only acceptable file endings are: PDF, TXT and DOXC. Please convert and send your document again.")
                         self.logger.warn(f"document: Invalid file type sent: {str(document.mime_type)}")
                         return self.DOCUMENT
 
+                self.ingestions.start(update.effective_chat.id, document.file_name, self.ingest(update, context, document.file_name, add, None, file_id))
                 self.logger.debug(f"document: File Mime Type: {str(document.mime_type)}")
             response = "Do you have another document you want to upload? If yes, please reply with the document, if not, please just send 'no'."
-            if self.retry:
+            if configuration.reconfigure:
                 # a second route for when the user wants to reconfigure their data
                 response = "Do you have another document you want to upload? If yes, please reply with the document, if not, please respond with 'no'."
-            await update.message.reply_text(response)
+            await self.reply(update, response)
             self.logger.debug(f"document: Response message successfully sent. Message: {str(response)}")
             return self.DOCUMENT
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. \nPlease resend your document or 'no'.")
+            await self.reply(update, f"An error occurred: {str(e)}. \nPlease resend your document or 'no'.")
             self.logger.error(f"document: An exception occurred: {str(e)}")
             return self.DOCUMENT
 
     async def no_document(self, update: Update, context: CallbackContext):
         """Manages what happens when no document is sent"""
         try:
+            configuration = get_configuration(context.user_data)
             self.logger.debug(f"no_document: Function successfully called with message {str(update.message.text)}")
-            if update.message.text == "no" and self.retry == True:
+            if update.message.text == "no" and configuration.reconfigure:
                 # a second route for when the user wants to reconfigure their data
                 response = "Next, do you want to change your blog article length? If yes, please reply with the new length, if not, please respond with 'no'."
-                await update.message.reply_text(response)
+                await self.reply(update, response)
                 self.logger.debug(f"no_document: Response message successfully sent. Message: {str(response)}")
                 return self.LENGTH
 
             if update.message.text.lower() != "no":
                 response = "Not valid, please respond with either a document or 'no'."
-                await update.message.reply_text(response)
+                await self.reply(update, response)
                 self.logger.debug(f"no_document: Response message successfully sent. Message: {str(response)}")
                 return self.DOCUMENT
 
             response = "How long should the blog article be? (e.g. Short, Medium, Long)"
-            await update.message.reply_text(response)
+            await self.reply(update, response)
             self.logger.debug(f"no_document: Response message successfully sent. Message: {str(response)}")
             return self.LENGTH
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. \nPlease resend your document or 'no'.")
+            await self.reply(update, f"An error occurred: {str(e)}. \nPlease resend your document or 'no'.")
             self.logger.error(f"no_document: An exception occurred: {str(e)}")
             return self.DOCUMENT
 
     async def length(self, update: Update, context: CallbackContext):
         """Saves the configured length in the user data"""
         try:
-            if self.retry:
+            configuration = get_configuration(context.user_data)
+            if configuration.reconfigure:
                 #a second route for when the user wants to reconfigure their data
                 self.logger.debug(
                     f"length: Function successfully called with message {str(update.message.text)}")
                 if update.message.text != "no":
-                    context.user_data['length'] = update.message.text
+                    configuration.length = update.message.text
                 response = "Next, do you want to change your blog article language level? If yes, please reply with the new language level, if not, please respond with 'no'."
-                await update.message.reply_text(response)
+                await self.reply(update, response)
                 self.logger.debug(f"length: Response message successfully sent. Message: {str(response)}")
                 return self.LANGUAGE_LEVEL
 
             self.logger.debug(f"length: Function successfully called with message {str(update.message.text)}")
-            context.user_data['length'] = update.message.text
+            configuration.length = update.message.text
             response = "Great! What language level should it be? (e.g. Beginner, Intermediate, Advanced)"
-            await update.message.reply_text(response)
+            await self.reply(update, response)
             self.logger.debug(f"length: Response message successfully sent. Message: {str(response)}")
             return self.LANGUAGE_LEVEL
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. \nPlease resend your preferred article length.")
+            await self.reply(update, f"An error occurred: {str(e)}. \nPlease resend your preferred article length.")
             self.logger.error(f"length: An exception occurred: {str(e)}")
             return self.LENGTH
 
     async def language_level(self, update: Update, context: CallbackContext):
         """Saves the configured language level in the user data"""
         try:
-            if self.retry:
+            configuration = get_configuration(context.user_data)
+            if configuration.reconfigure:
                 # a second route for when the user wants to reconfigure their data
                 self.logger.debug(
                     f"language level: Function successfully called with message {str(update.message.text)}")
                 if update.message.text != "no":
-                    context.user_data['language_level'] = update.message.text
+                    configuration.language_level = update.message.text
                 response = "Next, do you want to change your blog article information level? If yes, please reply with the new information level, if not, please respond with 'no'."
-                await update.message.reply_text(response)
+                await self.reply(update, response)
                 self.logger.debug(f"language_level: Response message successfully sent. Message: {str(response)}")
                 return self.INFORMATION
 
             self.logger.debug(f"language_level: Function successfully called with message {str(update.message.text)}")
-            context.user_data['language_level'] = update.message.text
+            configuration.language_level = update.message.text
             response = "Great! What information level should it be? (e.g. High, Intermediate, Low)"
-            await update.message.reply_text(response)
+            await self.reply(update, response)
             self.logger.debug(f"language_level: Response message successfully sent. Message: {str(response)}")
             return self.INFORMATION
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. \nPlease resend your preferred article language level.")
+            await self.reply(update, f"An error occurred: {str(e)}. \nPlease resend your preferred article language level.")
             self.logger.error(f"language_level: An exception occurred: {str(e)}")
             return self.LANGUAGE_LEVEL
 
     async def information(self, update: Update, context: CallbackContext):
         """Saves the configured information level in the user data"""
         try:
-            if self.retry:
+            configuration = get_configuration(context.user_data)
+            if configuration.reconfigure:
                 # a second route for when the user wants to reconfigure their data
                 self.logger.debug(
                     f"information: Function successfully called with message {str(update.message.text)}")
                 if update.message.text != "no":
-                    context.user_data['information'] = update.message.text
+                    configuration.information = update.message.text
                 response = "Next, do you want to change your blog article language? If yes, please reply with the new language, if not, please respond with 'no'."
-                await update.message.reply_text(response)
+                await self.reply(update, response)
                 self.logger.debug(f"information: Response message successfully sent. Message: {str(response)}")
                 return self.LANGUAGE
 
             self.logger.debug(f"information: Function successfully called with message {str(update.message.text)}")
-            context.user_data['information'] = update.message.text
+            configuration.information = update.message.text
             response = "Great! What language should it be? (e.g. English, German, Spanish)"
-            await update.message.reply_text(response)
+            await self.reply(update, response)
             self.logger.debug(f"information: Response message successfully sent. Message: {str(response)}")
             return self.LANGUAGE
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. \nPlease resend your preferred article information level.")
+            await self.reply(update, f"An error occurred: {str(e)}. \nPlease resend your preferred article information level.")
             self.logger.error(f"information: An exception occurred: {str(e)}")
             return self.INFORMATION
 
     async def language(self, update: Update, context: CallbackContext):
         """Saves the configured language in the user data"""
         try:
-            if self.retry:
+            configuration = get_configuration(context.user_data)
+            if configuration.reconfigure:
                 # a second route for when the user wants to reconfigure their data
                 self.logger.debug(
                     f"language: Function successfully called with message {str(update.message.text)}")
                 if update.message.text != "no":
-                    context.user_data['language'] = update.message.text
+                    configuration.language = update.message.text
                 response = "Next, do you want to change your blog article tone? If yes, please reply with the new tone, if not, please respond with 'no'."
-                await update.message.reply_text(response)
+                await self.reply(update, response)
                 self.logger.debug(f"language: Response message successfully sent. Message: {str(response)}")
                 return self.TONE
 
             self.logger.debug(f"language: Function successfully called with message {str(update.message.text)}")
-            context.user_data['language'] = update.message.text
+            configuration.language = update.message.text
             response = "Great! What tone should it be? (e.g. Professional, Casual, Friendly)"
-            await update.message.reply_text(response)
+            await self.reply(update, response)
             self.logger.debug(f"language: Response message successfully sent. Message: {str(response)}")
             return self.TONE
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. \nPlease resend your preferred article language.")
+            await self.reply(update, f"An error occurred: {str(e)}. \nPlease resend your preferred article language.")
             self.logger.error(f"language: An exception occurred: {str(e)}")
             return self.LANGUAGE
 
     async def tone(self, update: Update, context: CallbackContext):
         """Saves the configured tone in the user data and asks """
         try:
-            if self.retry:
+            configuration = get_configuration(context.user_data)
+            if configuration.reconfigure:
                 # a second route for when the user wants to reconfigure their data
                 self.logger.debug(
                     f"tone: Function successfully called with message {str(update.message.text)}")
                 if update.message.text != "no":
-                    context.user_data['tone'] = update.message.text
+                    configuration.tone = update.message.text
                 response = "Next, do you want to change your blog additional information? If yes, please reply with the new additional information, if not, please respond with 'no'."
-                await update.message.reply_text(response)
+                await self.reply(update, response)
                 self.logger.debug(f"tone: Response message successfully sent. Message: {str(response)}")
                 return self.ADDITIONAL
 
             self.logger.debug(f"tone: Function successfully called with message {str(update.message.text)}")
-            context.user_data['tone'] = update.message.text
+            configuration.tone = update.message.text
             response =("Great! Now, do you have any additional information you want to have included? If not, please respond with 'no'.")
-            await update.message.reply_text(response)
+            await self.reply(update, response)
             self.logger.debug(f"tone: Response message successfully sent. Message: {str(response)}")
             return self.ADDITIONAL
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. \nPlease resend your preferred article tone.")
+            await self.reply(update, f"An error occurred: {str(e)}. \nPlease resend your preferred article tone.")
             self.logger.error(f"tone: An exception occurred: {str(e)}")
             return self.TONE
 
     async def additional(self, update: Update, context: CallbackContext):
         try:
-            # a second route for when the user wants to reconfigure their data
-            if self.retry and update.message.text != "no":
-                    context.user_data['additional_information'] = update.message.text
+            configuration = get_configuration(context.user_data)
             self.logger.debug(f"additional_information: Function successfully called with message {str(update.message.text)}")
-            context.user_data['additional_information'] = ""
             if update.message.text != "no":
-                context.user_data['additional_information'] = update.message.text
+                configuration.additional_information = update.message.text
+            elif not configuration.reconfigure:
+                # when reconfiguring, 'no' keeps the previous additional information
+                configuration.additional_information = ""
 
-            user_data = context.user_data
             response =(f"Thanks! Here's what I got:\n"
-                f"- Topic or Task: {user_data['topic']}\n"
-                f"- Length: {user_data['length']}\n"
-                f"- Language Level: {user_data['language_level']}\n"
-                f"- Information Level: {user_data['information']}\n"
-                f"- Language: {user_data['language']}\n"
-                f"- Tone: {user_data['tone']}\n"
-                f"- Additional Information: {user_data['additional_information']}\n"
-                f"Type 'yes' to confirm or 'no' to restart."
+                f"- Topic or Task: {configuration.topic}\n"
+                f"- Length: {configuration.length}\n"
+                f"- Language Level: {configuration.language_level}\n"
+                f"- Information Level: {configuration.information}\n"
+                f"- Language: {configuration.language}\n"
+                f"- Tone: {configuration.tone}\n"
+                f"- Additional Information: {configuration.additional_information}\n"
+                f"Type 'yes' to confirm, 'regenerate' to confirm and write a new article even if the same configuration was written before, or 'no' to restart."
                 f"\n\nIf you type 'no', your configuration will be saved. Then, you will be asked all questions again and can just respond 'no' if you want your answer to remain the same."
                 f"\nSo, please only respond to a question if you want to change your answer.")
-            await update.message.reply_text(response)
+            await self.reply(update, response)
             self.logger.debug(f"additional: Response message successfully sent. Message: {str(response)}")
             return self.CONFIRM
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. \nPlease resend your additional information.")
+            await self.reply(update, f"An error occurred: {str(e)}. \nPlease resend your additional information.")
             self.logger.error(f"tone: An exception occurred: {str(e)}")
             return self.ADDITIONAL
 
@@ -469,74 +541,167 @@ class TelegramBot:
         response = ""
         try:
             self.logger.debug(f"confirm: Function successfully called with message {str(update.message.text)}")
-            if update.message.text.lower() == 'yes':
+            if update.message.text.lower() in ('yes', 'regenerate'):
                 self.logger.debug(f"confirm: Configuration confirmed, process started.")
-                user_data = context.user_data
-                inputs = {
-                    'topic': user_data['topic'],
-                    'length': user_data['length'],
-                    'information_level': user_data['information'],
-                    'language_level': user_data['language_level'],
-                    'tone': user_data['tone'],
-                    'language': user_data['language'],
-                    'additional_information': user_data['additional_information'],
-                    'history': user_data['history'],
-                }
+                history = self.history.get(context.user_data)
+                inputs = {**get_configuration(context.user_data).inputs(), 'history': self.history.for_crew(history)}
                 self.logger.debug(f"confirm: Inputs: {str(inputs)}")
-                context.user_data['history'] = context.user_data.get('history', []) + [str(inputs)]
-                history = "\n".join(context.user_data['history'])
-
-                filtered_tools = [tool for tool in self.tools if tool is not None]
-                self.logger.debug(f"confirm: Tools registered: {str(filtered_tools)}")
-                bot = BaRagmasChatbot(filtered_tools)
-                self.logger.debug(f"confirm: BaRagmasChatbot started.")
-                await update.message.reply_text("Processing...")
-
-                response = str(bot.crew().kickoff(inputs=inputs))
-                self.logger.debug(f"confirm: Crew kicked off and response successfully created.")
-                await update.message.reply_text(response)
-                self.logger.debug(f"confirm: Response message successfully sent. Message: {str(response)}")
-                context.user_data["history"].append(str(response))
+                configuration = {key: value for key, value in inputs.items() if key != 'history'}
+                history.add(USER, f"Blog article configuration: {str(configuration)}")
+
+                if self.generator.is_busy(update.effective_chat.id) or update.effective_chat.id in self.waiting:
+                    await self.reply(update, "Your previous blog article is still being generated. Please wait until you received it, then send 'yes' again to start this one.")
+                    self.logger.debug(f"confirm: Rejected, a generation job is already running for this chat.")
+                    return self.CONFIRM
+                pending = self.ingestions.pending(update.effective_chat.id)
+                if pending:
+                    await self.reply(update, f"I am still reading {', '.join(pending)}. Your blog article will be started as soon as they are ready.")
+                    self.logger.debug(f"confirm: Waiting for pending ingestions: {str(pending)}")
+                regenerate = update.message.text.lower() == 'regenerate'
+                # persisted with the chat data, so the chat can be told if the worker stops before the article is sent
+                context.chat_data['article'] = self.worker
+                self.waiting[update.effective_chat.id] = context.application.create_task(self.generate(update, context, inputs, regenerate), update=update)
                 return self.CHAT
 
             else:
-                await update.message.reply_text("Okay, let's reconfigure! Remember to please respond with 'no' if you want to keep your answer, so only respond if you want to change it. \n First, do you want to change you topic or task? If yes, please respond with 'topic' or 'task', if not, please respond with 'no'.")
+                await self.reply(update, "Okay, let's reconfigure! Remember to please respond with 'no' if you want to keep your answer, so only respond if you want to change it. \n First, do you want to change you topic or task? If yes, please respond with 'topic' or 'task', if not, please respond with 'no'.")
                 self.logger.debug(f"confirm: Configuration restarted.")
-                self.retry = True
+                get_configuration(context.user_data).reconfigure = True
                 return self.TOPIC_OR_TASK
 
-        except BadRequest as b:
-            if b.message == "Message is too long":
-                responses = response.split("\n\n")
-                self.logger.warn(f"confirm: Message is too long, split up into small packets by double line.")
-                for response in responses:
-                    await update.message.reply_text(response)
-
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. \nPlease resend if you want to confirm the inputs or not.")
+            await self.reply(update, f"An error occurred: {str(e)}. \nPlease resend if you want to confirm the inputs or not.")
             self.logger.error(f"confirm: An exception occurred:{str(e)}")
             return self.CONFIRM
 
+    async def generate(self, update: Update, context: CallbackContext, inputs: dict, regenerate: bool = False):
+        """Waits for the pending ingestions of the chat, then sends the cached article, joins an identical running job
+        or runs the crew in the generation executor, and sends the article"""
+        try:
+            await self.ingestions.wait(update.effective_chat.id)
+            chat_tools = self.registry.get(update.effective_chat.id)
+            evicted = self.registry.evicted(update.effective_chat.id)
+            if evicted:
+                await self.reply(update, f"Your sources {', '.join(evicted)} were unloaded because they were not used for a long time, so the blog article was not started. Please send them again, then start the configuration again with /start_configuration.")
+                self.logger.info(f"generate: Not started, the sources {evicted} were evicted.")
+                return
+            self.logger.debug(f"generate: Tools registered: {str(chat_tools)}")
+            key = self.articles.key(inputs, [stored.key for tool in chat_tools for stored in tool.adapter.sources])
+            article = None if regenerate else self.articles.get(key)
+            if article is not None:
+                self.logger.debug(f"generate: Article served from the article cache.")
+                await self.reply(update, "This blog article was already written with the same configuration, sources and conversation, so here it is right away. To get a new one, confirm with 'regenerate' next time.")
+                job = Future()
+                job.set_result(article)
+                await self.deliver(update, context, job)
+                return
+            job = None if regenerate else self.articles.join(key, update.effective_chat.id)
+            if job is not None:
+                self.logger.debug(f"generate: Joined an identical generation job.")
+                await self.reply(update, "The same blog article is already being written for someone else. I will send it to you as soon as it is finished, meanwhile you can keep using /chat or /help.")
+                await self.deliver(update, context, job)
+                return
+            try:
+                job, position = self.generator.submit(update.effective_chat.id, kickoff_crew, self.search_tools(chat_tools), inputs, self.task_progress(update))
+            except JobAlreadyRunning:
+                await self.reply(update, "Your previous blog article is still being generated. Please wait until you received it, then start the configuration again with /start_configuration.")
+                self.logger.debug(f"generate: Rejected, a generation job is already running for this chat.")
+                return
+            self.articles.track(key, job, update.effective_chat.id)
+            self.logger.debug(f"generate: Generation job submitted at queue position {str(position)}.")
+            if position:
+                await self.reply(update, f"Your blog article is queued, position {position}. I will send it to you as soon as it is finished, meanwhile you can keep using /chat or /help.")
+            else:
+                await self.reply(update, "Processing... I will send you the blog article as soon as it is finished, meanwhile you can keep using /chat or /help.")
+            await self.deliver(update, context, job)
+
+        except Exception as e:
+            await self.reply(update, f"An error occurred while starting your blog article: {str(e)}. \nPlease send /start_configuration to try again.")
+            self.logger.error(f"generate: An exception occurred:{str(e)}")
+
+        finally:
+            if self.waiting.get(update.effective_chat.id) is asyncio.current_task():
+                del self.waiting[update.effective_chat.id]
+            context.chat_data.pop('article', None)
+
+    async def deliver(self, update: Update, context: CallbackContext, job):
+        """Waits for a generation job without blocking the event loop and sends the finished article"""
+        response = ""
+        try:
+            # shielded, so a cancelled waiter never cancels the job itself, stop_generation decides about that
+            response = str(await asyncio.shield(asyncio.wrap_future(job)))
+            self.logger.debug(f"deliver: Crew kicked off and response successfully created.")
+            await self.reply(update, response)
+            self.logger.debug(f"deliver: Response message successfully sent. Message: {str(response)}")
+            await self.remember(context, response)
+
+        except (JobCancelled, asyncio.CancelledError):
+            if not job.done() or (not job.cancelled() and not isinstance(job.exception(), JobCancelled)):
+                raise
+            await self.reply(update, "The blog article was cancelled before it was finished. Please send /start_configuration to start a new one.")
+            self.logger.info(f"deliver: Generation job was cancelled.")
+
+        except Exception as e:
+            await self.reply(update, f"An error occurred while generating your blog article: {str(e)}. \nPlease send /start_configuration to try again.")
+            self.logger.error(f"deliver: An exception occurred:{str(e)}")
+
+    def stop_generation(self, chat_id) -> bool:
+        """Cancels the blog article of the chat, whether it still waits for its sources, is queued or is running,
+        and returns if there was one. A job that other chats joined keeps running for them, only the chat stops
+        waiting for it, and it is cancelled when the last chat waiting for it leaves."""
+        task = self.waiting.pop(chat_id, None)
+        if task is not None:
+            task.cancel()
+        owner = self.articles.leave(chat_id)
+        cancelled = owner is not None and self.generator.cancel(owner)
+        return cancelled or task is not None
+
+    async def remember(self, context: CallbackContext, article: str):
+        """Adds a finished article to the conversation history."""
+        history = self.history.get(context.user_data)
+        history.add(ASSISTANT, article)
+        await self.history.compact(history)
+
     async def cancel(self, update: Update, context: CallbackContext):
         """The fallout function, leaves the conversation"""
         try:
             self.logger.debug(f"cancel: Function successfully called with message {str(update.message.text)}")
             response = "Conversation canceled. Type /start to begin again."
-            await update.message.reply_text(response)
+            if self.stop_generation(update.effective_chat.id):
+                response = "Conversation and blog article generation canceled. Type /start to begin again."
+            await self.reply(update, response)
             self.logger.debug(f"cancel: Response message successfully sent. Message: {str(response)}")
             return ConversationHandler.END
 
         except Exception as e:
-            await update.message.reply_text(f"An error occurred: {str(e)}. \nConversation canceled. Type /start to begin again.")
+            await self.reply(update, f"An error occurred: {str(e)}. \nConversation canceled. Type /start to begin again.")
             self.logger.error(f"cancel: An exception occurred: {str(e)}")
             return ConversationHandler.END
 
-    def start_bot(self) -> None:
-        """Start the bot."""
-        application = Application.builder().token(self.token).build()
-        self.logger.info("Telegram Bot successfully started.")
-        self.clear_db()
-        conv_handler = ConversationHandler(
+    async def interrupted(self, application: Application):
+        """Tells the chats whose blog article was still being generated when this worker stopped that it is lost."""
+        chat_ids = [chat_id for chat_id, chat_data in application.chat_data.items() if chat_data.get('article') == self.worker]
+        for chat_id in chat_ids:
+            del application.chat_data[chat_id]['article']
+        application.mark_data_for_update_persistence(chat_ids=chat_ids)
+        results = await asyncio.gather(*(self.sender.run(chat_id, lambda chat_id=chat_id: application.bot.send_message(
+            chat_id, "Sorry, the chatbot was restarted while your blog article was being generated. Please confirm your configuration again with /start_configuration.")
+        ) for chat_id in chat_ids), return_exceptions=True)
+        for chat_id, result in zip(chat_ids, results):
+            if isinstance(result, Exception):
+                self.logger.warning(f"interrupted: Chat {chat_id} could not be told about its lost article: {str(result)}")
+
+    def build_application(self, shared: bool = False) -> Application:
+        """Builds the telegram application with all handlers of the conversation. With shared, the persistence
+        is shared with other bot processes."""
+        if not isinstance(self.token, str):
+            raise SettingsError("Setting chatbot_token.token is missing, please add your telegram chatbot token to the configs.yaml.")
+        builder = Application.builder().token(self.token).concurrent_updates(ChatUpdateProcessor(self.settings.chatbot.concurrent_updates))
+        if self.settings.persistence.path:
+            self.persistence = SQLitePersistence(self.settings.persistence.path, self.settings.persistence.update_interval, shared)
+            builder = builder.persistence(self.persistence).post_init(self.interrupted)
+        application = builder.build()
+        conv_handler = SharedConversationHandler(
             entry_points=[CommandHandler("start", self.start)],
             states={
                 self.CHAT: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.chat)],
@@ -559,104 +724,131 @@ class TelegramBot:
                        CommandHandler("help", self.help),
                        CommandHandler("chat", self.chat)
                        ],
+            name="configuration",
+            persistent=self.persistence is not None,
+            store=self.persistence,
         )
 
         application.add_handler(conv_handler)
-        application.run_polling()
-
-    def addWebsite(self, url):
-        self.tools.append(
-            WebsiteSearchTool(
-                website=url,
-                config=dict(
-                    llm=dict(
-                        provider=self.llm_provider,
-                        config=dict(
-                            model=self.llm_name,
-                            base_url=self.llm_url,
-                        ),
-                    ),
-                    embedder=dict(
-                        provider=self.embed_model_provider,
-                        config=dict(
-                            model=self.embed_model_name,
-                            base_url=self.embed_model_url,
-                        ),
-                    ),
-                ),
-            )
-        )
-        self.logger.info(f"Website-RAG-Tool added: {url}")
-
-    def addPDF(self, location):
-        self.tools.append(
-            PDFSearchTool(
-                pdf=location,
-                config=dict(
-                    llm=dict(
-                        provider=self.llm_provider,
-                        config=dict(
-                            model=self.llm_name,
-                            base_url=self.llm_url,
-                        ),
-                    ),
-                    embedder=dict(
-                        provider=self.embed_model_provider,
-                        config=dict(
-                            model=self.embed_model_name,
-                            base_url=self.embed_model_url,
-                        ),
-                    ),
-                )
-            )
-        )
-        self.logger.info(f"PDF-RAG-Tool added: {location}")
-
-
-    def addDOCX(self, location):
-        self.tools.append(
-            DOCXSearchTool(
-                docx=location,
-                config=dict(
-                    llm=dict(
-                        provider=self.llm_provider,
-                        config=dict(
-                            model=self.llm_name,
-                            base_url=self.llm_url,
-                        ),
-                    ),
-                    embedder=dict(
-                        provider=self.embed_model_provider,
-                        config=dict(
-                            model=self.embed_model_name,
-                            base_url=self.embed_model_url,
-                        ),
-                    ),
-                )
+        if self.persistence is not None and self.persistence.shared:
+            application.add_handler(TypeHandler(Update, conv_handler.refresh), group=-1)
+        return application
+
+    async def serve(self, application: Application, updates):
+        """Runs the application of a webhook worker, which processes the updates the dispatcher puts into the queue,
+        until it puts None."""
+        async with application:
+            if application.post_init is not None:
+                await application.post_init(application)
+            await application.start()
+            while (data := await asyncio.to_thread(updates.get)) is not None:
+                await application.update_queue.put(Update.de_json(data, application.bot))
+            await application.stop()
+
+    def start_bot(self, mode: Optional[str] = None, worker: int = 0, updates=None) -> None:
+        """Start the bot, either polling for updates or receiving them over a webhook. The mode defaults to the
+        server.mode setting. With several webhook workers, worker is the number of this worker process, and updates
+        the queue the WebhookDispatcher forwards the updates of its chats to."""
+        server = self.settings.server
+        mode = mode or server.mode
+        if mode not in ("polling", "webhook"):
+            raise SettingsError(f"Setting server.mode has to be polling or webhook, but is {mode!r}.")
+        if mode == "webhook" and updates is None and not server.webhook_url:
+            raise SettingsError("Setting server.webhook_url is missing, please add the public url telegram sends the updates to.")
+        self.worker = worker
+        application = self.build_application(shared=updates is not None)
+        self.store.gc()
+        self.documents.gc()
+        get_crew_factory()
+        self.logger.info(f"start_bot: Telegram Bot successfully started in {mode} mode.")
+        if updates is not None:
+            asyncio.run(self.serve(application, updates))
+        elif mode == "webhook":
+            application.run_webhook(
+                listen=server.listen,
+                port=server.port,
+                url_path=server.url_path,
+                webhook_url=server.webhook_url,
+                secret_token=server.secret_token,
             )
-        )
-        self.logger.info(f"DOCX-RAG-Tool added: {location}")
-
-    def addTxt(self, location):
-        self.tools.append(
-            TXTSearchTool(
-                txt=location,
-                config=dict(
-                    llm=dict(
-                        provider=self.llm_provider,
-                        config=dict(
-                            model=self.llm_name,
-                            base_url=self.llm_url,
-                        ),
-                    ),
-                    embedder=dict(
-                        provider=self.embed_model_provider,
-                        config=dict(
-                            model=self.embed_model_name,
-                            base_url=self.embed_model_url,
-                        ),
-                    ),
-                )
-            )
-        )
-        self.logger.info(f"TXT-RAG-Tool added: {location}")
+        else:
+            application.run_polling()
+        self.generator.shutdown(wait=False)
+
+    async def ingest(self, update: Update, context: CallbackContext, name: str, add, source: Optional[str], file_id: str = None):
+        """Downloads a document into the document storage if a file id is given, reads the source in a worker thread
+        and registers its RAG tool for the chat"""
+        try:
+            if file_id is not None:
+                file = await context.bot.get_file(file_id)
+                stored = await self.documents.download(file, os.path.splitext(name)[1])
+                source = stored.path
+                self.logger.debug(f"ingest: File saved at: {str(source)}")
+            reading = asyncio.ensure_future(asyncio.to_thread(add, source, self.progress(update, name), update.effective_chat.id, name))
+            try:
+                tool = await asyncio.shield(reading)
+            except asyncio.CancelledError:
+                # the worker thread cannot be stopped, so the sources it acquires for the chat are released once it is done
+                reading.add_done_callback(self.discard)
+                raise
+            self.registry.add(update.effective_chat.id, tool, size=tool.adapter.size, name=name)
+            await self.reply(update, f"{name} is ready and will be used for your blog article.")
+
+        except asyncio.CancelledError:
+            self.logger.info(f"ingest: Ingestion of {name} cancelled.")
+            raise
+
+        except Exception as e:
+            await self.reply(update, f"An error occurred while reading {name}: {str(e)}. \nIt will not be used for your blog article, please send it again if you need it.")
+            self.logger.error(f"ingest: An exception occurred: {str(e)}")
+
+    def discard(self, reading: asyncio.Future):
+        """Releases the sources of a RAG tool whose ingestion was cancelled while it was read."""
+        if reading.cancelled() or reading.exception() is not None:
+            return
+        reading.result().adapter.release()
+        self.logger.info(f"discard: Sources of a cancelled ingestion released.")
+
+    def search_tools(self, chat_tools: list) -> list:
+        """Combines the sources of all RAG tools of the chat into one hybrid search tool for the crew."""
+        sources = list({id(stored): stored for tool in chat_tools for stored in tool.adapter.sources}.values())
+        if not sources:
+            return []
+        names = {key: name for tool in chat_tools for key, name in tool.adapter.names.items()}
+        retrieval = self.settings.retrieval
+        return [HybridSearchTool(sources=sources, names=names, pipeline=self.pipeline, limit=retrieval.limit, candidates=retrieval.candidates, rrf_k=retrieval.rrf_k)]
+
+    def task_progress(self, update: Update) -> Optional[TaskProgress]:
+        """Creates the task callback that shows the crew's progress in the chat."""
+        if not self.settings.generation.task_progress:
+            return None
+        return TaskProgress(update.message, asyncio.get_running_loop(), self.sender)
+
+    def progress(self, update: Update, name: str) -> ChatProgress:
+        """Creates a callback that shows the ingestion progress of a source in the chat."""
+        return ChatProgress(update.message, asyncio.get_running_loop(), name, self.settings.ingestion.progress_interval, self.sender)
+
+    def adapter(self, progress=None, chat_id=None, name=None) -> StoreAdapter:
+        """Creates the knowledge base for a new RAG tool of the chat, backed by the persistent embedding store and
+        sharing its sources with other chats through the source catalog. name is what the chat calls the source."""
+        return StoreAdapter(store=self.store, pipeline=self.pipeline, catalog=self.catalog, documents=self.documents, chat_id=chat_id, name=name, progress=progress)
+
+    def addWebsite(self, url, progress=None, chat_id=None, name=None):
+        tool = WebsiteSearchTool(website=url, adapter=self.adapter(progress, chat_id, name))
+        self.logger.info(f"Website-RAG-Tool created: {url}")
+        return tool
+
+    def addPDF(self, location, progress=None, chat_id=None, name=None):
+        tool = PDFSearchTool(pdf=location, adapter=self.adapter(progress, chat_id, name))
+        self.logger.info(f"PDF-RAG-Tool created: {location}")
+        return tool
+
+    def addDOCX(self, location, progress=None, chat_id=None, name=None):
+        tool = DOCXSearchTool(docx=location, adapter=self.adapter(progress, chat_id, name))
+        self.logger.info(f"DOCX-RAG-Tool created: {location}")
+        return tool
+
+    def addTxt(self, location, progress=None, chat_id=None, name=None):
+        tool = TXTSearchTool(txt=location, adapter=self.adapter(progress, chat_id, name))
+        self.logger.info(f"TXT-RAG-Tool created: {location}")
+        return tool
@@ -0,0 +1,43 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class ArticleConfiguration:
+    """Answers of the blog article configuration of one chat, stored in its user data.
+    With reconfigure set, the dialog asks for changes to the previous answers, and 'no' keeps an answer."""
+    topic: str = ""
+    length: str = ""
+    language_level: str = ""
+    information: str = ""
+    language: str = ""
+    tone: str = ""
+    additional_information: str = ""
+    reconfigure: bool = False
+
+    def inputs(self) -> dict[str, str]:
+        """Returns the configuration as inputs of the crew."""
+        return {
+            'topic': self.topic,
+            'length': self.length,
+            'information_level': self.information,
+            'language_level': self.language_level,
+            'tone': self.tone,
+            'language': self.language,
+            'additional_information': self.additional_information,
+        }
+
+
+def get_configuration(user_data: dict) -> ArticleConfiguration:
+    """Returns the configuration stored in the user data, creating it if necessary."""
+    configuration = user_data.get('configuration')
+    if not isinstance(configuration, ArticleConfiguration):
+        configuration = ArticleConfiguration()
+        user_data['configuration'] = configuration
+    return configuration
+
+
+def reset_configuration(user_data: dict) -> ArticleConfiguration:
+    """Starts a new configuration for the chat."""
+    configuration = ArticleConfiguration()
+    user_data['configuration'] = configuration
+    return configuration
@@ -1,133 +1,122 @@
 import os
+import threading
+import time
 import yaml
 
-from crewai import Agent, Crew, Process, Task, LLM
-from crewai.project import CrewBase, agent, crew, task, before_kickoff, after_kickoff
+from crewai import Agent, Crew, Process, Task
 
 from src.ba_ragmas_chatbot import logger_config
+from src.ba_ragmas_chatbot.cache import TTLCache
+from src.ba_ragmas_chatbot.generation_executor import check_cancelled
+from src.ba_ragmas_chatbot.llm_pool import LLMPool
+from src.ba_ragmas_chatbot.settings import get_settings
 from src.ba_ragmas_chatbot.tools.factcheck_tool import FactCheckTool
+from src.ba_ragmas_chatbot.tools.search_backend import create_backend
+
+
+settings = get_settings()
+# shared by all crews of the process, so agents reuse the pooled LLM clients and the fact check cache
+llm_pool = LLMPool(
+	model=settings.agents.llm,
+	base_url=settings.agents.url,
+	max_in_flight=settings.agents.max_in_flight,
+	keepalive_connections=settings.agents.keepalive_connections,
+	overrides={agent: (override.llm, override.url) for agent, override in settings.agents.overrides.items()},
+)
+fact_check_cache = TTLCache(
+	max_entries=settings.fact_check.cache.max_entries,
+	ttl=settings.fact_check.cache.ttl,
+	path=settings.fact_check.cache.path,
+)
+search_backend = create_backend(settings.fact_check.search)
+
+
+class CrewFactory():
+	"""Builds the blog article crews from the agents.yaml and tasks.yaml, which are parsed and validated only once.
+	Per request, only the tools of the user are bound to fresh agents and tasks."""
+	AGENT_KEYS = ("role", "goal", "backstory")
+	TASK_KEYS = ("description", "expected_output", "agent")
+	# agents and tasks which get the RAG and fact check tools, the proofreader only works on the text
+	TOOL_USERS = ("researcher", "editor", "writer")
+
+	def __init__(self, agents_path=None, tasks_path=None):
+		config_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config")
+		self.agents_config = self.load(agents_path or os.path.join(config_dir, "agents.yaml"), self.AGENT_KEYS)
+		self.tasks_config = self.load(tasks_path or os.path.join(config_dir, "tasks.yaml"), self.TASK_KEYS)
+		for name, task in self.tasks_config.items():
+			if task["agent"] not in self.agents_config:
+				raise ValueError(f"Task {name} uses the unknown agent {task['agent']}.")
+		fact_check = settings.fact_check
+		self.fact_check_tool = FactCheckTool(max_concurrency=fact_check.max_concurrency, batch_size=fact_check.batch_size, cache=fact_check_cache, search=search_backend)
+		self.logger = logger_config.get_logger("crew ai")
+		self.logger.info(f"__init__: Crew templates loaded with agents {list(self.agents_config)} and tasks {list(self.tasks_config)}.")
+
+	@staticmethod
+	def load(path, required_keys) -> dict:
+		"""Parses a template file and checks that every template has the required keys."""
+		with open(path, "r", encoding="utf-8") as file:
+			templates = yaml.safe_load(file)
+		if not isinstance(templates, dict) or not templates:
+			raise ValueError(f"{path} does not contain any templates.")
+		for name, template in templates.items():
+			missing = [key for key in required_keys if key not in (template or {})]
+			if missing:
+				raise ValueError(f"Template {name} in {path} is missing {', '.join(missing)}.")
+		return templates
+
+	def build(self, tools, progress=None) -> Crew:
+		"""Creates a crew whose agents and tasks use the given tools, plus the shared fact check tool.
+		If given, progress is called with the name and output of every task as soon as it is finished."""
+		start = time.perf_counter()
+		tools = list(tools) + [self.fact_check_tool]
+		agents = {}
+		for name, template in self.agents_config.items():
+			agent_tools = tools if name in self.TOOL_USERS else []
+			agents[name] = Agent(config=dict(template), llm=llm_pool.for_agent(name), tools=agent_tools, max_retry_limit=2, verbose=True)
+		tasks = []
+		for name, template in self.tasks_config.items():
+			config = {key: value for key, value in template.items() if key != "agent"}
+			task_tools = tools if template["agent"] in self.TOOL_USERS else []
+			callback = (lambda output, name=name: self.finished(name, output, progress))
+			tasks.append(Task(config=config, agent=agents[template["agent"]], tools=task_tools, callback=callback))
+		crew = Crew(agents=list(agents.values()), tasks=tasks, process=Process.sequential, step_callback=lambda step: check_cancelled(), verbose=True)
+		self.logger.info(f"build: Crew built with {len(tools)} tools in {(time.perf_counter() - start) * 1000:.1f} ms.")
+		return crew
+
+	@staticmethod
+	def finished(name, output, progress=None):
+		"""Task callback, which reports the task's output and stops the crew before the next task if the job was cancelled."""
+		check_cancelled()
+		if progress:
+			progress(name, output.raw)
+
+	def kickoff(self, tools, inputs, progress=None) -> str:
+		"""Builds a crew with the given tools and runs it with the inputs.
+		Raises JobCancelled if the generation job was cancelled, even if crewai handled the interruption itself."""
+		self.logger.info(f"kickoff: Called with inputs: {inputs}")
+		try:
+			result = str(self.build(tools, progress).kickoff(inputs=inputs))
+		except Exception:
+			check_cancelled()
+			raise
+		check_cancelled()
+		self.logger.info(f"kickoff: Finished with result: {result}")
+		return result
 
 
-@CrewBase
-class BaRagmasChatbot():
-	"""BaRagmasChatbot crew"""
-	agents_config = 'config/agents.yaml'
-	tasks_config = 'config/tasks.yaml'
-	current_dir = os.path.dirname(os.path.abspath(__file__))
-	yaml_file = os.path.join(current_dir, "config", "configs.yaml")
-	with open(yaml_file, 'r') as file:
-		config = yaml.safe_load(file)
-	llm = config['agents']['llm']
-	url = config['agents']['url']
-
-	def __init__(self, tools):
-		self.tools = tools
-		self.tools.append(FactCheckTool())
-		self.logger = logger_config.get_logger("crew ai")
+_factory = None
+_factory_lock = threading.Lock()
+
+
+def get_crew_factory() -> CrewFactory:
+	"""Returns the crew factory of this process, creating it on first use."""
+	global _factory
+	with _factory_lock:
+		if _factory is None:
+			_factory = CrewFactory()
+		return _factory
 
-	@before_kickoff
-	def before_kickoff_function(self, inputs):
-		"""What happens before the crew is started"""
-		print(f"Before kickoff function with inputs: {inputs}")
-		self.logger.info(f"before_kickoff_function: Called with inputs: {inputs}")
-		return inputs
-
-	@after_kickoff
-	def after_kickoff_function(self, result):
-		"""What happens after the crew is finished"""
-		print(f"After kickoff function with result: {result}")
-		self.logger.info(f"after_kickoff_function: Called with result: {result}")
-		return result
 
-	@agent
-	def researcher(self) -> Agent:
-		"""The researcher agent which corresponds to the researcher specified in the agents.yaml."""
-		self.logger.info("researcher: Researcher Agent created based on agents.yaml[researcher] with llm ollama/llama3.1:8b-instruct-q8_0.")
-		return Agent(
-			config=self.agents_config['researcher'],
-			llm=LLM(model=self.llm, base_url=self.url),
-			tools = self.tools,
-			max_retry_limit = 2,
-			verbose=True
-		)
-
-	@agent
-	def editor(self) -> Agent:
-		"""The editor agent which corresponds to the editor specified in the agents.yaml."""
-		self.logger.info("editor: Editor Agent created based on agents.yaml[editor] with llm ollama/llama3.1:8b-instruct-q8_0.")
-		return Agent(
-			config=self.agents_config['editor'],
-			llm=LLM(model=self.llm, base_url=self.url),
-			tools=self.tools,
-			max_retry_limit=2,
-			verbose=True
-		)
-
-	@agent
-	def writer(self) -> Agent:
-		"""The writer agent which corresponds to the writer specified in the agents.yaml."""
-		self.logger.info("writer: Writer Agent created based on agents.yaml[writer] with llm ollama/llama3.1:8b-instruct-q8_0.")
-		return Agent(
-			config=self.agents_config['writer'],
-			llm=LLM(model=self.llm, base_url=self.url),
-			tools=self.tools,
-			max_retry_limit=2,
-			verbose=True
-		)
-
-	@agent
-	def proofreader(self) -> Agent:
-		"""The proofreader agent which corresponds to the proofreader specified in the agents.yaml."""
-		self.logger.info("proofreader: Proofreader Agent created based on agents.yaml[proofreader] with llm ollama/llama3.1:8b-instruct-q8_0.")
-		return Agent(
-			config=self.agents_config['proofreader'],
-			llm=LLM(model=self.llm, base_url=self.url),
-			max_retry_limit=2,
-			verbose=True
-		)
-
-	@task
-	def research_task(self) -> Task:
-		"""The research task which corresponds to the research task specified in the tasks.yaml."""
-		self.logger.info("research_task: Research task created based on tasks.yaml[research_task].")
-		return Task(
-			config=self.tasks_config['research_task'],
-			tools=self.tools,
-		)
-
-	@task
-	def editor_task(self) -> Task:
-		"""The editor task which corresponds to the editor task specified in the tasks.yaml."""
-		self.logger.info("editor_task: Editor task created based on tasks.yaml[editor_task].")
-		return Task(
-			config=self.tasks_config['editor_task'],
-			tools=self.tools,
-		)
-
-	@task
-	def writer_task(self) -> Task:
-		"""The writer task which corresponds to the writer task specified in the tasks.yaml."""
-		self.logger.info("writer_task: Writer task created based on tasks.yaml[writer_task].")
-		return Task(
-			config=self.tasks_config['writer_task'],
-			tools=self.tools,
-		)
-
-	@task
-	def proofreader_task(self) -> Task:
-		"""The proofreader task which corresponds to the proofreader task specified in the tasks.yaml."""
-		self.logger.info("proofreader_task: Proofreader task created based on tasks.yaml[proofreader_task].")
-		return Task(
-			config=self.tasks_config['proofreader_task'],
-		)
-
-	@crew
-	def crew(self) -> Crew:
-		"""Creates the BaRagmasChatbot crew"""
-		self.logger.info(f"crew: Crew is created with agents: {str(self.agents)} \nand tasks: {str(self.tasks)}")
-		return Crew(
-			agents=self.agents,
-			tasks=self.tasks,
-			process=Process.sequential,
-			verbose=True,
-		)
\ No newline at end of file
+def kickoff_crew(tools, inputs, progress=None) -> str:
+	"""Runs a crew with the given tools, used as job for the generation executor."""
+	return get_crew_factory().kickoff(tools, inputs, progress)
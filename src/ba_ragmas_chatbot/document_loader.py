@@ -0,0 +1,102 @@
+import codecs
+import hashlib
+import io
+
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+import requests
+
+from bs4 import BeautifulSoup
+from docx import Document
+from pypdf import PdfReader
+
+
+PDF, DOCX, TXT, WEBSITE = "pdf", "docx", "txt", "website"
+# data types as passed by the crewai_tools search tools, mapped to the source kinds above
+DATA_TYPES = {
+    "pdf_file": PDF,
+    "docx": DOCX,
+    "text_file": TXT,
+    "website": WEBSITE,
+    "web_page": WEBSITE,
+}
+BLOCK_SIZE = 1024 * 1024
+
+
+def source_kind(data_type) -> str:
+    """Maps the data type of a crewai_tools search tool to a source kind."""
+    value = str(getattr(data_type, "value", data_type)).lower()
+    if value not in DATA_TYPES:
+        raise ValueError(f"Unsupported data type: {value}")
+    return DATA_TYPES[value]
+
+
+def open_source(source: str, kind: str) -> BinaryIO:
+    """Opens a file or downloads a website and returns its raw content as a binary stream."""
+    if kind == WEBSITE:
+        response = requests.get(source, timeout=30)
+        response.raise_for_status()
+        return io.BytesIO(response.content)
+    return open(source, "rb")
+
+
+def website_version(url: str) -> Optional[str]:
+    """Returns the ETag or Last-Modified header of a website, or None if it has neither or does not answer a HEAD request."""
+    try:
+        response = requests.head(url, timeout=10, allow_redirects=True)
+    except requests.RequestException:
+        return None
+    if not response.ok:
+        return None
+    return response.headers.get("ETag") or response.headers.get("Last-Modified")
+
+
+def hash_source(stream: BinaryIO) -> str:
+    """Returns the SHA-256 of the stream, read block by block, and rewinds it afterwards."""
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(BLOCK_SIZE), b""):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def iter_text(stream: BinaryIO, kind: str) -> Iterator[str]:
+    """Extracts the plain text of a source piece by piece (pages, paragraphs or blocks), so large files are never
+    held in memory as a whole."""
+    match kind:
+        case "pdf":
+            for page in PdfReader(stream).pages:
+                yield (page.extract_text() or "") + "\n\n"
+        case "docx":
+            for paragraph in Document(stream).paragraphs:
+                yield paragraph.text + "\n\n"
+        case "website":
+            yield BeautifulSoup(stream.read(), "html.parser").get_text(separator="\n", strip=True)
+        case "txt":
+            yield from codecs.iterdecode(iter(lambda: stream.read(BLOCK_SIZE), b""), "utf-8", errors="replace")
+        case _:
+            raise ValueError(f"Unsupported source kind: {kind}")
+
+
+def chunk_text(pieces: Iterable[str], chunk_size: int, chunk_overlap: int) -> Iterator[str]:
+    """Lazily splits a text, given as a whole or in pieces, into chunks of at most chunk_size characters,
+    preferring to cut at whitespace. Consecutive chunks share chunk_overlap characters."""
+    if chunk_overlap >= chunk_size:
+        raise ValueError("The chunk overlap has to be smaller than the chunk size.")
+    if isinstance(pieces, str):
+        pieces = [pieces]
+    buffer = ""
+    carried = 0
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) > chunk_size:
+            end = buffer.rfind(" ", chunk_overlap + 1, chunk_size)
+            if end == -1:
+                end = chunk_size
+            chunk = buffer[:end].strip()
+            if chunk:
+                yield chunk
+            buffer = buffer[end - chunk_overlap:]
+            carried = chunk_overlap
+    if len(buffer) > carried and buffer.strip():
+        yield buffer.strip()
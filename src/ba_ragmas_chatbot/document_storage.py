@@ -0,0 +1,122 @@
+import hashlib
+import os
+import re
+import time
+import uuid
+
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from telegram import File
+
+from src.ba_ragmas_chatbot import logger_config
+
+
+CHUNK_SIZE = 64 * 1024
+HASHED_NAME = re.compile(r"^[0-9a-f]{64}$")
+
+
+class DocumentTooLarge(ValueError):
+    """Raised when a document is larger than the storage accepts."""
+
+
+@dataclass
+class StoredDocument:
+    path: str
+    sha256: str
+    size: int
+
+
+class DocumentStorage:
+    """Content-addressed storage for uploaded documents. Uploads are streamed to disk in chunks and hashed while
+    they are written, and every file is stored under its SHA-256, so identical uploads are stored once and uploads
+    with the same name never overwrite each other. Files not used for max_age_days are removed by gc()."""
+
+    def __init__(self, path: str, max_size_mb: Optional[float] = None, max_age_days: Optional[float] = None):
+        self.path = path
+        self.max_size = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+        self.max_age = max_age_days * 24 * 60 * 60 if max_age_days else None
+        self.logger = logger_config.get_logger("document storage")
+
+    def check_size(self, size: Optional[int]):
+        """Raises DocumentTooLarge if the size is known and over the limit."""
+        if size is not None and self.max_size is not None and size > self.max_size:
+            raise DocumentTooLarge(f"The document has {size / 1024 / 1024:.1f} MB, but at most {self.max_size / 1024 / 1024:g} MB are accepted.")
+
+    def hash_of(self, path: str) -> Optional[str]:
+        """Returns the SHA-256 of a file in the storage from its name, without reading it, or None for other files."""
+        directory, name = os.path.split(os.path.abspath(path))
+        stem = os.path.splitext(name)[0]
+        if directory != os.path.abspath(self.path) or not HASHED_NAME.match(stem):
+            return None
+        return stem
+
+    async def download(self, file: File, suffix: str = "") -> StoredDocument:
+        """Downloads a telegram file into the storage. It is downloaded through the bot, so the bot's request settings
+        apply and errors never show the file url, which contains the bot token. The bot API only serves files of
+        up to 20 MB, so they are downloaded into memory. With a local bot API server, file_path is a local file,
+        which is streamed instead."""
+        self.check_size(file.file_size)
+        if file.file_path and os.path.isfile(file.file_path):
+            return await self.save(self._read_local(file.file_path), suffix)
+        content = await file.download_as_bytearray()
+        return await self.save(self._read_memory(content), suffix)
+
+    async def save(self, chunks: AsyncIterator[bytes], suffix: str = "") -> StoredDocument:
+        """Writes the chunks to a temporary file while hashing them and enforcing the size limit,
+        then moves the file to its hash-addressed name."""
+        os.makedirs(self.path, exist_ok=True)
+        temp_path = os.path.join(self.path, f"{uuid.uuid4().hex}.tmp")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, "wb") as file:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    self.check_size(size)
+                    digest.update(chunk)
+                    file.write(chunk)
+            content_hash = digest.hexdigest()
+            path = os.path.join(self.path, f"{content_hash}{suffix.lower()}")
+            if os.path.exists(path):
+                os.remove(temp_path)
+                os.utime(path)
+                self.logger.debug(f"save: Document {content_hash} was already stored.")
+            else:
+                os.replace(temp_path, path)
+                self.logger.debug(f"save: Document {content_hash} stored, {size} bytes.")
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return StoredDocument(path, content_hash, size)
+
+    def gc(self) -> list[str]:
+        """Removes documents that were not stored again for max_age_days, and temporary files of downloads
+        that were interrupted more than an hour ago."""
+        if not os.path.isdir(self.path):
+            return []
+        now = time.time()
+        removed = []
+        for name in os.listdir(self.path):
+            file_path = os.path.join(self.path, name)
+            age = now - os.path.getmtime(file_path)
+            stale = age > 3600 if name.endswith(".tmp") else self.max_age is not None and age > self.max_age
+            if os.path.isfile(file_path) and stale:
+                os.remove(file_path)
+                removed.append(name)
+        if removed:
+            self.logger.info(f"gc: Removed documents {removed}.")
+        return removed
+
+    @staticmethod
+    async def _read_memory(content: bytearray) -> AsyncIterator[bytes]:
+        view = memoryview(content)
+        for start in range(0, len(view), CHUNK_SIZE):
+            yield view[start:start + CHUNK_SIZE]
+
+    @staticmethod
+    async def _read_local(path: str) -> AsyncIterator[bytes]:
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                yield chunk
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from src.ba_ragmas_chatbot import logger_config
+from src.ba_ragmas_chatbot.bm25 import InvertedIndex
+from src.ba_ragmas_chatbot.file_lock import file_lock
+
+
+@dataclass
+class StoredSource:
+    """The chunks of one source together with their embedding vectors, and their inverted index once it is searched."""
+    key: str
+    source: str
+    chunks: list[str]
+    vectors: np.ndarray
+    _index: Optional[InvertedIndex] = field(default=None, repr=False, compare=False)
+
+    @property
+    def index(self) -> InvertedIndex:
+        """The BM25 index of the chunks, built on first use and shared by every chat that uses the source."""
+        if self._index is None:
+            self._index = InvertedIndex(self.chunks)
+        return self._index
+
+    @property
+    def size(self) -> int:
+        """Estimated bytes the source uses in memory."""
+        return sum(len(chunk.encode()) for chunk in self.chunks) + self.vectors.nbytes
+
+
+class EmbeddingStore:
+    """Persistent, content-addressed store for source embeddings.
+    Entries are keyed by a hash of the source content, the embedding model and the chunking parameters,
+    so re-uploading a document or restarting the bot reuses the existing vectors.
+    Entries not used for max_age_days are removed, and if the store grows larger than max_size_mb,
+    the least recently used entries are removed first. Several bot processes can share the store, every change
+    takes over the manifest the others saved first."""
+    MANIFEST = "manifest.json"
+
+    def __init__(self, path: str, embedder: str, chunk_size: int, chunk_overlap: int,
+                 max_size_mb: Optional[float] = None, max_age_days: Optional[float] = None):
+        self.path = path
+        self.embedder = embedder
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.max_size = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+        self.max_age = max_age_days * 24 * 60 * 60 if max_age_days else None
+        self.logger = logger_config.get_logger("embedding store")
+        self._lock = threading.Lock()
+        self._manifest = self._load_manifest()
+
+    def key(self, content_hash: str) -> str:
+        """Returns the address of a source, given the SHA-256 of its raw content."""
+        address = f"{content_hash}|{self.embedder}|{self.chunk_size}|{self.chunk_overlap}"
+        return hashlib.sha256(address.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[StoredSource]:
+        """Returns the stored source for the key, or None if it was not embedded yet."""
+        with self._locked():
+            entry = self._manifest.get(key)
+            if entry is None:
+                return None
+            try:
+                with open(self._file(key, "json"), "r") as file:
+                    data = json.load(file)
+                vectors = np.load(self._file(key, "npy"))
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"get: Entry {key} is damaged and will be re-embedded: {str(e)}")
+                self._remove(key)
+                self._save_manifest()
+                return None
+            entry["last_used"] = time.time()
+            self._save_manifest()
+        self.logger.info(f"get: Reusing embeddings of {data['source']} ({key}).")
+        return StoredSource(key, data["source"], data["chunks"], vectors)
+
+    def put(self, key: str, source: str, chunks: list[str], vectors) -> StoredSource:
+        """Stores the chunks and vectors of a source and enforces the size cap."""
+        stored = StoredSource(key, source, list(chunks), np.asarray(vectors, dtype=np.float32))
+        with self._locked():
+            self._write(self._file(key, "npy"), lambda file: np.save(file, stored.vectors))
+            self._write(self._file(key, "json"), lambda file: file.write(
+                json.dumps({"source": source, "chunks": stored.chunks}).encode()))
+            now = time.time()
+            self._manifest[key] = {
+                "source": source,
+                "size": os.path.getsize(self._file(key, "npy")) + os.path.getsize(self._file(key, "json")),
+                "created": now,
+                "last_used": now,
+            }
+            self._collect(keep=key)
+            self._save_manifest()
+        self.logger.info(f"put: Embeddings of {source} stored ({key}).")
+        return stored
+
+    def gc(self) -> list[str]:
+        """Removes stale entries and files that do not belong to any entry, and enforces the size cap."""
+        if not os.path.isdir(self.path):
+            return []
+        with self._locked():
+            known = {self.MANIFEST, f"{self.MANIFEST}.lock"} | {f"{key}.{ext}" for key in self._manifest for ext in ("json", "npy")}
+            for name in os.listdir(self.path):
+                if name not in known and os.path.isfile(os.path.join(self.path, name)):
+                    os.remove(os.path.join(self.path, name))
+            removed = self._collect()
+            self._save_manifest()
+        return removed
+
+    def size(self) -> int:
+        """Returns the bytes used by all entries on disk."""
+        with self._lock:
+            return sum(entry["size"] for entry in self._manifest.values())
+
+    @contextmanager
+    def _locked(self):
+        """Locks the store for this and all other processes and takes over the manifest they saved. Every change
+        is saved before the lock is released, so entries missing from the saved manifest were removed elsewhere."""
+        with self._lock, file_lock(os.path.join(self.path, self.MANIFEST)):
+            saved = self._load_manifest()
+            for key, entry in saved.items():
+                if key in self._manifest:
+                    entry["last_used"] = max(entry["last_used"], self._manifest[key]["last_used"])
+            self._manifest = saved
+            yield
+
+    def _collect(self, keep: str = None) -> list[str]:
+        now = time.time()
+        removed = []
+        if self.max_age is not None:
+            removed = [key for key, entry in self._manifest.items()
+                       if key != keep and now - entry["last_used"] > self.max_age]
+        for key in removed:
+            self._remove(key)
+        if self.max_size is not None:
+            total = sum(entry["size"] for entry in self._manifest.values())
+            for key in sorted((key for key in self._manifest if key != keep),
+                              key=lambda key: self._manifest[key]["last_used"]):
+                if total <= self.max_size:
+                    break
+                total -= self._manifest[key]["size"]
+                self._remove(key)
+                removed.append(key)
+        if removed:
+            self.logger.info(f"_collect: Removed embeddings {removed}.")
+        return removed
+
+    def _remove(self, key: str):
+        self._manifest.pop(key, None)
+        for ext in ("json", "npy"):
+            if os.path.exists(self._file(key, ext)):
+                os.remove(self._file(key, ext))
+
+    def _file(self, key: str, ext: str) -> str:
+        return os.path.join(self.path, f"{key}.{ext}")
+
+    def _write(self, file_path: str, write):
+        """Writes to a temporary file first, so a crash never leaves a half-written entry behind."""
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, "wb") as file:
+            write(file)
+        os.replace(temp_path, file_path)
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.path, self.MANIFEST), "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        self._write(os.path.join(self.path, self.MANIFEST),
+                    lambda file: file.write(json.dumps(self._manifest).encode()))
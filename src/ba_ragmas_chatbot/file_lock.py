@@ -0,0 +1,24 @@
+import os
+
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, where only one bot process may use the files
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str):
+    """Holds an exclusive lock on path + '.lock' across processes, so bot workers sharing a file on disk
+    can read, merge and rewrite it without losing each other's changes."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
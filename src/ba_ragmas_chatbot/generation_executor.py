@@ -0,0 +1,120 @@
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Callable, Hashable, Optional
+
+from src.ba_ragmas_chatbot import logger_config
+
+
+class JobAlreadyRunning(Exception):
+    """Raised when a user submits a generation job while their previous one is still queued or running."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a generation job once its user cancelled it."""
+
+
+class CancelToken:
+    """Cancellation flag of a generation job, which the job checks between its steps."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise JobCancelled("The generation job was cancelled.")
+
+
+# token of the generation job running in the current thread, None outside of jobs
+current_token: ContextVar[Optional[CancelToken]] = ContextVar("current_token", default=None)
+
+
+def check_cancelled():
+    """Raises JobCancelled if the generation job running in the current thread was cancelled."""
+    token = current_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def _run(token: CancelToken, fn: Callable, *args, **kwargs):
+    """Runs a job in a worker thread with its cancel token as current token."""
+    current_token.set(token)
+    token.raise_if_cancelled()
+    return fn(*args, **kwargs)
+
+
+class GenerationExecutor:
+    """Runs blog article generations in a bounded pool of worker threads, allowing one job per user at a time.
+    The jobs run in threads, because the crew's RAG tools cannot be pickled and running jobs have to be cancellable."""
+
+    def __init__(self, max_workers: int = 2):
+        if max_workers < 1:
+            raise ValueError("The generation executor needs at least one worker.")
+        self.max_workers = max_workers
+        self._pool = None
+        self._jobs: dict[Hashable, tuple[Future, CancelToken]] = {}
+        self._lock = threading.Lock()
+        self.logger = logger_config.get_logger("generation executor")
+
+    def _get_pool(self):
+        """Creates the worker pool on first use, so importing the bot does not spawn any workers."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="generation")
+        return self._pool
+
+    def submit(self, user_id: Hashable, fn: Callable, *args, **kwargs) -> tuple[Future, int]:
+        """Schedules a job for the user and returns its future and its queue position (0 means it starts right away)."""
+        with self._lock:
+            if user_id in self._jobs:
+                raise JobAlreadyRunning(f"User {user_id} already has a generation job.")
+            position = max(0, len(self._jobs) - self.max_workers + 1)
+            token = CancelToken()
+            future = self._get_pool().submit(_run, token, fn, *args, **kwargs)
+            self._jobs[user_id] = (future, token)
+        future.add_done_callback(lambda done: self._release(user_id, done))
+        self.logger.info(f"submit: Generation job for user {user_id} submitted at queue position {position}.")
+        return future, position
+
+    def _release(self, user_id: Hashable, future: Future):
+        """Frees the user's slot once their job is finished, failed or cancelled."""
+        with self._lock:
+            if user_id in self._jobs and self._jobs[user_id][0] is future:
+                del self._jobs[user_id]
+        self.logger.info(f"_release: Generation job for user {user_id} finished.")
+
+    def cancel(self, user_id: Hashable) -> bool:
+        """Cancels the user's job and returns if there was one. A queued job never starts, a running job stops at its
+        next check, which aborts its running LLM requests."""
+        with self._lock:
+            job = self._jobs.get(user_id)
+        if job is None:
+            return False
+        future, token = job
+        token.cancel()
+        future.cancel()
+        self.logger.info(f"cancel: Generation job for user {user_id} cancelled.")
+        return True
+
+    def is_busy(self, user_id: Hashable) -> bool:
+        """Returns if the user currently has a queued or running job."""
+        with self._lock:
+            return user_id in self._jobs
+
+    def active_jobs(self) -> int:
+        """Returns the number of queued and running jobs."""
+        with self._lock:
+            return len(self._jobs)
+
+    def shutdown(self, wait: bool = True):
+        """Stops the worker pool, cancelling all jobs that have not started yet."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
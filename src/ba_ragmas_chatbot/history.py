@@ -0,0 +1,104 @@
+from dataclasses import dataclass, field
+from typing import Any
+
+from src.ba_ragmas_chatbot import logger_config
+
+
+USER, ASSISTANT = "User", "Chatbot"
+# rough estimate for English text with the llama tokenizers, good enough for budgeting without loading a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def count_tokens(text: str) -> int:
+    """Estimates the number of tokens of a text."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def clip(text: str, tokens: int) -> str:
+    """Shortens a text to about the given number of tokens, keeping its beginning."""
+    limit = tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return text[:max(limit - 3, 0)].rstrip() + "..."
+
+
+@dataclass
+class ConversationHistory:
+    """Conversation of one chat: the most recent turns word for word, and a summary of all older turns."""
+    summary: str = ""
+    turns: list[tuple[str, str]] = field(default_factory=list)
+
+    def add(self, role: str, text: str):
+        self.turns.append((role, text))
+
+    def tokens(self) -> int:
+        return sum(count_tokens(f"{role}: {text}") for role, text in self.turns)
+
+
+class HistoryManager:
+    """Keeps every conversation within a token budget by summarizing the oldest turns with the LLM,
+    and renders the history for the chat LLM and the crew, each with its own budget."""
+
+    def __init__(self, llm: Any, chat_budget: int = 2000, crew_budget: int = 1000, summary_budget: int = 300):
+        self.llm = llm
+        self.chat_budget = chat_budget
+        self.crew_budget = crew_budget
+        self.summary_budget = summary_budget
+        self.logger = logger_config.get_logger("history manager")
+
+    def get(self, user_data: dict) -> ConversationHistory:
+        """Returns the history stored in the user data, creating it if necessary."""
+        history = user_data.get('history')
+        if not isinstance(history, ConversationHistory):
+            history = ConversationHistory()
+            user_data['history'] = history
+        return history
+
+    def reset(self, user_data: dict):
+        user_data['history'] = ConversationHistory()
+
+    async def compact(self, history: ConversationHistory):
+        """Summarizes the oldest turns once the window exceeds the chat budget, until it fits into half of it again,
+        so the summary is not updated on every turn."""
+        if history.tokens() <= self.chat_budget:
+            return
+        old = []
+        while history.turns and (not old or history.tokens() > self.chat_budget // 2):
+            old.append(history.turns.pop(0))
+        try:
+            history.summary = await self.summarize(history.summary, old)
+        except Exception as e:
+            self.logger.warning(f"compact: Summary could not be created, older turns are dropped: {str(e)}")
+        self.logger.debug(f"compact: {len(old)} turns summarized, {len(history.turns)} turns kept.")
+
+    async def summarize(self, summary: str, turns: list[tuple[str, str]]) -> str:
+        words = self.summary_budget * 3 // 4
+        lines = "\n".join(f"{role}: {clip(text, self.summary_budget)}" for role, text in turns)
+        prompt = (f"Summarize the following conversation in at most {words} words. Keep names, facts, wishes and decisions "
+                  f"of the user, and only answer with the summary.\n\nSummary so far:\n{summary or '-'}\n\nNew messages:\n{lines}")
+        return clip(str(await self.llm.ainvoke(prompt)).strip(), self.summary_budget)
+
+    def for_chat(self, history: ConversationHistory) -> str:
+        """The history as prompt for the chat LLM, ending with the newest message."""
+        return self.render(history, self.chat_budget)
+
+    def for_crew(self, history: ConversationHistory) -> str:
+        """The history as {history} input of the crew tasks."""
+        return self.render(history, self.crew_budget)
+
+    def render(self, history: ConversationHistory, budget: int) -> str:
+        """Renders the summary and as many of the newest turns as fit into the budget, clipping the oldest one shown."""
+        parts = []
+        remaining = budget
+        if history.summary:
+            summary = f"Summary of the earlier conversation: {clip(history.summary, self.summary_budget)}"
+            parts.append(summary)
+            remaining -= count_tokens(summary)
+        recent = []
+        for role, text in reversed(history.turns):
+            if remaining <= 0:
+                break
+            line = clip(f"{role}: {text}", remaining)
+            recent.append(line)
+            remaining -= count_tokens(line)
+        return "\n".join(parts + recent[::-1])
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Coroutine, Hashable, Iterable, Iterator, Optional
+
+import numpy as np
+
+from telegram import Message
+
+from src.ba_ragmas_chatbot import logger_config
+from src.ba_ragmas_chatbot.send_queue import SendQueue
+
+
+class IngestionPipeline:
+    """Embeds a lazily produced stream of chunks in batches, keeping up to max_in_flight batch requests running."""
+
+    def __init__(self, client: Any, model: str, batch_size: int = 16, max_in_flight: int = 4):
+        self.client = client
+        self.model = model
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.logger = logger_config.get_logger("ingestion pipeline")
+
+    def run(self, chunks: Iterable[str], progress: Optional[Callable[[int], None]] = None) -> tuple[list[str], np.ndarray]:
+        """Embeds all chunks in their original order and calls progress with the number of chunks embedded so far."""
+        texts, vectors = [], []
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="embedding") as pool:
+            for batch in self._batches(chunks):
+                if len(in_flight) >= self.max_in_flight:
+                    self._collect(in_flight.popleft(), texts, vectors, progress)
+                in_flight.append((batch, pool.submit(self.embed, batch)))
+            while in_flight:
+                self._collect(in_flight.popleft(), texts, vectors, progress)
+        self.logger.info(f"run: {len(texts)} chunks embedded.")
+        return texts, np.asarray(vectors, dtype=np.float32)
+
+    def embed(self, batch: list[str]) -> list[list[float]]:
+        """Embeds a batch of texts with a single request."""
+        return self.client.embed(model=self.model, input=batch)["embeddings"]
+
+    def _batches(self, chunks: Iterable[str]) -> Iterator[list[str]]:
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _collect(self, job, texts: list, vectors: list, progress):
+        batch, future = job
+        vectors.extend(future.result())
+        texts.extend(batch)
+        if progress is not None:
+            progress(len(texts))
+
+
+class ChatProgress:
+    """Progress callback for the ingestion pipeline, which shows the embedding progress of a source in the chat.
+    It can be called from any thread and edits a single status message at most every interval seconds."""
+
+    def __init__(self, message: Message, loop: asyncio.AbstractEventLoop, name: str, interval: float = 2.0, sender: Optional[SendQueue] = None):
+        self.message = message
+        self.sender = sender
+        self.loop = loop
+        self.name = name
+        self.interval = interval
+        self.logger = logger_config.get_logger("ingestion pipeline")
+        self._lock = threading.Lock()
+        self._sent = None
+        self._last_update = None
+
+    def __call__(self, done: int):
+        with self._lock:
+            now = self.loop.time()
+            if self._last_update is not None and now - self._last_update < self.interval:
+                return
+            self._last_update = now
+        asyncio.run_coroutine_threadsafe(self._show(f"Reading {self.name}: {done} passages processed..."), self.loop)
+
+    async def _show(self, text: str):
+        try:
+            if self._sent is None:
+                self._sent = await self._call(lambda: self.message.reply_text(text))
+            else:
+                sent = self._sent
+                await self._call(lambda: sent.edit_text(text))
+        except Exception as e:
+            self.logger.warning(f"_show: Progress message could not be sent: {str(e)}")
+
+    async def _call(self, action):
+        if self.sender is None:
+            return await action()
+        return await self.sender.run(self.message.chat_id, action)
+
+
+class IngestionJobs:
+    """Keeps track of the sources that are still being ingested in the background, per chat.
+    Must only be used from the event loop."""
+
+    def __init__(self):
+        self._jobs: dict[Hashable, dict[asyncio.Task, str]] = {}
+
+    def start(self, chat_id: Hashable, name: str, coroutine: Coroutine) -> asyncio.Task:
+        """Runs the ingestion coroutine of a source in the background."""
+        task = asyncio.create_task(coroutine)
+        self._jobs.setdefault(chat_id, {})[task] = name
+        task.add_done_callback(lambda done: self._finish(chat_id, done))
+        return task
+
+    def _finish(self, chat_id: Hashable, task: asyncio.Task):
+        jobs = self._jobs.get(chat_id, {})
+        jobs.pop(task, None)
+        if not jobs:
+            self._jobs.pop(chat_id, None)
+
+    def pending(self, chat_id: Hashable) -> list[str]:
+        """Returns the names of the sources of the chat that are not ingested yet."""
+        return list(self._jobs.get(chat_id, {}).values())
+
+    async def wait(self, chat_id: Hashable):
+        """Waits until all pending ingestions of the chat are finished, failed or cancelled."""
+        tasks = list(self._jobs.get(chat_id, {}))
+        if tasks:
+            await asyncio.wait(tasks)
+
+    def cancel(self, chat_id: Hashable):
+        """Cancels all pending ingestions of the chat."""
+        for task in list(self._jobs.get(chat_id, {})):
+            task.cancel()
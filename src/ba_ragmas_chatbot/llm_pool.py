@@ -0,0 +1,122 @@
+import threading
+
+from typing import Optional
+
+import httpx
+
+from crewai import LLM
+from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
+from src.ba_ragmas_chatbot import logger_config
+from src.ba_ragmas_chatbot.generation_executor import CancelToken, check_cancelled, current_token
+
+
+class CancellableStream(httpx.SyncByteStream):
+    """Response body which stops reading and closes the connection as soon as its generation job is cancelled.
+    Ollama stops generating when the client disconnects, so the backend is freed right away."""
+
+    def __init__(self, stream: httpx.SyncByteStream, token: CancelToken):
+        self.stream = stream
+        self.token = token
+
+    def __iter__(self):
+        for chunk in self.stream:
+            if self.token.cancelled:
+                self.stream.close()
+                self.token.raise_if_cancelled()
+            yield chunk
+
+    def close(self):
+        self.stream.close()
+
+
+class CancellableTransport(httpx.BaseTransport):
+    """HTTP transport which lets the generation job of the current thread abort its requests."""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        check_cancelled()
+        response = self.transport.handle_request(request)
+        token = current_token.get()
+        if token is None:
+            return response
+        return httpx.Response(response.status_code, headers=response.headers, stream=CancellableStream(response.stream, token),
+                              extensions=response.extensions)
+
+    def close(self):
+        self.transport.close()
+
+
+class PooledLLM(LLM):
+    """crewai LLM which sends its requests through the keep-alive HTTP client of its backend and waits for a free
+    slot of the backend's request limit before every call. Responses are streamed, so a cancelled job can abort them
+    after any token."""
+
+    def __init__(self, model: str, base_url: Optional[str], limit: threading.Semaphore, client: HTTPHandler, **kwargs):
+        super().__init__(model=model, base_url=base_url, client=client, stream=True, **kwargs)
+        self.limit = limit
+
+    def call(self, *args, **kwargs):
+        while not self.limit.acquire(timeout=0.5):
+            check_cancelled()
+        try:
+            check_cancelled()
+            response = super().call(*args, **kwargs)
+        finally:
+            self.limit.release()
+        # crewai returns the partial answer of an aborted stream, which must not be used
+        check_cancelled()
+        return response
+
+
+class LLMPool:
+    """Process-wide pool of LLM clients, keyed by model and base URL, so all agents and crews share warm clients.
+    All models on the same base URL share one HTTP connection pool and at most max_in_flight concurrent requests."""
+
+    def __init__(self, model: str, base_url: Optional[str], max_in_flight: int = 4, keepalive_connections: int = 8,
+                 overrides: Optional[dict[str, tuple[str, Optional[str]]]] = None):
+        if max_in_flight < 1:
+            raise ValueError("The LLM pool needs to allow at least one request in flight.")
+        self.model = model
+        self.base_url = base_url
+        self.max_in_flight = max_in_flight
+        self.keepalive_connections = keepalive_connections
+        self.overrides = overrides or {}
+        self.logger = logger_config.get_logger("llm pool")
+        self._llms: dict[tuple[str, Optional[str]], PooledLLM] = {}
+        self._backends: dict[Optional[str], tuple[threading.Semaphore, HTTPHandler]] = {}
+        self._lock = threading.Lock()
+
+    def for_agent(self, agent: str) -> LLM:
+        """Returns the LLM of the agent, which is the default model unless the agent has an override."""
+        model, base_url = self.overrides.get(agent, (self.model, None))
+        return self.get(model, base_url or self.base_url)
+
+    def get(self, model: str, base_url: Optional[str]) -> LLM:
+        """Returns the shared LLM for the model and base URL, creating it on first use."""
+        with self._lock:
+            llm = self._llms.get((model, base_url))
+            if llm is None:
+                limit, client = self._backend(base_url)
+                llm = PooledLLM(model=model, base_url=base_url, limit=limit, client=client)
+                self._llms[(model, base_url)] = llm
+                self.logger.info(f"get: LLM client created for {model} at {base_url}.")
+            return llm
+
+    def _backend(self, base_url: Optional[str]) -> tuple[threading.Semaphore, HTTPHandler]:
+        if base_url not in self._backends:
+            limits = httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.keepalive_connections)
+            transport = CancellableTransport(httpx.HTTPTransport(limits=limits))
+            client = HTTPHandler(client=httpx.Client(transport=transport, timeout=httpx.Timeout(600.0, connect=5.0)))
+            self._backends[base_url] = (threading.BoundedSemaphore(self.max_in_flight), client)
+        return self._backends[base_url]
+
+    def close(self):
+        """Closes the HTTP connections of all backends."""
+        with self._lock:
+            for _, client in self._backends.values():
+                client.close()
+            self._backends.clear()
+            self._llms.clear()
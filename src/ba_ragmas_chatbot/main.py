@@ -1,11 +1,15 @@
+import multiprocessing
+import signal
 import sys
 import warnings
 
-from .crew import BaRagmasChatbot
+from .crew import get_crew_factory
 from .chatbot import TelegramBot
+from .webhook_dispatcher import WebhookDispatcher
 from telegram.error import NetworkError
 
 from src.ba_ragmas_chatbot import logger_config
+from src.ba_ragmas_chatbot.settings import get_settings
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
@@ -16,14 +20,51 @@ warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
 def run():
     """
-    Run the telegram chatbot.
+    Run the telegram chatbot, in the mode set in the server section of the configs.yaml.
     """
+    if get_settings().server.mode == "webhook":
+        run_webhook()
+    else:
+        start("polling")
+
+def run_webhook():
+    """
+    Run the telegram chatbot in webhook mode. With several workers, this process receives the updates and
+    forwards the updates of every chat to the same worker process.
+    """
+    settings = get_settings()
+    workers = settings.server.workers
+    if workers <= 1:
+        start("webhook")
+        return
+    # spawned instead of forked, so no worker inherits the threads of the parent
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue() for _ in range(workers)]
+    processes = [context.Process(target=start, args=("webhook", worker, queues[worker]), name=f"webhook worker {worker}") for worker in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        WebhookDispatcher(settings.chatbot_token.token, queues).run(settings.server)
+    finally:
+        # the workers finish the updates they received and shut down
+        for queue in queues:
+            queue.put(None)
+        for process in processes:
+            process.join()
+
+def start(mode: str, worker: int = 0, updates=None):
+    """
+    Create the telegram chatbot and run it until it is stopped.
+    """
+    if updates is not None:
+        # a webhook worker is stopped by the dispatcher, not by the Ctrl+C it receives as well
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
     try:
         logger = logger_config.get_logger("main")
         telegram_bot = TelegramBot()
-        logger.info("run: Telegram bot created.")
-        telegram_bot.start_bot()
-        logger.info("run: Telegram bot started and shut down.")
+        logger.info(f"start: Telegram bot created for worker {worker}.")
+        telegram_bot.start_bot(mode, worker, updates)
+        logger.info("start: Telegram bot started and shut down.")
         logger_config.shutdown()
     except NetworkError as e:
         print("No internet connection, please connect your device to a network and restart the program.")
@@ -36,7 +77,7 @@ def train():
         "topic": "AI LLMs"
     }
     try:
-        BaRagmasChatbot().crew().train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
+        get_crew_factory().build([]).train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
 
     except Exception as e:
         raise Exception(f"An error occurred while training the crew: {e}")
@@ -46,7 +87,7 @@ def replay():
     Replay the crew execution from a specific task.
     """
     try:
-        BaRagmasChatbot().crew().replay(task_id=sys.argv[1])
+        get_crew_factory().build([]).replay(task_id=sys.argv[1])
 
     except Exception as e:
         raise Exception(f"An error occurred while replaying the crew: {e}")
@@ -59,7 +100,7 @@ def test():
         "topic": "AI LLMs"
     }
     try:
-        BaRagmasChatbot().crew().test(n_iterations=int(sys.argv[1]), openai_model_name=sys.argv[2], inputs=inputs)
+        get_crew_factory().build([]).test(n_iterations=int(sys.argv[1]), openai_model_name=sys.argv[2], inputs=inputs)
 
     except Exception as e:
         raise Exception(f"An error occurred while replaying the crew: {e}")
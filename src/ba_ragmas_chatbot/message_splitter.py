@@ -0,0 +1,88 @@
+import re
+
+from typing import Optional
+
+from telegram.constants import MessageLimit, ParseMode
+
+
+# boundaries to cut a long message at, from the most to the least preferred
+BOUNDARIES = (re.compile(r"\n\s*\n"), re.compile(r"\n"), re.compile(r"(?<=[.!?;:])\s+"), re.compile(r"\s+"))
+TAG = re.compile(r"<(/?)([a-zA-Z][\w-]*)[^>]*>")
+ENTITY = re.compile(r"&(?:[a-zA-Z]\w*|#\d+|#x[0-9a-fA-F]+);")
+FENCE = "```"
+
+
+def _is_safe(text: str, position: int, parse_mode: Optional[str]) -> bool:
+    """Returns if cutting the text at position keeps every HTML tag and entity whole. A bare < or & in the text
+    is not markup, so only the ones starting a tag or an entity count."""
+    if parse_mode != ParseMode.HTML:
+        return True
+    for start, markup in (("<", TAG), ("&", ENTITY)):
+        index = text.rfind(start, 0, position)
+        if index >= 0:
+            match = markup.match(text, index)
+            if match and match.end() > position:
+                return False
+    return True
+
+
+def find_cut(text: str, limit: int, parse_mode: Optional[str] = None) -> int:
+    """Returns where to end the first chunk of a text that is longer than limit: at the last paragraph break inside
+    the limit, otherwise at the last line break, sentence end or space, and only as a last resort inside a word."""
+    window = text[:limit + 1]
+    for boundary in BOUNDARIES:
+        cuts = [match.start() for match in boundary.finditer(window) if 0 < match.start() <= limit]
+        for cut in reversed(cuts):
+            if _is_safe(text, cut, parse_mode):
+                return cut
+    cut = limit
+    while cut > 1 and not _is_safe(text, cut, parse_mode):
+        cut -= 1
+    return cut
+
+
+def _open_tags(text: str, tags: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    """Returns the HTML tags that are still open after the text, given the tags that were open before it."""
+    tags = list(tags)
+    for match in TAG.finditer(text):
+        if match.group(1):
+            for index in range(len(tags) - 1, -1, -1):
+                if tags[index][0] == match.group(2).lower():
+                    del tags[index]
+                    break
+        else:
+            tags.append((match.group(2).lower(), match.group(0)))
+    return tags
+
+
+def split_message(text: str, limit: int = MessageLimit.MAX_TEXT_LENGTH, parse_mode: Optional[str] = None) -> list[str]:
+    """Splits a text into chunks of at most limit characters at paragraph, sentence or word boundaries.
+    With HTML, tags that are open at a cut are closed at the end of the chunk and reopened in the next one,
+    with Markdown, an open code block is closed and reopened the same way."""
+    chunks = []
+    tags: list[tuple[str, str]] = []
+    fenced = False
+    rest = text.strip()
+    while rest:
+        if sum(len(tag) + len(name) + 3 for name, tag in tags) > limit // 2:
+            # broken markup that keeps opening tags, carrying them over would leave no room for the text
+            tags = []
+        prefix = "".join(tag for _, tag in tags) + (f"{FENCE}\n" if fenced else "")
+        if len(prefix) + len(rest) <= limit:
+            chunks.append(prefix + rest)
+            break
+        reserve = 0
+        while True:
+            cut = find_cut(rest, max(limit - len(prefix) - reserve, 1), parse_mode)
+            piece = rest[:cut].rstrip()
+            open_tags = _open_tags(piece, tags) if parse_mode == ParseMode.HTML else []
+            open_fence = parse_mode in (ParseMode.MARKDOWN, ParseMode.MARKDOWN_V2) and (fenced != (piece.count(FENCE) % 2 == 1))
+            suffix = "".join(f"</{name}>" for name, _ in reversed(open_tags)) + (f"\n{FENCE}" if open_fence else "")
+            if len(prefix) + len(piece) + len(suffix) <= limit:
+                break
+            reserve = max(reserve + 1, len(suffix))
+        if piece:
+            chunks.append(prefix + piece + suffix)
+        tags, fenced = open_tags, open_fence
+        rest = rest[cut:].lstrip()
+    return chunks
@@ -0,0 +1,80 @@
+import asyncio
+
+from typing import AsyncIterator, Optional
+
+from telegram import Message
+from telegram.constants import MessageLimit, ParseMode
+from telegram.error import BadRequest
+
+from src.ba_ragmas_chatbot import logger_config
+from src.ba_ragmas_chatbot.message_splitter import find_cut
+from src.ba_ragmas_chatbot.send_queue import SendQueue
+
+
+class MessageStreamer:
+    """Shows a streamed LLM answer in a single Telegram message, which is edited in place at a throttled rate."""
+
+    def __init__(self, message: Message, edit_interval: float = 0.5, edit_tokens: int = 20, sender: Optional[SendQueue] = None):
+        self.message = message
+        self.sender = sender
+        self.edit_interval = edit_interval
+        self.edit_tokens = edit_tokens
+        self.logger = logger_config.get_logger("message streamer")
+        self._sent = None
+        self._shown = ""
+        self._offset = 0
+
+    async def stream(self, chunks: AsyncIterator[str]) -> str:
+        """Consumes the token stream, keeps the sent message up to date and returns the complete answer."""
+        loop = asyncio.get_running_loop()
+        text = ""
+        pending = 0
+        last_edit = loop.time()
+        async for chunk in chunks:
+            text += chunk
+            pending += 1
+            if self._sent is None:
+                if text.strip():
+                    await self._show(text)
+                    pending, last_edit = 0, loop.time()
+                continue
+            if pending >= self.edit_tokens or loop.time() - last_edit >= self.edit_interval:
+                await self._show(text)
+                pending, last_edit = 0, loop.time()
+        await self._show(text, final=True)
+        return text
+
+    async def _show(self, text: str, final: bool = False):
+        """Sends or edits the current message, and continues in a new message once the Telegram limit is reached."""
+        while len(text) - self._offset > MessageLimit.MAX_TEXT_LENGTH:
+            cut = find_cut(text[self._offset:], MessageLimit.MAX_TEXT_LENGTH)
+            await self._update(text[self._offset:self._offset + cut])
+            self._offset += cut
+            self._sent, self._shown = None, ""
+        current = text[self._offset:]
+        if not current.strip():
+            if final and self._sent is None and not text.strip():
+                self._sent = await self.message.reply_text("...")
+            return
+        if final:
+            try:
+                await self._update(current, parse_mode=ParseMode.HTML)
+                return
+            except BadRequest as b:
+                # the answer is not valid HTML, so it stays as plain text
+                self.logger.debug(f"_show: Final HTML edit rejected, keeping plain text: {str(b)}")
+        await self._update(current)
+
+    async def _update(self, text: str, parse_mode: str = None):
+        if self._sent is None:
+            self._sent = await self._call(lambda: self.message.reply_text(text, parse_mode=parse_mode))
+        elif text != self._shown or parse_mode is not None:
+            sent = self._sent
+            await self._call(lambda: sent.edit_text(text, parse_mode=parse_mode))
+        self._shown = text
+
+    async def _call(self, action):
+        """Runs a Telegram API call, within the rate limits of the send queue if there is one."""
+        if self.sender is None:
+            return await action()
+        return await self.sender.run(self.message.chat_id, action)
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import os
+import pickle
+import sqlite3
+import threading
+
+from typing import Any, Optional
+
+from telegram import Update
+from telegram.ext import BasePersistence, CallbackContext, ConversationHandler, PersistenceInput
+
+from src.ba_ragmas_chatbot import logger_config
+
+
+USER, CHAT, BOT = "user", "chat", "bot"
+
+
+class SQLitePersistence(BasePersistence):
+    """Stores the conversation states and the user, chat and bot data in a SQLite database, one row per entry.
+    Changes are buffered and written behind in one transaction in a worker thread, so the handlers never wait
+    for the disk. Every row has a version, so with shared set, several bot processes can use the same database
+    and each one reads an entry again before an update only if another process changed it."""
+
+    def __init__(self, path: str, update_interval: float = 5, shared: bool = False):
+        super().__init__(store_data=PersistenceInput(callback_data=False), update_interval=update_interval)
+        self.path = path
+        self.shared = shared
+        self.logger = logger_config.get_logger("persistence")
+        self._versions: dict[tuple[str, str], int] = {}
+        self._pending: dict[tuple[str, str], Optional[bytes]] = {}
+        self._writer: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute("CREATE TABLE IF NOT EXISTS data (kind TEXT, key TEXT, value BLOB, version INTEGER, PRIMARY KEY (kind, key))")
+
+    @staticmethod
+    def conversation_kind(name: str) -> str:
+        return f"conversation:{name}"
+
+    @staticmethod
+    def conversation_key(key: tuple) -> str:
+        return json.dumps(list(key))
+
+    async def get_user_data(self) -> dict[int, dict]:
+        return {int(key): value for key, value in (await asyncio.to_thread(self._load, USER)).items()}
+
+    async def get_chat_data(self) -> dict[int, dict]:
+        return {int(key): value for key, value in (await asyncio.to_thread(self._load, CHAT)).items()}
+
+    async def get_bot_data(self) -> dict:
+        return (await asyncio.to_thread(self._load, BOT)).get("", {})
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        entries = await asyncio.to_thread(self._load, self.conversation_kind(name))
+        return {tuple(json.loads(key)): state for key, state in entries.items()}
+
+    async def update_user_data(self, user_id: int, data: dict):
+        self._queue(USER, str(user_id), data)
+
+    async def update_chat_data(self, chat_id: int, data: dict):
+        self._queue(CHAT, str(chat_id), data)
+
+    async def update_bot_data(self, data: dict):
+        self._queue(BOT, "", data)
+
+    async def update_callback_data(self, data: Any):
+        pass
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]):
+        self._queue(self.conversation_kind(name), self.conversation_key(key), new_state)
+
+    async def drop_user_data(self, user_id: int):
+        self._queue(USER, str(user_id), None)
+
+    async def drop_chat_data(self, chat_id: int):
+        self._queue(CHAT, str(chat_id), None)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict):
+        await self._refresh(USER, str(user_id), user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict):
+        await self._refresh(CHAT, str(chat_id), chat_data)
+
+    async def refresh_bot_data(self, bot_data: dict):
+        await self._refresh(BOT, "", bot_data)
+
+    async def flush(self):
+        """Writes all buffered changes and closes the database, called when the bot shuts down."""
+        if self._writer is not None:
+            await self._writer
+        if self._pending:
+            await self._write_pending()
+        with self._lock:
+            self._db.close()
+
+    def conversation_state(self, name: str, key: tuple) -> tuple[bool, Optional[object]]:
+        """Returns if another process changed the state of a conversation since it was last read, and the new state.
+        It reads the database right away, so it is only meant for shared databases and has to run in a worker thread."""
+        kind, row_key = self.conversation_kind(name), self.conversation_key(key)
+        if (kind, row_key) in self._pending:
+            return False, None
+        row = self._read(kind, row_key)
+        if row is None or row[0] <= self._versions.get((kind, row_key), 0):
+            return False, None
+        self._versions[(kind, row_key)] = row[0]
+        return True, None if row[1] is None else pickle.loads(row[1])
+
+    def _queue(self, kind: str, key: str, value: Optional[object]):
+        """Buffers a change, None deletes the entry, and starts the writer unless it is already running."""
+        self._pending[(kind, key)] = None if value is None else pickle.dumps(value)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_pending())
+
+    async def _write_pending(self):
+        while self._pending:
+            batch, self._pending = self._pending, {}
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except sqlite3.Error as e:
+                # newer changes of the same entries win, the rest is written with the next batch
+                for entry, value in batch.items():
+                    self._pending.setdefault(entry, value)
+                self.logger.error(f"_write_pending: {len(batch)} changes could not be written: {str(e)}")
+                return
+
+    def _write(self, batch: dict[tuple[str, str], Optional[bytes]]):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for (kind, key), value in batch.items():
+                    version = self._db.execute(
+                        "INSERT INTO data (kind, key, value, version) VALUES (?, ?, ?, 1) "
+                        "ON CONFLICT (kind, key) DO UPDATE SET value = excluded.value, version = data.version + 1 RETURNING version",
+                        (kind, key, value),
+                    ).fetchone()[0]
+                    self._versions[(kind, key)] = version
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self.logger.debug(f"_write: {len(batch)} changes written.")
+
+    def _read(self, kind: str, key: str) -> Optional[tuple[int, Optional[bytes]]]:
+        with self._lock:
+            return self._db.execute("SELECT version, value FROM data WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+
+    def _load(self, kind: str) -> dict[str, Any]:
+        with self._lock:
+            rows = self._db.execute("SELECT key, version, value FROM data WHERE kind = ?", (kind,)).fetchall()
+        entries = {}
+        for key, version, value in rows:
+            self._versions[(kind, key)] = version
+            if value is not None:
+                entries[key] = pickle.loads(value)
+        return entries
+
+    async def _refresh(self, kind: str, key: str, data: dict):
+        """Replaces the data with the stored entry if another process changed it, and local changes are not pending."""
+        if not self.shared or (kind, key) in self._pending:
+            return
+        row = await asyncio.to_thread(self._read, kind, key)
+        if row is None or row[0] <= self._versions.get((kind, key), 0):
+            return
+        self._versions[(kind, key)] = row[0]
+        data.clear()
+        if row[1] is not None:
+            data.update(pickle.loads(row[1]))
+
+
+class SharedConversationHandler(ConversationHandler):
+    """ConversationHandler which takes over the state a conversation got in another bot process before every update,
+    so a chat that the load balancer moves to another process, e.g. when its process restarts, continues where it was.
+    check_update cannot wait for the database, so refresh is added as TypeHandler in an earlier handler group,
+    which reads the state in a worker thread before the conversation handler checks the update."""
+
+    def __init__(self, *args, store: Optional[SQLitePersistence] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.store = store
+
+    def conversation_key(self, update: Update) -> tuple:
+        """The key of the conversation of an update, for handlers that are per chat and per user."""
+        return tuple(([update.effective_chat.id] if self.per_chat else []) + ([update.effective_user.id] if self.per_user else []))
+
+    async def refresh(self, update: object, context: Optional[CallbackContext] = None):
+        """Takes over the state of the conversation of the update if another process changed it."""
+        if self.store is None or not self.store.shared or not isinstance(update, Update) or not update.effective_chat or not update.effective_user:
+            return
+        key = self.conversation_key(update)
+        changed, state = await asyncio.to_thread(self.store.conversation_state, self.name, key)
+        if not changed:
+            return
+        # ConversationHandler has no public way to set a state, this is how it loads the states from its persistence,
+        # without reporting them back to the persistence as changed
+        if state is None:
+            self._conversations.data.pop(key, None)
+        else:
+            self._conversations.update_no_track({key: state})
@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import unicodedata
+
+from typing import Any, Optional
+
+import numpy as np
+
+from src.ba_ragmas_chatbot import logger_config
+from src.ba_ragmas_chatbot.cache import TTLCache
+
+
+def normalize_prompt(text: str) -> str:
+    """Normalizes a prompt, so the same question with different case, spacing or final punctuation shares an entry."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(text.split()).rstrip(" ?!.")
+
+
+class ResponseCache:
+    """Caches the answers of the chat LLM in two tiers: an exact tier keyed by the normalized message and context,
+    and an optional semantic tier, which also answers messages whose embedding is similar enough to a cached one
+    with the same context. The semantic entries are indexed by their context, so a message in a context without
+    any entries is neither embedded nor compared."""
+
+    def __init__(self, embedder: Any = None, model: Optional[str] = None, max_entries: int = 1024, ttl: Optional[float] = None,
+                 similarity_threshold: float = 0.92):
+        self.embedder = embedder
+        self.model = model
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.exact = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.semantic = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.embeddings = TTLCache(max_entries=64)
+        self._contexts: dict[str, set[str]] = {}
+        self._indexed = 0
+        self.semantic_hits = 0
+        self.semantic_misses = 0
+        self.logger = logger_config.get_logger("response cache")
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.embedder is not None and self.model is not None
+
+    @staticmethod
+    def key(context: str, message: str) -> str:
+        return hashlib.sha256(f"{normalize_prompt(context)}\x00{normalize_prompt(message)}".encode("utf-8")).hexdigest()
+
+    async def get(self, context: str, message: str) -> Optional[str]:
+        """Returns the cached answer to the message in this context, or None."""
+        response = self.exact.get(self.key(context, message))
+        if response is not None or not self.semantic_enabled:
+            return response
+        keys = self._contexts.get(self.key(context, ""))
+        if not keys:
+            self.semantic_misses += 1
+            return None
+        try:
+            vector = await self.embed(message)
+        except Exception as e:
+            self.logger.warning(f"get: Message could not be embedded, semantic tier skipped: {str(e)}")
+            return None
+        best, best_score = None, self.similarity_threshold
+        for key in list(keys):
+            entry = self.semantic.get(key)
+            if entry is None:
+                # evicted or expired since it was indexed
+                keys.discard(key)
+                self._indexed -= 1
+                continue
+            score = float(np.dot(vector, entry[1]))
+            if score >= best_score:
+                best, best_score = entry[2], score
+        if best is None:
+            self.semantic_misses += 1
+        else:
+            self.semantic_hits += 1
+            self.logger.debug(f"get: Semantic hit with similarity {best_score:.3f}.")
+        return best
+
+    async def set(self, context: str, message: str, response: str):
+        """Caches the answer to the message in this context in both tiers."""
+        key = self.key(context, message)
+        self.exact.set(key, response)
+        if self.semantic_enabled:
+            try:
+                context_key = self.key(context, "")
+                self.semantic.set(key, (context_key, await self.embed(message), response))
+            except Exception as e:
+                self.logger.warning(f"set: Message could not be embedded, only cached exactly: {str(e)}")
+                return
+            keys = self._contexts.setdefault(context_key, set())
+            if key not in keys:
+                keys.add(key)
+                self._indexed += 1
+            if self._indexed > 2 * self.max_entries:
+                self._reindex()
+
+    def _reindex(self):
+        """Rebuilds the context index from the semantic tier, dropping the keys it evicted in the meantime."""
+        self._contexts = {}
+        for key, (context_key, _, _) in self.semantic.items():
+            self._contexts.setdefault(context_key, set()).add(key)
+        self._indexed = sum(len(keys) for keys in self._contexts.values())
+
+    async def embed(self, message: str) -> np.ndarray:
+        """Returns the normalized embedding of the message, remembering the latest ones so get and set embed only once."""
+        normalized = normalize_prompt(message)
+        vector = self.embeddings.get(normalized)
+        if vector is None:
+            output = await asyncio.to_thread(self.embedder.embed, model=self.model, input=[normalized])
+            vector = np.asarray(output["embeddings"][0], dtype=np.float32)
+            vector /= np.linalg.norm(vector) or 1.0
+            self.embeddings.set(normalized, vector)
+        return vector
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "exact_hits": self.exact.hits,
+            "exact_misses": self.exact.misses,
+            "semantic_hits": self.semantic_hits,
+            "semantic_misses": self.semantic_misses,
+        }
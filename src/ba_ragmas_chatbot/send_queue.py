@@ -0,0 +1,160 @@
+import asyncio
+
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from telegram import Message
+from telegram.constants import MessageLimit
+from telegram.error import BadRequest, RetryAfter
+
+from src.ba_ragmas_chatbot import logger_config
+from src.ba_ragmas_chatbot.cache import TTLCache
+from src.ba_ragmas_chatbot.message_splitter import split_message
+
+
+class TokenBucket:
+    """Allows rate calls per second on average and bursts of up to capacity calls. Must only be used from the event loop."""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = None
+
+    async def acquire(self):
+        """Waits until a token is available and takes it."""
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if self._updated is not None:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Empties the bucket, so the next call waits at least the given seconds, e.g. after a RetryAfter."""
+        self._tokens = -seconds * self.rate
+
+
+@dataclass
+class Outgoing:
+    """A queued call to the Telegram API. Text replies with the same parse mode can be merged into one message."""
+    action: Optional[Callable[[], Awaitable[Any]]]
+    message: Optional[Message] = None
+    text: Optional[str] = None
+    parse_mode: Optional[str] = None
+    futures: list[asyncio.Future] = field(default_factory=list)
+
+
+class SendQueue:
+    """Sends all messages of the bot through one queue per chat, limited by a token bucket per chat and a global one.
+    RetryAfter errors pause the chat and are retried, and text replies that pile up in the queue of a chat are merged
+    into as few messages as possible."""
+
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3, max_retries: int = 3):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.coalesced = 0
+        self.logger = logger_config.get_logger("send queue")
+        # buckets of chats that sent nothing for an hour are full again anyway, so they are dropped
+        self._buckets = TTLCache(max_entries=100000, ttl=3600)
+        self._queues: dict[Hashable, list[Outgoing]] = {}
+        self._workers: dict[Hashable, asyncio.Task] = {}
+
+    async def send(self, message: Message, text: str, parse_mode: Optional[str] = None) -> Message:
+        """Replies to the message with a text of at most 4096 characters, returns the sent message."""
+        item = Outgoing(None, message, text, parse_mode)
+        item.action = self._reply_action(item)
+        return await self._enqueue(message.chat_id, item)
+
+    async def reply(self, message: Message, text: str, parse_mode: Optional[str] = None) -> list[Message]:
+        """Replies with a text of any length, split into chunks at paragraph, sentence or word boundaries."""
+        chunks = split_message(text, parse_mode=parse_mode)
+        futures = [asyncio.ensure_future(self.send(message, chunk, parse_mode)) for chunk in chunks]
+        return list(await asyncio.gather(*futures))
+
+    async def run(self, chat_id: Hashable, action: Callable[[], Awaitable[Any]]) -> Any:
+        """Runs any other Telegram API call for the chat, e.g. an edit, within the rate limits."""
+        return await self._enqueue(chat_id, Outgoing(action))
+
+    async def _enqueue(self, chat_id: Hashable, item: Outgoing):
+        future = asyncio.get_running_loop().create_future()
+        item.futures.append(future)
+        self._queues.setdefault(chat_id, []).append(item)
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._work(chat_id))
+        return await future
+
+    async def _work(self, chat_id: Hashable):
+        """Sends the queued items of the chat in order, and ends once the queue is empty."""
+        bucket = self._buckets.get(chat_id) or TokenBucket(self.chat_rate, self.chat_burst)
+        self._buckets.set(chat_id, bucket)
+        queue = self._queues[chat_id]
+        try:
+            while queue:
+                item = self._coalesce(queue)
+                await self._deliver(bucket, item)
+        finally:
+            self._workers.pop(chat_id, None)
+            if not queue:
+                self._queues.pop(chat_id, None)
+
+    def _coalesce(self, queue: list[Outgoing]) -> Outgoing:
+        """Takes the next item, merged with the following text replies to the same message that fit in with it."""
+        item = queue.pop(0)
+        if item.text is None:
+            return item
+        while queue and queue[0].text is not None and queue[0].message is item.message and queue[0].parse_mode == item.parse_mode \
+                and len(item.text) + len(queue[0].text) + 2 <= MessageLimit.MAX_TEXT_LENGTH:
+            following = queue.pop(0)
+            item = Outgoing(None, item.message, f"{item.text}\n\n{following.text}", item.parse_mode, item.futures + following.futures)
+            item.action = self._reply_action(item)
+            self.coalesced += 1
+        return item
+
+    def _reply_action(self, item: Outgoing) -> Callable[[], Awaitable[Any]]:
+        async def action():
+            if item.parse_mode is None:
+                return await item.message.reply_text(item.text)
+            try:
+                return await item.message.reply_text(item.text, parse_mode=item.parse_mode)
+            except BadRequest as b:
+                # e.g. LLM output that is not valid HTML, which is still worth reading as plain text
+                self.logger.debug(f"_reply_action: Message rejected with {item.parse_mode}, sent as plain text: {str(b)}")
+                return await item.message.reply_text(item.text)
+        return action
+
+    async def _deliver(self, bucket: TokenBucket, item: Outgoing):
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                result = await item.action()
+            except RetryAfter as e:
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+                self.logger.warning(f"_deliver: Flood limit reached, retrying in {retry_after} seconds.")
+                bucket.pause(retry_after)
+                if attempt < self.max_retries:
+                    continue
+                self._resolve(item, exception=e)
+                return
+            except Exception as e:
+                self._resolve(item, exception=e)
+                return
+            self._resolve(item, result=result)
+            return
+
+    @staticmethod
+    def _resolve(item: Outgoing, result: Any = None, exception: Optional[BaseException] = None):
+        for future in item.futures:
+            if future.done():
+                continue
+            if exception is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exception)
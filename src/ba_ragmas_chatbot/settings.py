@@ -0,0 +1,254 @@
+import dataclasses
+import os
+import threading
+import types
+import typing
+import yaml
+
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "configs.yaml")
+
+
+class SettingsError(ValueError):
+    """Raised when the configs.yaml is missing a setting or a setting has the wrong type."""
+
+
+@dataclass(frozen=True)
+class ChatbotTokenSettings:
+    # the placeholder {your_token} is parsed as a mapping, so the token is only checked when the bot is started
+    token: Any
+
+
+@dataclass(frozen=True)
+class AgentOverrideSettings:
+    llm: str
+    url: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class AgentsSettings:
+    llm: str
+    url: str
+    max_in_flight: int
+    keepalive_connections: int
+    overrides: dict[str, AgentOverrideSettings]
+
+
+@dataclass(frozen=True)
+class ModelSettings:
+    name: str
+    provider_name: str
+    url: str
+
+
+@dataclass(frozen=True)
+class StreamingSettings:
+    enabled: bool
+    edit_interval: float
+    edit_tokens: int
+
+
+@dataclass(frozen=True)
+class ResponseCacheSettings:
+    enabled: bool
+    semantic: bool
+    similarity_threshold: float
+    max_entries: int
+    ttl: Optional[float]
+
+
+@dataclass(frozen=True)
+class SendQueueSettings:
+    global_rate: float
+    chat_rate: float
+    chat_burst: float
+    max_retries: int
+
+
+@dataclass(frozen=True)
+class ServerSettings:
+    mode: str
+    listen: str
+    port: int
+    url_path: str
+    workers: int
+    webhook_url: Optional[str] = None
+    secret_token: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ChatbotSettings:
+    llm: ModelSettings
+    streaming: StreamingSettings
+    response_cache: ResponseCacheSettings
+    embedding_model: ModelSettings
+    concurrent_updates: int = 64
+
+
+@dataclass(frozen=True)
+class HistorySettings:
+    chat_budget: int
+    crew_budget: int
+    summary_budget: int
+
+
+@dataclass(frozen=True)
+class PersistenceSettings:
+    update_interval: float
+    path: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class CacheSettings:
+    max_entries: int
+    ttl: Optional[float]
+    path: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class GenerationSettings:
+    max_workers: int
+    task_progress: bool
+    cache: CacheSettings
+
+
+@dataclass(frozen=True)
+class ToolRegistrySettings:
+    idle_timeout: float
+    max_memory_mb: Optional[float]
+
+
+@dataclass(frozen=True)
+class EmbeddingStoreSettings:
+    path: str
+    chunk_size: int
+    chunk_overlap: int
+    max_size_mb: Optional[float]
+    max_age_days: Optional[float]
+
+
+@dataclass(frozen=True)
+class RetrievalSettings:
+    limit: int
+    candidates: int
+    rrf_k: int
+
+
+@dataclass(frozen=True)
+class DocumentStorageSettings:
+    path: str
+    max_file_size_mb: Optional[float]
+    max_age_days: Optional[float]
+
+
+@dataclass(frozen=True)
+class IngestionSettings:
+    batch_size: int
+    max_in_flight: int
+    progress_interval: float
+
+
+@dataclass(frozen=True)
+class SearchSettings:
+    backend: str
+    top_k: int
+    local_index: Optional[str]
+    cache: CacheSettings
+
+
+@dataclass(frozen=True)
+class FactCheckSettings:
+    max_concurrency: int
+    batch_size: int
+    cache: CacheSettings
+    search: SearchSettings
+
+
+@dataclass(frozen=True)
+class Settings:
+    """All settings of the configs.yaml, one attribute per section."""
+    chatbot_token: ChatbotTokenSettings
+    server: ServerSettings
+    agents: AgentsSettings
+    chatbot: ChatbotSettings
+    history: HistorySettings
+    persistence: PersistenceSettings
+    generation: GenerationSettings
+    send_queue: SendQueueSettings
+    tool_registry: ToolRegistrySettings
+    embedding_store: EmbeddingStoreSettings
+    document_storage: DocumentStorageSettings
+    retrieval: RetrievalSettings
+    ingestion: IngestionSettings
+    fact_check: FactCheckSettings
+
+
+def load_settings(path: str = CONFIG_FILE) -> Settings:
+    """Parses and validates a configs.yaml."""
+    with open(path, "r") as file:
+        config = yaml.safe_load(file)
+    return _build(Settings, config, "configs.yaml")
+
+
+def _build(cls, data: Any, section: str):
+    """Creates the settings dataclass cls from a parsed YAML mapping, checking that every value has the declared type."""
+    if not isinstance(data, dict):
+        raise SettingsError(f"{section} has to be a mapping.")
+    hints = typing.get_type_hints(cls)
+    values = {}
+    for field in dataclasses.fields(cls):
+        name = f"{section}.{field.name}"
+        if field.name not in data:
+            if field.default is not dataclasses.MISSING:
+                continue
+            raise SettingsError(f"Setting {name} is missing.")
+        values[field.name] = _convert(hints[field.name], data[field.name], name)
+    return cls(**values)
+
+
+def _convert(hint, value: Any, name: str):
+    optional = isinstance(hint, types.UnionType) or typing.get_origin(hint) is typing.Union
+    if optional:
+        if value is None:
+            return None
+        hint = next(arg for arg in typing.get_args(hint) if arg is not type(None))
+    if hint is Any:
+        return value
+    if dataclasses.is_dataclass(hint):
+        return _build(hint, value, name)
+    if typing.get_origin(hint) is dict:
+        key_hint, value_hint = typing.get_args(hint)
+        if value is None:
+            return {}
+        if not isinstance(value, dict):
+            raise SettingsError(f"Setting {name} has to be a mapping.")
+        return {_convert(key_hint, key, name): _convert(value_hint, item, f"{name}.{key}") for key, item in value.items()}
+    if hint is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, hint) or (hint is int and isinstance(value, bool)):
+        raise SettingsError(f"Setting {name} has to be of type {hint.__name__}, but is {value!r}.")
+    return value
+
+
+_settings: Optional[Settings] = None
+_lock = threading.Lock()
+
+
+def get_settings() -> Settings:
+    """Returns the settings, parsing the configs.yaml only on the first call."""
+    global _settings
+    with _lock:
+        if _settings is None:
+            _settings = load_settings()
+        return _settings
+
+
+def reload_settings() -> Settings:
+    """Parses the configs.yaml again. Components that were already created keep the settings they were created with."""
+    global _settings
+    with _lock:
+        _settings = load_settings()
+        return _settings
@@ -0,0 +1,104 @@
+import threading
+
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Hashable
+
+from src.ba_ragmas_chatbot import logger_config
+from src.ba_ragmas_chatbot.embedding_store import StoredSource
+
+
+@dataclass
+class CatalogEntry:
+    """A source shared by several chats, with the number of times every chat added it."""
+    job: Future
+    chats: dict[Hashable, int] = field(default_factory=dict)
+
+
+class SourceCatalog:
+    """Process-wide catalog of the sources in use, keyed by URL and version or by content hash, so a source that
+    several chats send is only fetched, embedded and held in memory once. Chats reference the entries they added,
+    and an entry is dropped as soon as the last chat released it."""
+
+    def __init__(self):
+        self.shared = 0
+        self._entries: dict[str, CatalogEntry] = {}
+        self._lock = threading.Lock()
+        self.logger = logger_config.get_logger("source catalog")
+
+    def acquire(self, key: str, chat_id: Hashable, load: Callable[[], StoredSource]) -> StoredSource:
+        """Returns the source for the key and references it for the chat. The source is loaded by the first chat
+        that asks for it, chats asking while it is being loaded wait for it instead of loading it again."""
+        with self._lock:
+            entry = self._entries.get(key)
+            loading = entry is None
+            if loading:
+                entry = CatalogEntry(Future())
+                self._entries[key] = entry
+            else:
+                self.shared += 1
+            entry.chats[chat_id] = entry.chats.get(chat_id, 0) + 1
+        if loading:
+            try:
+                entry.job.set_result(load())
+            except BaseException as e:
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+                entry.job.set_exception(e)
+                raise
+            self.logger.info(f"acquire: Source {key} loaded for chat {chat_id}.")
+        else:
+            self.logger.info(f"acquire: Source {key} shared with chat {chat_id}.")
+        try:
+            return entry.job.result()
+        except BaseException:
+            self._release(key, entry, chat_id)
+            raise
+
+    def release(self, chat_id: Hashable) -> list[str]:
+        """Releases all sources of the chat and returns the keys of the sources no chat uses anymore."""
+        with self._lock:
+            dropped = []
+            for key, entry in list(self._entries.items()):
+                if entry.chats.pop(chat_id, None) is not None and not entry.chats:
+                    del self._entries[key]
+                    dropped.append(key)
+        if dropped:
+            self.logger.info(f"release: Sources {dropped} dropped with chat {chat_id}.")
+        return dropped
+
+    def release_source(self, key: str, chat_id: Hashable) -> bool:
+        """Releases one reference of the chat to the source and returns if the source was dropped,
+        because no chat uses it anymore."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or chat_id not in entry.chats:
+                return False
+            count = entry.chats.pop(chat_id) - 1
+            if count > 0:
+                entry.chats[chat_id] = count
+                return False
+            if entry.chats:
+                return False
+            del self._entries[key]
+        self.logger.info(f"release_source: Source {key} dropped with chat {chat_id}.")
+        return True
+
+    def references(self, key: str) -> dict[Hashable, int]:
+        """Returns how often every chat references the source."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry.chats) if entry else {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _release(self, key: str, entry: CatalogEntry, chat_id: Hashable):
+        with self._lock:
+            count = entry.chats.get(chat_id, 0) - 1
+            if count > 0:
+                entry.chats[chat_id] = count
+            else:
+                entry.chats.pop(chat_id, None)
@@ -0,0 +1,41 @@
+import asyncio
+
+from telegram import Message
+
+from src.ba_ragmas_chatbot import logger_config
+from src.ba_ragmas_chatbot.send_queue import SendQueue
+
+
+# what the user is shown when a task of the crew is finished, and if the task's output is shown as well.
+# The output of the last task is the article itself, which is sent when the job is finished.
+UPDATES = {
+    "research_task": ("Research done, now planning the structure of your blog article...", False),
+    "editor_task": ("The outline is ready, now writing the draft. Here is the outline:", True),
+    "writer_task": ("The draft is ready, now proofreading it. Here is the draft:", True),
+}
+
+
+class TaskProgress:
+    """Task callback for the crew, which sends the result of every finished task to the chat.
+    It is called from the generation worker thread and waits until the message is sent, so the updates and the
+    final article always arrive in order."""
+
+    def __init__(self, message: Message, loop: asyncio.AbstractEventLoop, sender: SendQueue, timeout: float = 30):
+        self.message = message
+        self.sender = sender
+        self.loop = loop
+        self.timeout = timeout
+        self.logger = logger_config.get_logger("task progress")
+
+    def __call__(self, task: str, output: str):
+        if task not in UPDATES:
+            return
+        headline, show_output = UPDATES[task]
+        text = f"{headline}\n\n{output}" if show_output else headline
+        try:
+            asyncio.run_coroutine_threadsafe(self._send(text), self.loop).result(self.timeout)
+        except Exception as e:
+            self.logger.warning(f"__call__: Progress of {task} could not be sent: {str(e)}")
+
+    async def _send(self, text: str):
+        await self.sender.reply(self.message, text)
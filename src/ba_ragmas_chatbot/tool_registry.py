@@ -0,0 +1,119 @@
+import threading
+import time
+
+from dataclasses import dataclass, field
+from typing import Callable, Hashable, Optional
+
+from src.ba_ragmas_chatbot import logger_config
+
+
+@dataclass
+class RegistryEntry:
+    """The RAG tools of one chat and the names of their sources, together with their estimated memory footprint and last use."""
+    tools: list = field(default_factory=list)
+    names: list = field(default_factory=list)
+    size: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class ToolRegistry:
+    """Keeps the RAG tools of every chat apart, so each crew only searches the sources of its own user.
+    Chats that were idle for longer than idle_timeout seconds are evicted, and if the total estimated size
+    exceeds max_memory_mb, the least recently used chats are evicted first. The names of evicted sources are kept
+    until the chat asks for them with evicted, so it can tell its user. on_remove is called with the id of every
+    chat whose tools were cleared or evicted."""
+
+    def __init__(self, idle_timeout: float = 3600, max_memory_mb: Optional[float] = None,
+                 on_remove: Optional[Callable[[Hashable], None]] = None):
+        self.idle_timeout = idle_timeout
+        self.on_remove = on_remove
+        self.max_memory = int(max_memory_mb * 1024 * 1024) if max_memory_mb else None
+        self._entries: dict[Hashable, RegistryEntry] = {}
+        self._evicted: dict[Hashable, list] = {}
+        self._lock = threading.Lock()
+        self.logger = logger_config.get_logger("tool registry")
+
+    def add(self, chat_id: Hashable, tool, size: int = 0, name: Optional[str] = None):
+        """Registers a tool for the chat, size being the estimated bytes and name the name of the source it searches."""
+        with self._lock:
+            entry = self._entries.setdefault(chat_id, RegistryEntry())
+            entry.tools.append(tool)
+            if name is not None:
+                entry.names.append(name)
+                # the source was added again, so it is no longer missing
+                missing = self._evicted.get(chat_id, [])
+                if name in missing:
+                    missing.remove(name)
+            entry.size += size
+            entry.last_used = time.monotonic()
+            evicted = self._evict(keep=chat_id)
+        self._removed(evicted)
+        self.logger.info(f"add: Tool added for chat {chat_id}, chat now uses {entry.size} bytes.")
+
+    def get(self, chat_id: Hashable) -> list:
+        """Returns a copy of the tools of the chat and marks the chat as used."""
+        with self._lock:
+            evicted = self._evict(keep=chat_id)
+            entry = self._entries.get(chat_id)
+            if entry is not None:
+                entry.last_used = time.monotonic()
+            tools = list(entry.tools) if entry else []
+        self._removed(evicted)
+        return tools
+
+    def clear(self, chat_id: Hashable):
+        """Removes all tools of the chat."""
+        with self._lock:
+            self._entries.pop(chat_id, None)
+            self._evicted.pop(chat_id, None)
+        self._removed([chat_id])
+        self.logger.info(f"clear: Tools of chat {chat_id} removed.")
+
+    def evicted(self, chat_id: Hashable) -> list:
+        """Returns the names of the sources of the chat that were evicted since the last call, and forgets them."""
+        with self._lock:
+            return self._evicted.pop(chat_id, [])
+
+    def memory_usage(self, chat_id: Hashable = None) -> int:
+        """Returns the estimated bytes used by the chat, or by all chats if no chat is given."""
+        with self._lock:
+            if chat_id is not None:
+                entry = self._entries.get(chat_id)
+                return entry.size if entry else 0
+            return sum(entry.size for entry in self._entries.values())
+
+    def evict_idle(self) -> list:
+        """Evicts all chats that exceeded the idle timeout and returns their ids."""
+        with self._lock:
+            evicted = self._evict()
+        self._removed(evicted)
+        return evicted
+
+    def _removed(self, chat_ids: list):
+        if self.on_remove is not None:
+            for chat_id in chat_ids:
+                self.on_remove(chat_id)
+
+    def _evict(self, keep: Hashable = None) -> list:
+        now = time.monotonic()
+        evicted = [chat_id for chat_id, entry in self._entries.items()
+                   if chat_id != keep and now - entry.last_used > self.idle_timeout]
+        for chat_id in evicted:
+            self._forget(chat_id, self._entries.pop(chat_id))
+        if self.max_memory is not None:
+            by_age = sorted(((entry.last_used, chat_id) for chat_id, entry in self._entries.items() if chat_id != keep),
+                            key=lambda item: item[0])
+            total = sum(entry.size for entry in self._entries.values())
+            for _, chat_id in by_age:
+                if total <= self.max_memory:
+                    break
+                entry = self._entries.pop(chat_id)
+                self._forget(chat_id, entry)
+                total -= entry.size
+                evicted.append(chat_id)
+        if evicted:
+            self.logger.info(f"_evict: Tools of chats {evicted} evicted.")
+        return evicted
+
+    def _forget(self, chat_id: Hashable, entry: RegistryEntry):
+        self._evicted.setdefault(chat_id, []).extend(entry.names)
@@ -1,12 +1,28 @@
-import os
-import yaml
+import asyncio
+import re
+import unicodedata
 import ollama
 
 from crewai.tools import BaseTool
 from typing import Type, Optional
 
 from pydantic import BaseModel, Field
-from duckduckgo_api_haystack import DuckduckgoApiWebSearch
+from src.ba_ragmas_chatbot.cache import TTLCache
+from src.ba_ragmas_chatbot.generation_executor import check_cancelled
+from src.ba_ragmas_chatbot.settings import get_settings
+from src.ba_ragmas_chatbot.tools.search_backend import DuckDuckGoBackend, SearchBackend
+
+
+# signs and decimal or thousands separators of numbers, which change the claim
+NUMBER_PUNCTUATION = r"(?<!\w)[-\u2212](?=\d)|(?<=\d)[.,](?=\d)"
+
+
+def normalize_claim(claim: str) -> str:
+    """Normalizes a claim, so the same fact worded with different case, punctuation or spacing shares a cache entry.
+    Signs and separators inside numbers are kept, so -125 and 125 or 1.5 and 15 stay different claims."""
+    claim = unicodedata.normalize("NFKC", claim).casefold()
+    claim = re.sub(rf"({NUMBER_PUNCTUATION})|[^\w\s]", lambda match: match.group(1) or " ", claim)
+    return " ".join(claim.replace("\u2212", "-").split())
 
 class FactCheckToolInput(BaseModel):
     """Input schema for FactCheckTool."""
@@ -18,14 +34,35 @@ class FactCheckTool(BaseTool):
         "This tool allows agents to verify a fact and returns if it is true or false."
     )
     args_schema: Type[BaseModel] = FactCheckToolInput
+    max_concurrency: int = 4
+    batch_size: int = 1
+    # seconds between the checks if the generation job was cancelled while the LLM calls run
+    cancel_interval: float = 0.5
+    cache: Optional[TTLCache] = None
+    search: SearchBackend = Field(default_factory=DuckDuckGoBackend)
+    model: str = Field(default_factory=lambda: get_settings().chatbot.llm.name)
+    host: str = Field(default_factory=lambda: get_settings().chatbot.llm.url)
 
     def _run(self, argument: str) -> str:
-        is_true, source = self.fact_check_with_duckduckgo(argument)
+        check_cancelled()
+        is_true, source = self.cached_fact_check(argument)
         if is_true:
             return str(True)
         else:
             return str(False)
 
+    def cached_fact_check(self, fact: str) -> tuple[bool, Optional[str]]:
+        """Returns the verdict and supporting link of the fact from the cache, and only checks it if it is not cached."""
+        if self.cache is None:
+            return self.fact_check_with_duckduckgo(fact)
+        key = normalize_claim(fact)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached[0], cached[1]
+        is_true, source = self.fact_check_with_duckduckgo(fact)
+        self.cache.set(key, [is_true, source])
+        return is_true, source
+
     def fact_check_with_duckduckgo(self, fact: str) -> tuple[bool, str] | tuple[bool, None]:
         """Fact-check the statement using DuckDuckGo."""
         search_result = self.search_duckduckgo(fact)
@@ -35,30 +72,52 @@ class FactCheckTool(BaseTool):
             return False, None
 
     def search_duckduckgo(self, query: str) -> Optional[str]:
-        """Query DuckDuckGo for a fact and extract reliable snippets."""
-        websearch = DuckduckgoApiWebSearch(top_k=10, backend="auto")
-        results = websearch.run(query=query)
-
-        documents = results["documents"]
-        links = results["links"]
-
+        """Query the search backend, DuckDuckGo by default, for a fact and extract reliable snippets."""
+        documents, links = self.search.search(query)
         return self.check_if_true(documents, links, query)
 
     def check_if_true(self, documents: [], links: [], prompt: str)-> Optional[str]:
-        for d, l in zip(documents, links):
-            output = ollama.generate(
-                model=self.get_llm(),
-                prompt=f"Using this data: {d}. Check if this is true or false: {prompt}. If it is true, reply with 'yes', if it is false, reply with 'no'."
-            )
-            if "yes" in str(output).lower():
-                return l
+        """Checks the snippets concurrently and returns the link of the first one that confirms the fact."""
+        return asyncio.run(self.verify(list(zip(documents, links)), prompt))
+
+    async def verify(self, snippets: list[tuple[str, str]], prompt: str) -> Optional[str]:
+        """Verifies groups of batch_size snippets in parallel, with at most max_concurrency LLM calls at a time.
+        As soon as one group confirms the fact, or the generation job is cancelled, all outstanding calls are cancelled."""
+        client = ollama.AsyncClient(host=self.host)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        groups = [snippets[i:i + self.batch_size] for i in range(0, len(snippets), self.batch_size)]
+        tasks = [asyncio.create_task(self.check_group(client, semaphore, group, prompt)) for group in groups]
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=self.cancel_interval, return_when=asyncio.FIRST_COMPLETED)
+                check_cancelled()
+                for task in sorted(done, key=tasks.index):
+                    link = task.result()
+                    if link is not None:
+                        return link
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def check_group(self, client: ollama.AsyncClient, semaphore: asyncio.Semaphore, group: list[tuple[str, str]], prompt: str) -> Optional[str]:
+        """Asks the LLM if the fact is confirmed by a single snippet, or by one of several numbered snippets at once."""
+        if len(group) == 1:
+            question = f"Using this data: {group[0][0]}. Check if this is true or false: {prompt}. If it is true, reply with 'yes', if it is false, reply with 'no'."
+        else:
+            sources = "\n".join(f"[{number}] {document}" for number, (document, _) in enumerate(group, start=1))
+            question = f"Using these numbered sources:\n{sources}\nCheck if this is true or false: {prompt}. Reply with the numbers of all sources that confirm it, separated by commas, or with 'none' if no source confirms it."
+        async with semaphore:
+            output = await client.generate(model=self.get_llm(), prompt=question)
+        answer = str(output["response"]).lower()
+        if len(group) == 1:
+            return group[0][1] if "yes" in answer else None
+        for number in re.findall(r"\d+", answer):
+            if 1 <= int(number) <= len(group):
+                return group[int(number) - 1][1]
         return None
 
     def get_llm(self) -> str:
-        base_dir = os.path.dirname(__file__)
-        root_dir = os.path.dirname(base_dir)
-        yaml_file = os.path.join(root_dir, "config", "configs.yaml")
-        with open(yaml_file, 'r') as file:
-            config = yaml.safe_load(file)
-        llm_name = config['chatbot']['llm']['name']
-        return llm_name
+        return self.model
@@ -0,0 +1,62 @@
+from typing import Type
+
+import numpy as np
+
+from crewai.tools import BaseTool
+from pydantic import BaseModel, Field
+
+from src.ba_ragmas_chatbot.bm25 import bm25_scores
+from src.ba_ragmas_chatbot.embedding_store import StoredSource
+from src.ba_ragmas_chatbot.generation_executor import check_cancelled
+from src.ba_ragmas_chatbot.ingestion import IngestionPipeline
+
+
+class HybridSearchToolInput(BaseModel):
+    """Input schema for HybridSearchTool."""
+    query: str = Field(..., description="What to look for in the websites and documents of the user.")
+
+
+class HybridSearchTool(BaseTool):
+    """Searches all sources of a user at once, by the words of the query with BM25 and by its meaning with the
+    embedding vectors, and merges both rankings with reciprocal rank fusion."""
+    name: str = "search_user_sources"
+    description: str = (
+        "This tool searches all websites and documents the user provided at once and returns the most relevant "
+        "passages together with their source."
+    )
+    args_schema: Type[BaseModel] = HybridSearchToolInput
+    sources: list[StoredSource] = Field(default_factory=list)
+    # the name the user knows a source by, by the key of the stored source
+    names: dict[str, str] = Field(default_factory=dict)
+    pipeline: IngestionPipeline
+    limit: int = 5
+    candidates: int = 20
+    rrf_k: int = 60
+
+    def _run(self, query: str) -> str:
+        check_cancelled()
+        return "\n\n".join(f"Source: {source}\n{chunk}" for source, chunk in self.search(query))
+
+    def search(self, query: str) -> list[tuple[str, str]]:
+        """Returns the source and text of the best passages for the query across all sources."""
+        sources = [stored for stored in self.sources if len(stored.chunks)]
+        if not sources:
+            return []
+        passages = [(self.names.get(stored.key, stored.source), chunk) for stored in sources for chunk in stored.chunks]
+        fused = np.zeros(len(passages), dtype=np.float64)
+        for ranking in (self._dense_ranking(query, sources), self._sparse_ranking(query, sources)):
+            for rank, position in enumerate(ranking):
+                fused[position] += 1 / (self.rrf_k + rank + 1)
+        best = [position for position in np.argsort(-fused, kind="stable")[:self.limit] if fused[position] > 0]
+        return [passages[position] for position in best]
+
+    def _dense_ranking(self, query: str, sources: list[StoredSource]) -> np.ndarray:
+        vectors = np.vstack([stored.vectors for stored in sources])
+        embedded = np.asarray(self.pipeline.embed([query])[0], dtype=np.float32)
+        scores = vectors @ embedded / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(embedded) + 1e-10)
+        return np.argsort(-scores, kind="stable")[:self.candidates]
+
+    def _sparse_ranking(self, query: str, sources: list[StoredSource]) -> np.ndarray:
+        scores = bm25_scores(query, [stored.index for stored in sources])
+        ranking = np.argsort(-scores, kind="stable")[:self.candidates]
+        return ranking[scores[ranking] > 0]
@@ -0,0 +1,90 @@
+import json
+import re
+import threading
+
+from abc import ABC, abstractmethod
+
+from duckduckgo_api_haystack import DuckduckgoApiWebSearch
+
+from src.ba_ragmas_chatbot import logger_config
+from src.ba_ragmas_chatbot.cache import TTLCache
+from src.ba_ragmas_chatbot.settings import SearchSettings
+
+
+class SearchBackend(ABC):
+    """Web search used by the fact check tool."""
+
+    @abstractmethod
+    def search(self, query: str) -> tuple[list[str], list[str]]:
+        """Returns the text snippets found for the query and their links, in the same order."""
+
+
+class DuckDuckGoBackend(SearchBackend):
+    """Searches DuckDuckGo with one long-lived client per thread, so its pooled HTTP connections are reused across
+    queries, while the fact checks of different threads search at the same time."""
+
+    def __init__(self, top_k: int = 10, backend: str = "auto"):
+        self.top_k = top_k
+        self.backend = backend
+        self._local = threading.local()
+
+    def search(self, query: str) -> tuple[list[str], list[str]]:
+        websearch = getattr(self._local, "websearch", None)
+        if websearch is None:
+            websearch = self._local.websearch = DuckduckgoApiWebSearch(top_k=self.top_k, backend=self.backend)
+        results = websearch.run(query=query)
+        documents = [str(getattr(document, "content", document)) for document in results["documents"]]
+        return documents, list(results["links"])
+
+
+class LocalIndexBackend(SearchBackend):
+    """Offline stand-in for the web search, which ranks a fixed list of snippets by the words they share with the query.
+    Useful for tests and deployments without internet access."""
+
+    def __init__(self, entries: list[tuple[str, str]], top_k: int = 10):
+        self.entries = entries
+        self.top_k = top_k
+
+    @classmethod
+    def from_file(cls, path: str, top_k: int = 10) -> "LocalIndexBackend":
+        """Loads the index from a JSON file containing a list of {"content": ..., "link": ...} objects."""
+        with open(path, "r") as file:
+            return cls([(entry["content"], entry["link"]) for entry in json.load(file)], top_k)
+
+    def search(self, query: str) -> tuple[list[str], list[str]]:
+        words = set(re.findall(r"\w+", query.lower()))
+        scored = [(len(words & set(re.findall(r"\w+", content.lower()))), content, link) for content, link in self.entries]
+        ranked = sorted((entry for entry in scored if entry[0] > 0), key=lambda entry: -entry[0])[:self.top_k]
+        return [content for _, content, _ in ranked], [link for _, _, link in ranked]
+
+
+class CachedSearchBackend(SearchBackend):
+    """Caches the results of another search backend, so repeated queries need no network round trip."""
+
+    def __init__(self, backend: SearchBackend, cache: TTLCache):
+        self.backend = backend
+        self.cache = cache
+        self.logger = logger_config.get_logger("search backend")
+
+    def search(self, query: str) -> tuple[list[str], list[str]]:
+        key = " ".join(query.split()).casefold()
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.logger.debug(f"search: Cache hit for query {query}")
+            return cached[0], cached[1]
+        documents, links = self.backend.search(query)
+        self.cache.set(key, [documents, links])
+        return documents, links
+
+
+def create_backend(settings: SearchSettings) -> SearchBackend:
+    """Creates the search backend configured in the fact_check.search section of the configs.yaml."""
+    match settings.backend:
+        case "duckduckgo":
+            backend = DuckDuckGoBackend(top_k=settings.top_k)
+        case "local":
+            backend = LocalIndexBackend.from_file(settings.local_index, top_k=settings.top_k)
+        case _:
+            raise ValueError(f"Unknown search backend: {settings.backend}")
+    cache = TTLCache(max_entries=settings.cache.max_entries, ttl=settings.cache.ttl)
+    return CachedSearchBackend(backend, cache)
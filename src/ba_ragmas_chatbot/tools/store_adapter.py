@@ -0,0 +1,96 @@
+from typing import Any, BinaryIO, Callable, Hashable, Optional
+
+import numpy as np
+
+from crewai_tools.tools.rag.rag_tool import Adapter
+from pydantic import Field
+
+from src.ba_ragmas_chatbot.document_loader import WEBSITE, chunk_text, hash_source, iter_text, open_source, source_kind, website_version
+from src.ba_ragmas_chatbot.document_storage import DocumentStorage
+from src.ba_ragmas_chatbot.embedding_store import EmbeddingStore, StoredSource
+from src.ba_ragmas_chatbot.ingestion import IngestionPipeline
+from src.ba_ragmas_chatbot.source_catalog import SourceCatalog
+
+
+class StoreAdapter(Adapter):
+    """Knowledge base of a crewai_tools search tool, backed by the persistent embedding store.
+    Sources that were already embedded with the same model and chunking are loaded instead of embedded again,
+    new ones are streamed through the ingestion pipeline. With a catalog, sources that other chats already use
+    are shared with them, websites with an ETag or Last-Modified header without even downloading them again, and
+    documents of the document storage without reading them again, as their hash is part of their name.
+    A shared source keeps the name the first chat gave it, so every adapter keeps the names its own chat knows
+    the sources by, e.g. the file name of an upload instead of its path in the document storage."""
+    store: EmbeddingStore
+    pipeline: IngestionPipeline
+    catalog: Optional[SourceCatalog] = None
+    documents: Optional[DocumentStorage] = None
+    chat_id: Optional[Hashable] = None
+    name: Optional[str] = None
+    limit: int = 5
+    progress: Optional[Callable[[int], None]] = None
+    sources: list[StoredSource] = Field(default_factory=list)
+    names: dict[str, str] = Field(default_factory=dict)
+    # catalog entries this adapter references for its chat
+    keys: list[str] = Field(default_factory=list)
+
+    def add(self, *args: Any, **kwargs: Any) -> None:
+        """Adds a source, e.g. add('documents/file.pdf', data_type=DataType.PDF_FILE)."""
+        source = str(args[0])
+        kind = source_kind(kwargs.get("data_type"))
+        version = website_version(source) if kind == WEBSITE and self.catalog is not None else None
+        content_hash = self.documents.hash_of(source) if kind != WEBSITE and self.documents is not None else None
+        if version is not None:
+            stored = self._acquire(f"{WEBSITE}:{source}|{version}", lambda: self._read(source, kind))
+        elif content_hash is not None:
+            stored = self._acquire(f"sha256:{content_hash}", lambda: self._read(source, kind, content_hash))
+        else:
+            with open_source(source, kind) as stream:
+                content_hash = hash_source(stream)
+                stored = self._acquire(f"sha256:{content_hash}", lambda: self._embed(stream, content_hash, source, kind))
+        self.sources.append(stored)
+        self.names[stored.key] = self.name or source
+
+    def release(self):
+        """Releases the catalog entries of the adapter, e.g. when its source finished reading after its ingestion
+        was cancelled and the chat will never use it."""
+        for key in self.keys:
+            self.catalog.release_source(key, self.chat_id)
+        self.keys.clear()
+
+    def _acquire(self, key: str, load: Callable[[], StoredSource]) -> StoredSource:
+        if self.catalog is None:
+            return load()
+        stored = self.catalog.acquire(key, self.chat_id, load)
+        self.keys.append(key)
+        return stored
+
+    def _read(self, source: str, kind: str, content_hash: Optional[str] = None) -> StoredSource:
+        with open_source(source, kind) as stream:
+            return self._embed(stream, content_hash or hash_source(stream), source, kind)
+
+    def _embed(self, stream: BinaryIO, content_hash: str, source: str, kind: str) -> StoredSource:
+        key = self.store.key(content_hash)
+        stored = self.store.get(key)
+        if stored is None:
+            chunks = chunk_text(iter_text(stream, kind), self.store.chunk_size, self.store.chunk_overlap)
+            texts, vectors = self.pipeline.run(chunks, progress=self.progress)
+            stored = self.store.put(key, source, texts, vectors)
+        return stored
+
+    def query(self, question: str, similarity_threshold: Optional[float] = None, limit: Optional[int] = None) -> str:
+        """Returns the chunks of all added sources that are most similar to the question."""
+        chunks = [chunk for stored in self.sources for chunk in stored.chunks]
+        if not chunks:
+            return ""
+        vectors = np.vstack([stored.vectors for stored in self.sources if len(stored.chunks)])
+        query = np.asarray(self.pipeline.embed([question])[0], dtype=np.float32)
+        scores = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query) + 1e-10)
+        ranked = np.argsort(-scores)[:limit or self.limit]
+        if similarity_threshold is not None:
+            ranked = [index for index in ranked if scores[index] >= similarity_threshold]
+        return "\n\n".join(chunks[index] for index in ranked)
+
+    @property
+    def size(self) -> int:
+        """Estimated bytes all added sources use in memory."""
+        return sum(stored.size for stored in self.sources)
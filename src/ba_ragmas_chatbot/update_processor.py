@@ -0,0 +1,49 @@
+import asyncio
+
+from collections import deque
+from typing import Any, Awaitable, Hashable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from src.ba_ragmas_chatbot import logger_config
+
+
+class ChatUpdateProcessor(BaseUpdateProcessor):
+    """Processes the updates of different chats concurrently, but the updates of one chat one after another,
+    so a long /chat answer or a slow reply of one chat never holds up the others, while the conversation
+    state of every chat still sees its messages in order. Each chat takes at most one of the max_concurrent_updates
+    slots, the updates that arrive while it is busy are queued and processed by the call that holds the slot."""
+
+    def __init__(self, max_concurrent_updates: int = 64):
+        super().__init__(max_concurrent_updates)
+        self._queues: dict[Hashable, deque[Awaitable[Any]]] = {}
+        self.logger = logger_config.get_logger("update processor")
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            await coroutine
+            return
+        queue = self._queues.get(chat.id)
+        if queue is not None:
+            queue.append(coroutine)
+            return
+        queue = self._queues[chat.id] = deque([coroutine])
+        try:
+            while queue:
+                try:
+                    await queue.popleft()
+                except Exception as e:
+                    self.logger.error(f"do_process_update: Update of chat {chat.id} failed: {str(e)}")
+        finally:
+            # only left early if cancelled at shutdown, the queued updates are dropped
+            for waiting in queue:
+                waiting.close()
+            del self._queues[chat.id]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,45 @@
+from typing import Any
+
+from telegram import Update
+from telegram.ext import Application, CallbackContext, TypeHandler
+
+from src.ba_ragmas_chatbot import logger_config
+from src.ba_ragmas_chatbot.settings import ServerSettings, SettingsError
+
+
+class WebhookDispatcher:
+    """Receives the webhook updates in one process and forwards every update to the worker process chat id % workers,
+    so all updates of a chat reach the same worker, which keeps its sources, running blog article and /cancel.
+    queues holds one multiprocessing queue per worker, the updates are sent as dictionaries."""
+
+    def __init__(self, token: Any, queues: list):
+        if not isinstance(token, str):
+            raise SettingsError("Setting chatbot_token.token is missing, please add your telegram chatbot token to the configs.yaml.")
+        self.token = token
+        self.queues = queues
+        self.logger = logger_config.get_logger("webhook dispatcher")
+
+    def worker(self, update: Update) -> int:
+        """Returns the number of the worker that processes the updates of the chat of the update."""
+        chat = update.effective_chat
+        return chat.id % len(self.queues) if chat is not None else 0
+
+    async def forward(self, update: Update, context: CallbackContext):
+        worker = self.worker(update)
+        self.queues[worker].put(update.to_dict())
+        self.logger.debug(f"forward: Update {update.update_id} forwarded to worker {worker}.")
+
+    def run(self, server: ServerSettings):
+        """Sets the webhook and forwards the received updates until the process is stopped."""
+        if not server.webhook_url:
+            raise SettingsError("Setting server.webhook_url is missing, please add the public url telegram sends the updates to.")
+        application = Application.builder().token(self.token).build()
+        application.add_handler(TypeHandler(Update, self.forward))
+        self.logger.info(f"run: Forwarding the updates to {len(self.queues)} workers.")
+        application.run_webhook(
+            listen=server.listen,
+            port=server.port,
+            url_path=server.url_path,
+            webhook_url=server.webhook_url,
+            secret_token=server.secret_token,
+        )
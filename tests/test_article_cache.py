@@ -0,0 +1,76 @@
+from concurrent.futures import Future
+
+from src.ba_ragmas_chatbot.article_cache import ArticleCache
+
+
+def test_key_ignores_spacing_and_source_order():
+    #arrange
+    inputs = {"topic": "Cats", "tone": "casual", "history": "User: Hello"}
+    other_inputs = {"topic": " cats", "tone": "Casual", "history": "User: Hello"}
+
+    #act
+    key = ArticleCache.key(inputs, ["a", "b"])
+    other_key = ArticleCache.key(other_inputs, ["b", "a"])
+    other_sources = ArticleCache.key(inputs, ["a"])
+
+    #assert
+    assert key == other_key
+    assert key != other_sources
+
+def test_key_depends_on_the_exact_history():
+    #arrange
+    inputs = {"topic": "Cats", "history": "User: My salary is 5000"}
+    other_inputs = {"topic": "Cats", "history": "User: My salary is  5000"}
+
+    #act
+    key = ArticleCache.key(inputs, ["a"])
+    other_key = ArticleCache.key(other_inputs, ["a"])
+
+    #assert
+    assert key != other_key
+
+def test_identical_jobs_are_coalesced_and_cached():
+    #arrange
+    cache = ArticleCache()
+    job = Future()
+    cache.track("key", job, 1)
+
+    #act
+    joined = cache.join("key", 2)
+    job.set_result("The article")
+
+    #assert
+    assert joined is job
+    assert cache.coalesced == 1
+    assert cache.join("key", 3) is None
+    assert cache.get("key") == "The article"
+
+
+def test_failed_jobs_are_not_cached():
+    #arrange
+    cache = ArticleCache()
+    job = Future()
+    cache.track("key", job, 1)
+
+    #act
+    job.set_exception(RuntimeError("Ollama is not running"))
+
+    #assert
+    assert cache.get("key") is None
+    assert cache.join("key", 2) is None
+
+
+def test_job_is_left_to_cancel_by_the_last_waiter():
+    #arrange
+    cache = ArticleCache()
+    cache.track("key", Future(), 1)
+    cache.join("key", 2)
+
+    #act
+    first = cache.leave(1)
+    last = cache.leave(2)
+
+    #assert
+    assert first is None
+    assert last == 1
+    assert cache.leave(3) is None
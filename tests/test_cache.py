@@ -0,0 +1,95 @@
+import os
+import time
+
+from unittest.mock import patch
+
+from src.ba_ragmas_chatbot.cache import TTLCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    #arrange
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+
+    #act
+    cache.set("c", 3)
+
+    #assert
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_entries_expire_after_ttl():
+    #arrange
+    cache = TTLCache(ttl=10)
+    with patch("time.time", return_value=100):
+        cache.set("a", 1)
+
+    #act
+    with patch("time.time", return_value=111):
+        result = cache.get("a")
+
+    #assert
+    assert result is None
+    assert cache.misses == 1
+
+def test_entries_are_persisted(tmp_path):
+    #arrange
+    path = str(tmp_path / "cache.json")
+    cache = TTLCache(path=path)
+    cache.set("dogs bark", [True, "https://example.com"])
+    cache.flush()
+
+    #act
+    result = TTLCache(path=path).get("dogs bark")
+
+    #assert
+    assert result == [True, "https://example.com"]
+
+def test_processes_sharing_a_path_keep_each_others_entries(tmp_path):
+    #arrange
+    path = str(tmp_path / "cache.json")
+    first = TTLCache(path=path)
+    second = TTLCache(path=path)
+
+    #act
+    first.set("dogs bark", True)
+    second.set("cats fly", False)
+    first.flush()
+    second.flush()
+    restarted = TTLCache(path=path)
+
+    #assert
+    assert restarted.get("dogs bark") is True
+    assert restarted.get("cats fly") is False
+    assert second.get("dogs bark") is True
+
+def test_changes_are_written_behind(tmp_path):
+    #arrange
+    path = str(tmp_path / "cache.json")
+    cache = TTLCache(path=path, flush_interval=0.05)
+
+    #act
+    cache.set("dogs bark", True)
+    written_at_once = os.path.exists(path)
+    time.sleep(0.5)
+
+    #assert
+    assert not written_at_once
+    assert TTLCache(path=path).get("dogs bark") is True
+
+def test_cleared_entries_are_not_merged_back(tmp_path):
+    #arrange
+    path = str(tmp_path / "cache.json")
+    cache = TTLCache(path=path)
+    cache.set("dogs bark", True)
+    cache.flush()
+
+    #act
+    cache.clear()
+    cache.flush()
+
+    #assert
+    assert TTLCache(path=path).get("dogs bark") is None
@@ -1,11 +1,24 @@
-import os
+import asyncio
+import dataclasses
+import threading
+
+from concurrent.futures import Future
 from unittest.mock import MagicMock, AsyncMock
 
+import numpy as np
 import pytest
 from telegram import Message, Update
 from telegram.ext import CallbackContext
 
+from src.ba_ragmas_chatbot import chatbot as chatbot_module
+from src.ba_ragmas_chatbot.article_cache import ArticleCache
 from src.ba_ragmas_chatbot.chatbot import TelegramBot
+from src.ba_ragmas_chatbot.embedding_store import StoredSource
+from src.ba_ragmas_chatbot.send_queue import SendQueue
+from src.ba_ragmas_chatbot.settings import SettingsError
+from src.ba_ragmas_chatbot.source_catalog import SourceCatalog
+from src.ba_ragmas_chatbot.tool_registry import ToolRegistry
+from src.ba_ragmas_chatbot.update_processor import ChatUpdateProcessor
 
 
 @pytest.mark.asyncio
@@ -250,11 +263,13 @@ async def test_website_website():
 
     mock_context = MagicMock(spec=CallbackContext)
     bot = TelegramBot()
+    bot.ingestions = MagicMock()
 
     #act
     result = await bot.website(mock_update, mock_context)
 
     #assert
+    bot.ingestions.start.call_args.args[2].close()
     mock_message.reply_text.assert_called_once_with("Okay, do you have another link to a website with information you want to have included? If yes, please reply with the link, if not, please just send 'no'."
     )
     assert result == 4
@@ -273,11 +288,14 @@ async def test_website_throw_error():
 
     mock_context = MagicMock(spec=CallbackContext)
     bot = TelegramBot()
+    # the website is not read, so an ingestion error cannot take the simulated error's place
+    bot.ingestions = MagicMock()
 
     #act
     result = await bot.website(mock_update, mock_context)
 
     #assert
+    bot.ingestions.start.call_args.args[2].close()
     mock_message.reply_text.assert_any_call(
         "An error occurred: Simulated error in website. \nPlease resend your link or 'no'.")
 
@@ -374,33 +392,50 @@ async def test_documents_document():
     mock_message.document.mime_type = "application/pdf"
     mock_message.document.file_name = "RAG_PDF.pdf"
     mock_message.document.file_id = "file_id_mock"
+    mock_message.document.file_size = 1024
     mock_message.reply_text = AsyncMock()
 
     mock_update = MagicMock(spec=Update)
     mock_update.message = mock_message
 
     mock_context = MagicMock(spec=CallbackContext)
-    mock_context.bot.get_file = AsyncMock()
 
-    base_dir = os.path.dirname(__file__)
-    root_dir = os.path.dirname(base_dir)
-    test_file_path = os.path.join(root_dir, "src", "ba_ragmas_chatbot", "documents", "RAG_PDF.pdf")
+    bot = TelegramBot()
+    bot.ingestions = MagicMock()
+
+    #act
+    result = await bot.document(mock_update, mock_context)
 
-    mock_file = MagicMock()
-    mock_file.download_to_drive = AsyncMock(return_value=None)  # No-op for download
-    mock_context.bot.get_file.return_value = mock_file
+    #assert
+    bot.ingestions.start.assert_called_once()
+    assert bot.ingestions.start.call_args.args[1] == "RAG_PDF.pdf"
+    bot.ingestions.start.call_args.args[2].close()
+    assert result == 5
+
+@pytest.mark.asyncio
+async def test_documents_document_too_large():
+    #arrange
+    mock_message = MagicMock(spec=Message)
+    mock_message.document = MagicMock()
+    mock_message.document.mime_type = "application/pdf"
+    mock_message.document.file_name = "RAG_PDF.pdf"
+    mock_message.document.file_size = 1024 ** 3
+    mock_message.reply_text = AsyncMock()
 
+    mock_update = MagicMock(spec=Update)
+    mock_update.message = mock_message
+
+    mock_context = MagicMock(spec=CallbackContext)
 
     bot = TelegramBot()
+    bot.ingestions = MagicMock()
 
     #act
     result = await bot.document(mock_update, mock_context)
-    mock_file.download_to_drive.assert_called_once_with(
-        '/Users/avkh/Desktop/Studium/Bachelorarbeit/Git/RAG-MAS-Blog-Chatbot/src/ba_ragmas_chatbot/documents/RAG_PDF.pdf'
-    )
-
-    mock_file.download_to_drive.assert_called_once_with(test_file_path)
 
+    #assert
+    bot.ingestions.start.assert_not_called()
+    assert "Please send a smaller document" in mock_message.reply_text.call_args.args[0]
     assert result == 5
 
 @pytest.mark.asyncio
@@ -618,3 +653,312 @@ async def test_tone_throw_error():
     #assert
     mock_message.reply_text.assert_any_call(
         "An error occurred: Simulated error in tone. \nPlease resend your preferred article tone.")
+
+
+def webhook_bot(monkeypatch, webhook_url):
+    bot = TelegramBot()
+    server = dataclasses.replace(bot.settings.server, mode="webhook", port=8443, webhook_url=webhook_url)
+    bot.settings = dataclasses.replace(bot.settings, server=server)
+    bot.build_application = MagicMock()
+    bot.store = MagicMock()
+    bot.generator = MagicMock()
+    monkeypatch.setattr(chatbot_module, "get_crew_factory", MagicMock())
+    return bot
+
+
+def test_start_bot_webhook(monkeypatch):
+    #arrange
+    bot = webhook_bot(monkeypatch, "https://example.com/telegram")
+
+    #act
+    bot.start_bot()
+
+    #assert
+    application = bot.build_application.return_value
+    application.run_polling.assert_not_called()
+    kwargs = application.run_webhook.call_args.kwargs
+    assert kwargs["port"] == 8443
+    assert kwargs["webhook_url"] == "https://example.com/telegram"
+    bot.generator.shutdown.assert_called_once()
+
+
+def test_start_bot_webhook_worker_serves_the_forwarded_updates(monkeypatch):
+    #arrange
+    bot = webhook_bot(monkeypatch, None)
+    bot.serve = AsyncMock()
+    updates = MagicMock()
+
+    #act
+    bot.start_bot(worker=2, updates=updates)
+
+    #assert
+    application = bot.build_application.return_value
+    application.run_webhook.assert_not_called()
+    bot.build_application.assert_called_once_with(shared=True)
+    bot.serve.assert_awaited_once_with(application, updates)
+    assert bot.worker == 2
+
+
+def test_start_bot_webhook_without_url(monkeypatch):
+    #arrange
+    bot = webhook_bot(monkeypatch, None)
+
+    #act & assert
+    with pytest.raises(SettingsError, match="server.webhook_url"):
+        bot.start_bot()
+    bot.build_application.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_tells_chats_of_this_worker():
+    #arrange
+    async def run(chat_id, action):
+        return await action()
+
+    bot = TelegramBot()
+    bot.worker = 1
+    bot.sender = MagicMock()
+    bot.sender.run = run
+    application = MagicMock()
+    application.chat_data = {1: {"article": 1}, 2: {"article": 0}, 3: {}}
+    application.bot.send_message = AsyncMock()
+
+    #act
+    await bot.interrupted(application)
+
+    #assert
+    application.bot.send_message.assert_called_once()
+    assert application.bot.send_message.call_args.args[0] == 1
+    assert application.chat_data == {1: {}, 2: {"article": 0}, 3: {}}
+    application.mark_data_for_update_persistence.assert_called_once_with(chat_ids=[1])
+
+
+def configuration_update(text):
+    mock_message = MagicMock(spec=Message)
+    mock_message.text = text
+    mock_message.reply_text = AsyncMock()
+    mock_update = MagicMock(spec=Update)
+    mock_update.message = mock_message
+    return mock_update
+
+
+@pytest.mark.asyncio
+async def test_reconfiguration_does_not_affect_other_chats():
+    #arrange
+    bot = TelegramBot()
+    reconfiguring = MagicMock(spec=CallbackContext)
+    reconfiguring.user_data = {}
+    other = MagicMock(spec=CallbackContext)
+    other.user_data = {}
+
+    #act
+    await bot.confirm(configuration_update("no"), reconfiguring)
+    kept = await bot.length(configuration_update("no"), reconfiguring)
+    result = await bot.length(configuration_update("no"), other)
+
+    #assert
+    assert reconfiguring.user_data["configuration"].reconfigure
+    assert reconfiguring.user_data["configuration"].length == ""
+    assert kept == 7
+    assert not other.user_data["configuration"].reconfigure
+    assert other.user_data["configuration"].length == "no"
+    assert result == 7
+
+
+@pytest.mark.asyncio
+async def test_additional_keeps_answer_when_reconfiguring():
+    #arrange
+    bot = TelegramBot()
+    mock_context = MagicMock(spec=CallbackContext)
+    mock_context.user_data = {}
+    await bot.additional(configuration_update("Mention cats"), mock_context)
+    await bot.confirm(configuration_update("no"), mock_context)
+
+    #act
+    result = await bot.additional(configuration_update("no"), mock_context)
+
+    #assert
+    assert mock_context.user_data["configuration"].additional_information == "Mention cats"
+    assert result == 11
+
+
+def test_search_tools_combine_the_sources_of_a_chat():
+    #arrange
+    bot = TelegramBot()
+    shared = StoredSource("shared", "cats.pdf", ["Cats sleep a lot."], np.ones((1, 2), dtype=np.float32))
+    other = StoredSource("other", "dogs.pdf", ["Dogs bark."], np.ones((1, 2), dtype=np.float32))
+    pdf_tool = MagicMock()
+    pdf_tool.adapter.sources = [shared, other]
+    pdf_tool.adapter.names = {"shared": "my cats.pdf", "other": "dogs.pdf"}
+    website_tool = MagicMock()
+    website_tool.adapter.sources = [shared]
+    website_tool.adapter.names = {"shared": "my cats.pdf"}
+
+    #act
+    tools = bot.search_tools([pdf_tool, website_tool])
+    no_tools = bot.search_tools([])
+
+    #assert
+    assert len(tools) == 1
+    assert tools[0].sources == [shared, other]
+    assert tools[0].names == {"shared": "my cats.pdf", "other": "dogs.pdf"}
+    assert no_tools == []
+
+
+def generation_update(chat_id):
+    mock_update = configuration_update("yes")
+    mock_update.effective_chat.id = chat_id
+    mock_context = MagicMock(spec=CallbackContext)
+    mock_context.user_data = {}
+    mock_context.chat_data = {}
+    return mock_update, mock_context
+
+
+@pytest.mark.asyncio
+async def test_cancel_of_one_chat_keeps_a_joined_job_running():
+    #arrange
+    job = Future()
+    bot = TelegramBot()
+    bot.waiting = {}
+    bot.articles = ArticleCache()
+    bot.ingestions = MagicMock()
+    bot.ingestions.wait = AsyncMock()
+    bot.registry = MagicMock()
+    bot.registry.get.return_value = []
+    bot.registry.evicted.return_value = []
+    bot.generator = MagicMock()
+    bot.generator.submit.return_value = (job, 0)
+    bot.task_progress = MagicMock(return_value=None)
+    bot.reply = AsyncMock()
+    inputs = {"topic": "Cats", "history": ""}
+    for chat_id in (1, 2, 3):
+        update, context = generation_update(chat_id)
+        bot.waiting[chat_id] = asyncio.create_task(bot.generate(update, context, inputs))
+    await asyncio.sleep(0.01)
+
+    #act
+    owner_left = bot.stop_generation(1)
+    joined_left = bot.stop_generation(2)
+    job.set_result("The article")
+    await asyncio.gather(*bot.waiting.values())
+
+    #assert
+    assert owner_left and joined_left
+    bot.generator.submit.assert_called_once()
+    bot.generator.cancel.assert_not_called()
+    delivered = [call.args[0].effective_chat.id for call in bot.reply.call_args_list if call.args[1] == "The article"]
+    assert delivered == [3]
+
+
+@pytest.mark.asyncio
+async def test_cancel_of_the_last_chat_cancels_the_job():
+    #arrange
+    bot = TelegramBot()
+    bot.waiting = {}
+    bot.articles = ArticleCache()
+    bot.generator = MagicMock()
+    bot.articles.track("key", Future(), 1)
+    bot.articles.join("key", 2)
+
+    #act
+    bot.stop_generation(1)
+    bot.stop_generation(2)
+
+    #assert
+    bot.generator.cancel.assert_called_once_with(1)
+
+
+@pytest.mark.asyncio
+async def test_two_chats_stream_at_the_same_time():
+    #arrange
+    both_streaming = asyncio.Barrier(2)
+
+    async def astream(prompt):
+        yield "Cats "
+        # only passes once the other chat streams as well, processing the chats one after another would hang here
+        await both_streaming.wait()
+        yield "purr."
+
+    bot = TelegramBot()
+    bot.responses = None
+    bot.sender = SendQueue(chat_rate=100, chat_burst=100)
+    bot.ai = MagicMock()
+    bot.ai.astream = astream
+    processor = ChatUpdateProcessor(2)
+    updates = []
+    for chat_id in (1, 2):
+        update, context = generation_update(chat_id)
+        update.message.text = "Do cats purr?"
+        update.message.chat_id = chat_id
+        update.message.reply_text.return_value.edit_text = AsyncMock()
+        updates.append((update, context))
+
+    #act
+    await asyncio.wait_for(asyncio.gather(*(processor.process_update(update, bot.chat(update, context)) for update, context in updates)), timeout=5)
+
+    #assert
+    for update, _ in updates:
+        update.message.reply_text.return_value.edit_text.assert_called_with("Cats purr.", parse_mode="HTML")
+
+
+@pytest.mark.asyncio
+async def test_generate_reports_evicted_sources():
+    #arrange
+    bot = TelegramBot()
+    bot.waiting = {}
+    bot.ingestions = MagicMock()
+    bot.ingestions.wait = AsyncMock()
+    bot.registry = ToolRegistry(idle_timeout=0)
+    bot.registry.add(1, MagicMock(), name="cats.pdf")
+    bot.registry.evict_idle()
+    bot.generator = MagicMock()
+    bot.reply = AsyncMock()
+    update, context = generation_update(1)
+
+    #act
+    await bot.generate(update, context, {"topic": "Cats", "history": ""})
+
+    #assert
+    bot.generator.submit.assert_not_called()
+    assert "cats.pdf" in bot.reply.call_args.args[1]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_ingestion_releases_the_sources_its_thread_acquires():
+    #arrange
+    reading = threading.Event()
+    proceed = threading.Event()
+    acquired = threading.Event()
+    bot = TelegramBot()
+    bot.catalog = SourceCatalog()
+    bot.registry = MagicMock()
+    bot.reply = AsyncMock()
+    bot.progress = MagicMock()
+
+    def add(source, progress, chat_id, name):
+        reading.set()
+        proceed.wait(5)
+        bot.catalog.acquire("sha256:cats", chat_id, lambda: StoredSource("cats", source, ["Cats purr."], np.ones((1, 2), dtype=np.float32)))
+        tool = MagicMock()
+        tool.adapter.release = lambda: bot.catalog.release_source("sha256:cats", chat_id)
+        acquired.set()
+        return tool
+
+    update, context = generation_update(1)
+    ingestion = asyncio.create_task(bot.ingest(update, context, "cats.txt", add, "cats.txt"))
+    await asyncio.to_thread(reading.wait, 5)
+
+    #act
+    ingestion.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await ingestion
+    proceed.set()
+    await asyncio.to_thread(acquired.wait, 5)
+    for _ in range(100):
+        if not len(bot.catalog):
+            break
+        await asyncio.sleep(0.01)
+
+    #assert
+    assert len(bot.catalog) == 0
+    bot.registry.add.assert_not_called()
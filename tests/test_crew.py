@@ -0,0 +1,47 @@
+import pytest
+import yaml
+
+from unittest.mock import MagicMock
+
+from src.ba_ragmas_chatbot.crew import CrewFactory
+
+
+def test_crew_factory_binds_tools_per_request():
+    #arrange
+    factory = CrewFactory()
+
+    #act
+    first = factory.build([])
+    second = factory.build([factory.fact_check_tool])
+
+    #assert
+    assert first.agents[0] is not second.agents[0]
+    assert first.agents[0].llm is second.agents[0].llm
+    assert [len(agent.tools) for agent in first.agents] == [1, 1, 1, 0]
+    assert [len(task.tools) for task in second.tasks] == [2, 2, 2, 0]
+    assert second.tasks[-1].agent is second.agents[-1]
+
+
+def test_crew_factory_rejects_incomplete_templates(tmp_path):
+    #arrange
+    agents = tmp_path / "agents.yaml"
+    tasks = tmp_path / "tasks.yaml"
+    agents.write_text(yaml.safe_dump({"researcher": {"role": "Researcher", "goal": "Research"}}))
+    tasks.write_text(yaml.safe_dump({"research_task": {"description": "Research", "expected_output": "Notes", "agent": "researcher"}}))
+
+    #act & assert
+    with pytest.raises(ValueError, match="backstory"):
+        CrewFactory(str(agents), str(tasks))
+
+
+def test_crew_factory_reports_finished_tasks():
+    #arrange
+    factory = CrewFactory()
+    progress = MagicMock()
+    crew = factory.build([], progress)
+
+    #act
+    crew.tasks[1].callback(MagicMock(raw="1. Introduction"))
+
+    #assert
+    progress.assert_called_once_with("editor_task", "1. Introduction")
@@ -0,0 +1,133 @@
+import hashlib
+import os
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from telegram import Bot, File
+from telegram.error import TelegramError
+from telegram.request import BaseRequest
+
+from src.ba_ragmas_chatbot.document_storage import DocumentStorage, DocumentTooLarge
+from src.ba_ragmas_chatbot.embedding_store import EmbeddingStore
+from src.ba_ragmas_chatbot.ingestion import IngestionPipeline
+from src.ba_ragmas_chatbot.tools import store_adapter
+from src.ba_ragmas_chatbot.tools.store_adapter import StoreAdapter
+
+
+async def chunks_of(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.asyncio
+async def test_save_stores_identical_uploads_once(tmp_path):
+    #arrange
+    storage = DocumentStorage(str(tmp_path / "documents"))
+    content_hash = hashlib.sha256(b"Cats sleep a lot.").hexdigest()
+
+    #act
+    first = await storage.save(chunks_of(b"Cats ", b"sleep a lot."), ".PDF")
+    second = await storage.save(chunks_of(b"Cats sleep a lot."), ".pdf")
+
+    #assert
+    assert first.sha256 == content_hash
+    assert first.path == second.path == os.path.join(str(tmp_path / "documents"), f"{content_hash}.pdf")
+    assert first.size == 17
+    assert os.listdir(tmp_path / "documents") == [f"{content_hash}.pdf"]
+    assert storage.hash_of(first.path) == content_hash
+    assert storage.hash_of(str(tmp_path / f"{content_hash}.pdf")) is None
+
+
+@pytest.mark.asyncio
+async def test_save_stops_at_the_size_limit(tmp_path):
+    #arrange
+    storage = DocumentStorage(str(tmp_path / "documents"), max_size_mb=1)
+    chunk = b"x" * (512 * 1024)
+    rest = MagicMock()
+
+    async def chunks():
+        yield chunk
+        yield chunk
+        yield chunk
+        rest()
+
+    #act & assert
+    with pytest.raises(DocumentTooLarge):
+        await storage.save(chunks())
+    rest.assert_not_called()
+    assert os.listdir(tmp_path / "documents") == []
+
+
+@pytest.mark.asyncio
+async def test_download_rejects_large_files_before_reading(tmp_path):
+    #arrange
+    storage = DocumentStorage(str(tmp_path / "documents"), max_size_mb=1)
+    file = MagicMock()
+    file.file_size = 2 * 1024 * 1024
+
+    #act & assert
+    with pytest.raises(DocumentTooLarge):
+        await storage.download(file)
+    assert not os.path.exists(tmp_path / "documents")
+
+
+class NotFoundRequest(BaseRequest):
+    """Answers every request like the bot API answers a file that is gone."""
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None, connect_timeout=None, pool_timeout=None):
+        return 404, b'{"ok": false, "error_code": 404, "description": "Not Found"}'
+
+
+@pytest.mark.asyncio
+async def test_download_errors_do_not_show_the_bot_token(tmp_path):
+    #arrange
+    storage = DocumentStorage(str(tmp_path / "documents"))
+    bot = Bot("123:SECRET", request=NotFoundRequest(), get_updates_request=NotFoundRequest())
+    file = File("file_id", "unique_id", file_size=17, file_path="https://api.telegram.org/file/bot123:SECRET/documents/file_1.pdf")
+    file.set_bot(bot)
+
+    #act
+    with pytest.raises(TelegramError) as error:
+        await storage.download(file, ".pdf")
+
+    #assert
+    assert "SECRET" not in str(error.value)
+    assert "Not Found" in str(error.value)
+    assert not os.path.exists(tmp_path / "documents")
+
+
+@pytest.mark.asyncio
+async def test_adapter_uses_the_hash_of_stored_documents(tmp_path):
+    #arrange
+    storage = DocumentStorage(str(tmp_path / "documents"))
+    local = tmp_path / "dogs.txt"
+    local.write_text("Dogs are loyal animals.")
+    file = MagicMock()
+    file.file_size = None
+    file.file_path = str(local)
+    stored = await storage.download(file, ".txt")
+    store = EmbeddingStore(str(tmp_path / "db"), "ollama/mxbai-embed-large", chunk_size=100, chunk_overlap=10)
+    client = MagicMock()
+    client.embed.return_value = {"embeddings": [[1.0, 0.0]]}
+    adapter = StoreAdapter(store=store, pipeline=IngestionPipeline(client, "mxbai-embed-large"), documents=storage, name="dogs.txt")
+
+    #act
+    with patch.object(store_adapter, "hash_source") as hash_source:
+        adapter.add(stored.path, data_type="text_file")
+
+    #assert
+    hash_source.assert_not_called()
+    assert adapter.sources[0].key == store.key(stored.sha256)
+    assert adapter.names == {store.key(stored.sha256): "dogs.txt"}
+    assert adapter.query("Are dogs loyal?") == "Dogs are loyal animals."
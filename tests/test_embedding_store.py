@@ -0,0 +1,109 @@
+import hashlib
+from unittest.mock import MagicMock
+
+from src.ba_ragmas_chatbot.document_loader import chunk_text
+from src.ba_ragmas_chatbot.embedding_store import EmbeddingStore
+from src.ba_ragmas_chatbot.ingestion import IngestionPipeline
+from src.ba_ragmas_chatbot.tools.store_adapter import StoreAdapter
+
+
+def test_put_and_get_survive_restart(tmp_path):
+    #arrange
+    store = EmbeddingStore(str(tmp_path), "ollama/mxbai-embed-large", chunk_size=100, chunk_overlap=10)
+    key = store.key(hashlib.sha256(b"Dogs are loyal.").hexdigest())
+
+    #act
+    store.put(key, "dogs.txt", ["Dogs are loyal."], [[1.0, 0.0]])
+    restarted = EmbeddingStore(str(tmp_path), "ollama/mxbai-embed-large", chunk_size=100, chunk_overlap=10)
+    stored = restarted.get(key)
+
+    #assert
+    assert stored.chunks == ["Dogs are loyal."]
+    assert stored.vectors.tolist() == [[1.0, 0.0]]
+
+def test_processes_sharing_the_store_keep_each_others_entries(tmp_path):
+    #arrange
+    first = EmbeddingStore(str(tmp_path), "ollama/mxbai-embed-large", chunk_size=100, chunk_overlap=10)
+    second = EmbeddingStore(str(tmp_path), "ollama/mxbai-embed-large", chunk_size=100, chunk_overlap=10)
+
+    #act
+    first.put("dogs", "dogs.txt", ["Dogs are loyal."], [[1.0, 0.0]])
+    second.put("cats", "cats.txt", ["Cats sleep a lot."], [[0.0, 1.0]])
+    removed = second.gc()
+
+    #assert
+    assert removed == []
+    assert second.get("dogs").chunks == ["Dogs are loyal."]
+    assert first.get("cats").chunks == ["Cats sleep a lot."]
+    assert sorted(EmbeddingStore(str(tmp_path), "ollama/mxbai-embed-large", chunk_size=100, chunk_overlap=10)._load_manifest()) == ["cats", "dogs"]
+
+def test_key_depends_on_embedder_and_chunking(tmp_path):
+    #arrange
+    store = EmbeddingStore(str(tmp_path), "ollama/mxbai-embed-large", chunk_size=100, chunk_overlap=10)
+    other_chunking = EmbeddingStore(str(tmp_path), "ollama/mxbai-embed-large", chunk_size=200, chunk_overlap=10)
+    other_embedder = EmbeddingStore(str(tmp_path), "ollama/nomic-embed-text", chunk_size=100, chunk_overlap=10)
+
+    #act
+    keys = {store.key("content_hash"), other_chunking.key("content_hash"), other_embedder.key("content_hash")}
+
+    #assert
+    assert len(keys) == 3
+
+def test_size_cap_removes_least_recently_used(tmp_path):
+    #arrange
+    store = EmbeddingStore(str(tmp_path), "ollama/mxbai-embed-large", chunk_size=100, chunk_overlap=10, max_size_mb=0.001)
+    store.put("old", "old.txt", ["a" * 400], [[1.0] * 64])
+
+    #act
+    store.put("new", "new.txt", ["b" * 400], [[1.0] * 64])
+
+    #assert
+    assert store.get("old") is None
+    assert store.get("new") is not None
+
+def test_adapter_reuses_stored_embeddings(tmp_path):
+    #arrange
+    document = tmp_path / "dogs.txt"
+    document.write_text("Dogs are loyal animals.")
+    store = EmbeddingStore(str(tmp_path / "db"), "ollama/mxbai-embed-large", chunk_size=100, chunk_overlap=10)
+    client = MagicMock()
+    client.embed.return_value = {"embeddings": [[1.0, 0.0]]}
+    pipeline = IngestionPipeline(client, "mxbai-embed-large")
+
+    #act
+    StoreAdapter(store=store, pipeline=pipeline).add(str(document), data_type="text_file")
+    adapter = StoreAdapter(store=store, pipeline=pipeline)
+    adapter.add(str(document), data_type="text_file")
+    result = adapter.query("Are dogs loyal?")
+
+    #assert
+    assert client.embed.call_count == 2
+    assert result == "Dogs are loyal animals."
+
+def test_pipeline_embeds_in_ordered_batches():
+    #arrange
+    client = MagicMock()
+    client.embed.side_effect = lambda model, input: {"embeddings": [[float(len(text))] for text in input]}
+    pipeline = IngestionPipeline(client, "mxbai-embed-large", batch_size=2, max_in_flight=2)
+    progress = MagicMock()
+
+    #act
+    texts, vectors = pipeline.run(iter(["a", "bb", "ccc", "dddd", "eeeee"]), progress=progress)
+
+    #assert
+    assert client.embed.call_count == 3
+    assert texts == ["a", "bb", "ccc", "dddd", "eeeee"]
+    assert vectors.tolist() == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    progress.assert_called_with(5)
+
+def test_chunk_text_streams_pieces_with_overlap():
+    #arrange
+    pieces = iter(["one two three ", "four five six ", "seven eight"])
+
+    #act
+    chunks = list(chunk_text(pieces, chunk_size=15, chunk_overlap=4))
+
+    #assert
+    assert all(len(chunk) <= 15 for chunk in chunks)
+    assert chunks[0] == "one two three"
+    assert chunks[-1].endswith("eight")
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from src.ba_ragmas_chatbot.cache import TTLCache
+from src.ba_ragmas_chatbot.generation_executor import CancelToken, JobCancelled, current_token
+from src.ba_ragmas_chatbot.tools.factcheck_tool import FactCheckTool, normalize_claim
+from src.ba_ragmas_chatbot.tools import search_backend
+from src.ba_ragmas_chatbot.tools.search_backend import CachedSearchBackend, DuckDuckGoBackend, LocalIndexBackend
+
+
+class FakeAsyncClient:
+    """Answers 'yes' only for snippets containing 'true', and never finishes for snippets containing 'slow'."""
+    calls = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def generate(self, model, prompt):
+        FakeAsyncClient.calls.append(prompt)
+        if "slow" in prompt:
+            await asyncio.sleep(60)
+        return {"response": "yes" if "true" in prompt.split("Check if")[0] else "no"}
+
+
+def test_check_if_true_returns_first_confirmation_and_cancels_the_rest():
+    #arrange
+    tool = FactCheckTool(max_concurrency=3)
+    documents = ["slow snippet", "false snippet", "true snippet"]
+    links = ["link_slow", "link_false", "link_true"]
+
+    #act
+    with patch("ollama.AsyncClient", FakeAsyncClient), patch.object(FactCheckTool, "get_llm", return_value="llama"):
+        result = tool.check_if_true(documents, links, "Dogs bark")
+
+    #assert
+    assert result == "link_true"
+
+def test_check_if_true_stops_when_the_job_is_cancelled():
+    #arrange
+    tool = FactCheckTool(cancel_interval=0.01)
+    token = CancelToken()
+    threading.Timer(0.1, token.cancel).start()
+
+    def check():
+        current_token.set(token)
+        return tool.check_if_true(["slow snippet"], ["link_slow"], "Dogs bark")
+
+    #act
+    with patch("ollama.AsyncClient", FakeAsyncClient), patch.object(FactCheckTool, "get_llm", return_value="llama"), \
+            ThreadPoolExecutor(1) as pool:
+        job = pool.submit(check)
+
+        #assert
+        with pytest.raises(JobCancelled):
+            job.result(timeout=5)
+
+def test_check_if_true_batches_snippets():
+    #arrange
+    FakeAsyncClient.calls = []
+    tool = FactCheckTool(batch_size=3)
+
+    #act
+    with patch("ollama.AsyncClient", FakeAsyncClient), patch.object(FactCheckTool, "get_llm", return_value="llama"):
+        result = tool.check_if_true(["a", "b", "c"], ["link_a", "link_b", "link_c"], "Dogs bark")
+
+    #assert
+    assert len(FakeAsyncClient.calls) == 1
+    assert result is None
+
+def test_repeated_claims_are_answered_from_cache():
+    #arrange
+    tool = FactCheckTool(cache=TTLCache())
+
+    #act
+    with patch.object(FactCheckTool, "fact_check_with_duckduckgo", return_value=(True, "link")) as fact_check:
+        first = tool._run("Dogs bark.")
+        second = tool._run("  dogs BARK ")
+
+    #assert
+    assert first == second == "True"
+    fact_check.assert_called_once()
+
+def test_normalize_claim_keeps_signs_and_decimals_of_numbers():
+    #act
+    negative = normalize_claim("Temperatures drop to -125 °C.")
+    positive = normalize_claim("Temperatures drop to 125 °C!")
+    decimal = normalize_claim("It weighs 1.5 kg, or 1,500 g.")
+
+    #assert
+    assert negative == "temperatures drop to -125 c"
+    assert positive == "temperatures drop to 125 c"
+    assert decimal == "it weighs 1.5 kg or 1,500 g"
+    assert normalize_claim("Well-known dogs bark.") == "well known dogs bark"
+
+def test_search_uses_pluggable_backend_and_caches_results():
+    #arrange
+    index = LocalIndexBackend([("Dogs bark at strangers.", "link_dogs"), ("Cats purr.", "link_cats")])
+    backend = CachedSearchBackend(index, TTLCache())
+    tool = FactCheckTool(search=backend)
+
+    #act
+    with patch.object(LocalIndexBackend, "search", wraps=index.search) as search, \
+            patch.object(FactCheckTool, "check_if_true", return_value="link_dogs") as check:
+        tool.search_duckduckgo("Do dogs bark?")
+        tool.search_duckduckgo("do  dogs bark?")
+
+    #assert
+    search.assert_called_once()
+    check.assert_called_with(["Dogs bark at strangers."], ["link_dogs"], "do  dogs bark?")
+
+def test_duckduckgo_searches_of_different_threads_run_at_the_same_time():
+    #arrange
+    both_searching = threading.Barrier(2, timeout=5)
+
+    class FakeWebSearch:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def run(self, query):
+            # only passes once the other thread searches as well, a search lock would make this time out
+            both_searching.wait()
+            return {"documents": [f"About {query}"], "links": [f"link_{query}"]}
+
+    backend = DuckDuckGoBackend()
+
+    #act
+    with patch.object(search_backend, "DuckduckgoApiWebSearch", FakeWebSearch), ThreadPoolExecutor(2) as pool:
+        results = list(pool.map(backend.search, ["dogs", "cats"]))
+
+    #assert
+    assert results == [(["About dogs"], ["link_dogs"]), (["About cats"], ["link_cats"])]
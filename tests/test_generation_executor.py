@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from src.ba_ragmas_chatbot.generation_executor import GenerationExecutor, JobAlreadyRunning, JobCancelled, check_cancelled
+
+
+def test_submit_returns_queue_position():
+    #arrange
+    executor = GenerationExecutor(max_workers=1)
+    release = threading.Event()
+
+    #act
+    first, first_position = executor.submit("user_1", release.wait)
+    second, second_position = executor.submit("user_2", release.wait)
+    release.set()
+    first.result(timeout=5)
+    second.result(timeout=5)
+    executor.shutdown()
+
+    #assert
+    assert first_position == 0
+    assert second_position == 1
+
+def test_submit_one_job_per_user():
+    #arrange
+    executor = GenerationExecutor(max_workers=2)
+    release = threading.Event()
+    job, _ = executor.submit("user_1", release.wait)
+
+    #act
+    with pytest.raises(JobAlreadyRunning):
+        executor.submit("user_1", release.wait)
+    release.set()
+    job.result(timeout=5)
+    executor.shutdown()
+
+    #assert
+    assert not executor.is_busy("user_1")
+
+def test_invalid_worker_count():
+    #act & assert
+    with pytest.raises(ValueError):
+        GenerationExecutor(max_workers=0)
+
+def test_cancel_stops_running_job_at_next_check():
+    #arrange
+    executor = GenerationExecutor(max_workers=1)
+    started = threading.Event()
+
+    def job():
+        started.set()
+        while True:
+            check_cancelled()
+            time.sleep(0.01)
+
+    future, _ = executor.submit("user_1", job)
+    started.wait(timeout=5)
+
+    #act
+    cancelled = executor.cancel("user_1")
+
+    #assert
+    assert cancelled
+    with pytest.raises(JobCancelled):
+        future.result(timeout=5)
+    executor.shutdown()
+    assert not executor.cancel("user_1")
+
+def test_cancel_queued_job_never_starts():
+    #arrange
+    executor = GenerationExecutor(max_workers=1)
+    release = threading.Event()
+    ran = threading.Event()
+    first, _ = executor.submit("user_1", release.wait)
+    second, _ = executor.submit("user_2", ran.set)
+
+    #act
+    executor.cancel("user_2")
+    release.set()
+    first.result(timeout=5)
+    executor.shutdown()
+
+    #assert
+    assert second.cancelled()
+    assert not ran.is_set()
+    assert not executor.is_busy("user_2")
@@ -0,0 +1,62 @@
+import pytest
+
+from unittest.mock import AsyncMock, MagicMock
+
+from src.ba_ragmas_chatbot.history import ASSISTANT, USER, ConversationHistory, HistoryManager, count_tokens
+
+
+def test_render_keeps_newest_turns_within_budget():
+    #arrange
+    manager = HistoryManager(MagicMock(), chat_budget=50, crew_budget=20)
+    history = ConversationHistory(summary="The user likes cats.")
+    for number in range(10):
+        history.add(USER, f"Question number {number} about cats")
+
+    #act
+    chat = manager.for_chat(history)
+    crew = manager.for_crew(history)
+
+    #assert
+    assert chat.startswith("Summary of the earlier conversation: The user likes cats.")
+    assert chat.endswith("Question number 9 about cats")
+    assert "number 0 " not in chat
+    assert count_tokens(chat) <= 50
+    assert count_tokens(crew) <= 20 + 1
+
+
+@pytest.mark.asyncio
+async def test_compact_summarizes_oldest_turns():
+    #arrange
+    llm = MagicMock()
+    llm.ainvoke = AsyncMock(return_value="The user asked about cats.")
+    manager = HistoryManager(llm, chat_budget=40)
+    history = ConversationHistory()
+    for number in range(8):
+        history.add(USER if number % 2 == 0 else ASSISTANT, f"Message {number} about cats and dogs")
+
+    #act
+    await manager.compact(history)
+
+    #assert
+    llm.ainvoke.assert_awaited_once()
+    assert "Message 0 about cats" in llm.ainvoke.call_args.args[0]
+    assert history.summary == "The user asked about cats."
+    assert history.tokens() <= 20
+    assert history.turns[-1] == (ASSISTANT, "Message 7 about cats and dogs")
+
+
+@pytest.mark.asyncio
+async def test_compact_within_budget_does_nothing():
+    #arrange
+    llm = MagicMock()
+    llm.ainvoke = AsyncMock()
+    manager = HistoryManager(llm, chat_budget=1000)
+    history = ConversationHistory()
+    history.add(USER, "Hello")
+
+    #act
+    await manager.compact(history)
+
+    #assert
+    llm.ainvoke.assert_not_awaited()
+    assert history.turns == [(USER, "Hello")]
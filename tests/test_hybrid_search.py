@@ -0,0 +1,73 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from src.ba_ragmas_chatbot.bm25 import InvertedIndex, bm25_scores, tokenize
+from src.ba_ragmas_chatbot.embedding_store import StoredSource
+from src.ba_ragmas_chatbot.ingestion import IngestionPipeline
+from src.ba_ragmas_chatbot.tools.hybrid_search_tool import HybridSearchTool
+
+
+def stored_source(name, chunks, vectors):
+    return StoredSource(name, name, chunks, np.asarray(vectors, dtype=np.float32))
+
+
+def test_bm25_combines_the_statistics_of_all_indexes():
+    #arrange
+    cats = InvertedIndex(["Cats sleep a lot.", "Cats purr."])
+    dogs = InvertedIndex(["Dogs bark at the mailman.", "Dogs and cats play."])
+
+    #act
+    scores = bm25_scores("Why do dogs bark?", [cats, dogs])
+
+    #assert
+    assert tokenize("Dogs, BARK!") == ["dogs", "bark"]
+    assert len(scores) == 4
+    assert scores[0] == scores[1] == 0
+    assert scores[2] > scores[3] > 0
+
+
+def test_search_fuses_keyword_and_embedding_rankings():
+    #arrange
+    pipeline = MagicMock(spec=IngestionPipeline)
+    pipeline.embed.return_value = [[1.0, 0.0]]
+    manual = stored_source("manual.pdf", ["The error code E42 means the filter is blocked.", "Clean the machine weekly."], [[0.0, 1.0], [0.6, 0.8]])
+    blog = stored_source("https://example.com", ["Coffee machines need regular care.", "Descaling keeps the taste fresh."], [[1.0, 0.0], [0.9, 0.1]])
+    tool = HybridSearchTool(sources=[manual, blog], pipeline=pipeline, limit=2)
+
+    #act
+    results = tool.search("What does E42 mean?")
+    text = tool._run("What does E42 mean?")
+
+    #assert
+    pipeline.embed.assert_called_with(["What does E42 mean?"])
+    # last in the embedding ranking but first in the keyword ranking, which beats being first in only one of them
+    assert results == [("manual.pdf", "The error code E42 means the filter is blocked."), ("https://example.com", "Coffee machines need regular care.")]
+    assert text.startswith("Source: manual.pdf\nThe error code E42 means the filter is blocked.\n\nSource: https://example.com")
+
+
+def test_search_labels_passages_with_the_names_of_the_chat():
+    #arrange
+    pipeline = MagicMock(spec=IngestionPipeline)
+    pipeline.embed.return_value = [[1.0, 0.0]]
+    upload = StoredSource("key", "./db/documents/0123abcd.pdf", ["Cats sleep a lot."], np.ones((1, 2), dtype=np.float32))
+    tool = HybridSearchTool(sources=[upload], names={"key": "cats.pdf"}, pipeline=pipeline)
+
+    #act
+    text = tool._run("Do cats sleep?")
+
+    #assert
+    assert text == "Source: cats.pdf\nCats sleep a lot."
+
+
+def test_search_without_sources_returns_nothing():
+    #arrange
+    pipeline = MagicMock(spec=IngestionPipeline)
+    tool = HybridSearchTool(sources=[stored_source("empty.txt", [], np.zeros((0, 2)))], pipeline=pipeline)
+
+    #act
+    results = tool.search("Anything?")
+
+    #assert
+    assert results == []
+    pipeline.embed.assert_not_called()
@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from unittest.mock import MagicMock, patch
+
+from crewai import LLM
+
+from src.ba_ragmas_chatbot.generation_executor import CancelToken, JobCancelled
+from src.ba_ragmas_chatbot.llm_pool import CancellableStream, LLMPool
+
+
+def test_agents_share_llm_per_model_and_url():
+    #arrange
+    pool = LLMPool("ollama/llama3.1", "http://localhost:11434", overrides={"writer": ("ollama/llama3.2", None)})
+
+    #act
+    researcher = pool.for_agent("researcher")
+    editor = pool.for_agent("editor")
+    writer = pool.for_agent("writer")
+
+    #assert
+    assert researcher is editor
+    assert writer is not researcher
+    assert writer.model == "ollama/llama3.2"
+    assert writer.base_url == "http://localhost:11434"
+    assert writer.additional_params["client"] is researcher.additional_params["client"]
+    pool.close()
+
+
+def test_requests_in_flight_are_limited_per_backend():
+    #arrange
+    pool = LLMPool("ollama/llama3.1", "http://localhost:11434", max_in_flight=2)
+    llms = [pool.get("ollama/llama3.1", "http://localhost:11434"), pool.get("ollama/llama3.2", "http://localhost:11434")]
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def fake_call(self, *args, **kwargs):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return "answer"
+
+    #act
+    with patch.object(LLM, "call", fake_call):
+        threads = [threading.Thread(target=llms[i % 2].call, args=("hi",)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    #assert
+    assert peak == 2
+    pool.close()
+
+
+def test_cancelled_job_aborts_streamed_response():
+    #arrange
+    token = CancelToken()
+    source = MagicMock()
+    source.__iter__.return_value = iter([b"tok1", b"tok2", b"tok3"])
+    stream = CancellableStream(source, token)
+    received = []
+
+    #act & assert
+    with pytest.raises(JobCancelled):
+        for chunk in stream:
+            received.append(chunk)
+            token.cancel()
+    assert received == [b"tok1"]
+    source.close.assert_called_once()
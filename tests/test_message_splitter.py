@@ -0,0 +1,74 @@
+from telegram.constants import ParseMode
+
+from src.ba_ragmas_chatbot.message_splitter import split_message
+
+
+def test_split_prefers_paragraphs_then_sentences():
+    #arrange
+    text = "First paragraph.\n\nSecond paragraph is longer. It has two sentences."
+
+    #act
+    chunks = split_message(text, limit=40)
+
+    #assert
+    assert chunks == ["First paragraph.", "Second paragraph is longer.", "It has two sentences."]
+
+
+def test_split_cuts_long_words_and_respects_limit():
+    #arrange
+    text = "x" * 25
+
+    #act
+    chunks = split_message(text, limit=10)
+
+    #assert
+    assert chunks == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_split_reopens_html_tags():
+    #arrange
+    text = '<b>bold words <a href="https://example.com/a b">link</a> and more bold words</b>'
+
+    #act
+    chunks = split_message(text, limit=50, parse_mode=ParseMode.HTML)
+
+    #assert
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert all(chunk.startswith("<b>") and chunk.endswith("</b>") for chunk in chunks)
+    assert '<a href="https://example.com/a b">link</a>' in "".join(chunks)
+
+
+def test_split_reopens_markdown_code_blocks():
+    #arrange
+    text = "```\n" + "print(1)\n" * 10 + "```"
+
+    #act
+    chunks = split_message(text, limit=40, parse_mode=ParseMode.MARKDOWN)
+
+    #assert
+    assert len(chunks) > 1
+    assert all(chunk.startswith("```") and chunk.endswith("```") for chunk in chunks)
+
+
+def test_split_cuts_html_text_with_bare_ampersands_and_brackets():
+    #arrange
+    text = "R&D teams. " + "Research helps. " * 300 + "If x < y, then y is larger. " * 100
+
+    #act
+    chunks = split_message(text, parse_mode=ParseMode.HTML)
+
+    #assert
+    assert len(chunks) == 2
+    assert all(3000 < len(chunk) <= 4096 for chunk in chunks)
+    assert chunks[0].startswith("R&D teams.")
+
+
+def test_split_keeps_html_entities_whole():
+    #arrange
+    text = "Tom &amp; Jerry"
+
+    #act
+    chunks = split_message(text, limit=10, parse_mode=ParseMode.HTML)
+
+    #assert
+    assert chunks == ["Tom &amp;", "Jerry"]
@@ -0,0 +1,47 @@
+from unittest.mock import MagicMock, AsyncMock
+
+import pytest
+from telegram import Message
+
+from src.ba_ragmas_chatbot.message_streamer import MessageStreamer
+
+
+async def tokens(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.asyncio
+async def test_stream_edits_single_message():
+    #arrange
+    sent_message = MagicMock(spec=Message)
+    sent_message.edit_text = AsyncMock()
+    mock_message = MagicMock(spec=Message)
+    mock_message.reply_text = AsyncMock(return_value=sent_message)
+    streamer = MessageStreamer(mock_message, edit_interval=60, edit_tokens=2)
+
+    #act
+    result = await streamer.stream(tokens("Dogs ", "are ", "great ", "pets."))
+
+    #assert
+    assert result == "Dogs are great pets."
+    mock_message.reply_text.assert_called_once_with("Dogs ", parse_mode=None)
+    sent_message.edit_text.assert_any_call("Dogs are great ", parse_mode=None)
+    sent_message.edit_text.assert_called_with("Dogs are great pets.", parse_mode="HTML")
+
+@pytest.mark.asyncio
+async def test_stream_splits_too_long_answers():
+    #arrange
+    sent_message = MagicMock(spec=Message)
+    sent_message.edit_text = AsyncMock()
+    mock_message = MagicMock(spec=Message)
+    mock_message.reply_text = AsyncMock(return_value=sent_message)
+    streamer = MessageStreamer(mock_message, edit_interval=60, edit_tokens=100)
+
+    #act
+    result = await streamer.stream(tokens("a" * 4000, "b" * 200))
+
+    #assert
+    assert len(result) == 4200
+    assert mock_message.reply_text.call_count == 2
+    mock_message.reply_text.assert_called_with("b" * 104, parse_mode="HTML")
@@ -0,0 +1,152 @@
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from telegram import Chat, Message, Update, User
+from telegram.ext import Application, CommandHandler, ExtBot, MessageHandler, filters
+
+from src.ba_ragmas_chatbot.history import ConversationHistory
+from src.ba_ragmas_chatbot.persistence import SharedConversationHandler, SQLitePersistence
+
+
+@pytest.mark.asyncio
+async def test_data_survives_a_restart(tmp_path):
+    #arrange
+    path = str(tmp_path / "conversations.sqlite")
+    persistence = SQLitePersistence(path)
+    history = ConversationHistory(summary="Talked about cats")
+
+    #act
+    await persistence.update_user_data(1, {"topic": "Cats", "history": history})
+    await persistence.update_chat_data(2, {"article": 0})
+    await persistence.update_conversation("configuration", (2, 1), 5)
+    await persistence.update_conversation("configuration", (3, 1), 7)
+    await persistence.update_conversation("configuration", (3, 1), None)
+    await persistence.flush()
+    restarted = SQLitePersistence(path)
+
+    #assert
+    user_data = await restarted.get_user_data()
+    assert user_data[1]["topic"] == "Cats"
+    assert user_data[1]["history"] == history
+    assert await restarted.get_chat_data() == {2: {"article": 0}}
+    assert await restarted.get_conversations("configuration") == {(2, 1): 5}
+    await restarted.flush()
+
+
+@pytest.mark.asyncio
+async def test_changes_are_written_behind_in_one_batch(tmp_path):
+    #arrange
+    persistence = SQLitePersistence(str(tmp_path / "conversations.sqlite"))
+
+    #act
+    with patch.object(persistence, "_write", wraps=persistence._write) as write:
+        await persistence.update_user_data(1, {"topic": "Cats"})
+        await persistence.update_user_data(2, {"topic": "Dogs"})
+        await persistence.drop_chat_data(3)
+        written_before = write.call_count
+        await persistence._writer
+
+    #assert
+    assert written_before == 0
+    write.assert_called_once()
+    assert len(write.call_args.args[0]) == 3
+    await persistence.flush()
+
+
+@pytest.mark.asyncio
+async def test_shared_persistence_refreshes_changes_of_other_processes(tmp_path):
+    #arrange
+    path = str(tmp_path / "conversations.sqlite")
+    first = SQLitePersistence(path, shared=True)
+    second = SQLitePersistence(path, shared=True)
+    user_data = {"topic": "Cats"}
+    await first.update_user_data(1, user_data)
+    await first._writer
+    await second.refresh_user_data(1, user_data)
+
+    #act
+    await second.update_user_data(1, {"topic": "Dogs"})
+    await second._writer
+    await first.refresh_user_data(1, user_data)
+    await first.update_conversation("configuration", (1, 1), 4)
+    await first._writer
+    changed, state = second.conversation_state("configuration", (1, 1))
+    unchanged, _ = second.conversation_state("configuration", (1, 1))
+
+    #assert
+    assert user_data == {"topic": "Dogs"}
+    assert changed and state == 4
+    assert not unchanged
+    await first.flush()
+    await second.flush()
+
+
+@pytest.mark.asyncio
+async def test_refresh_is_skipped_when_not_shared(tmp_path):
+    #arrange
+    path = str(tmp_path / "conversations.sqlite")
+    first = SQLitePersistence(path)
+    second = SQLitePersistence(path)
+    await first.update_user_data(1, {"topic": "Dogs"})
+    await first.flush()
+    user_data = {"topic": "Cats"}
+
+    #act
+    await second.refresh_user_data(1, user_data)
+
+    #assert
+    assert user_data == {"topic": "Cats"}
+    await second.flush()
+
+
+def text_update(update_id, text):
+    chat = Chat(1, Chat.PRIVATE)
+    user = User(1, "Anna", False)
+    return Update(update_id, message=Message(update_id, datetime.now(), chat, from_user=user, text=text))
+
+
+async def conversation(persistence):
+    """A persistent conversation handler in its own application, like in every bot process."""
+    async def callback(update, context):
+        return None
+
+    handler = SharedConversationHandler(
+        entry_points=[CommandHandler("start", callback)],
+        states={1: [MessageHandler(filters.Regex("^topic$"), callback)], 2: [MessageHandler(filters.Regex("^cats$"), callback)]},
+        fallbacks=[],
+        name="configuration",
+        persistent=True,
+        store=persistence,
+    )
+    application = Application.builder().token("123:ABC").persistence(persistence).build()
+    application.add_handler(handler)
+    with patch.object(ExtBot, "initialize", AsyncMock()):
+        await application.initialize()
+    return application, handler
+
+
+@pytest.mark.asyncio
+async def test_shared_handlers_take_over_the_state_of_other_processes(tmp_path):
+    #arrange
+    path = str(tmp_path / "conversations.sqlite")
+    first = SQLitePersistence(path, shared=True)
+    second = SQLitePersistence(path, shared=True)
+    await first.update_conversation("configuration", (1, 1), 1)
+    await first._writer
+    first_application, _ = await conversation(first)
+    second_application, second_handler = await conversation(second)
+    await first.update_conversation("configuration", (1, 1), 2)
+    await first._writer
+
+    #act
+    before = second_handler.check_update(text_update(2, "cats"))
+    await second_handler.refresh(text_update(2, "cats"))
+    after = second_handler.check_update(text_update(2, "cats"))
+
+    #assert
+    assert before is None
+    assert after is not None and after[2] is second_handler.states[2][0]
+    with patch.object(ExtBot, "shutdown", AsyncMock()):
+        await first_application.shutdown()
+        await second_application.shutdown()
@@ -0,0 +1,67 @@
+import pytest
+
+from unittest.mock import MagicMock
+
+from src.ba_ragmas_chatbot.response_cache import ResponseCache
+
+
+def fake_embedder():
+    vectors = {"what is rag": [1.0, 0.0], "what's rag": [0.99, 0.05], "who wrote faust": [0.0, 1.0]}
+    embedder = MagicMock()
+    embedder.embed.side_effect = lambda model, input: {"embeddings": [vectors[input[0]]]}
+    return embedder
+
+
+@pytest.mark.asyncio
+async def test_exact_tier_ignores_case_and_punctuation():
+    #arrange
+    cache = ResponseCache()
+    await cache.set("", "What is RAG?", "Retrieval-Augmented Generation.")
+
+    #act
+    response = await cache.get("", "  what is  rag")
+    other_context = await cache.get("User: Hello", "What is RAG?")
+
+    #assert
+    assert response == "Retrieval-Augmented Generation."
+    assert other_context is None
+    assert cache.stats()["exact_hits"] == 1
+    assert cache.stats()["exact_misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_semantic_tier_answers_similar_messages():
+    #arrange
+    embedder = fake_embedder()
+    cache = ResponseCache(embedder=embedder, model="mxbai-embed-large", similarity_threshold=0.9)
+    await cache.set("", "What is RAG?", "Retrieval-Augmented Generation.")
+
+    #act
+    similar = await cache.get("", "What's RAG?")
+    different = await cache.get("", "Who wrote Faust?")
+
+    #assert
+    assert similar == "Retrieval-Augmented Generation."
+    assert different is None
+    assert cache.semantic_hits == 1
+    assert cache.semantic_misses == 1
+    assert embedder.embed.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_semantic_tier_skips_contexts_without_entries():
+    #arrange
+    embedder = fake_embedder()
+    cache = ResponseCache(embedder=embedder, model="mxbai-embed-large", max_entries=1, similarity_threshold=0.9)
+    await cache.set("User: Hello", "Who wrote Faust?", "Goethe.")
+    await cache.set("", "What is RAG?", "Retrieval-Augmented Generation.")
+
+    #act
+    other_context = await cache.get("User: Hi", "What's RAG?")
+    evicted = await cache.get("User: Hello", "Who wrote Faust")
+
+    #assert
+    assert other_context is None
+    assert evicted is None
+    assert cache.semantic_misses == 2
+    assert embedder.embed.call_count == 2
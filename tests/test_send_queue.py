@@ -0,0 +1,82 @@
+import asyncio
+import datetime
+
+import pytest
+
+from unittest.mock import AsyncMock, MagicMock, call
+
+from telegram import Message
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, RetryAfter
+
+from src.ba_ragmas_chatbot.send_queue import SendQueue, TokenBucket
+
+
+def mock_message(side_effect=None):
+    message = MagicMock(spec=Message)
+    message.chat_id = 1
+    message.reply_text = AsyncMock(side_effect=side_effect, return_value="sent")
+    return message
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    #arrange
+    bucket = TokenBucket(rate=20, capacity=2)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    #act
+    for _ in range(4):
+        await bucket.acquire()
+
+    #assert
+    assert loop.time() - start >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_reply_splits_long_text_in_order_and_falls_back_to_plain_text():
+    #arrange
+    message = mock_message(side_effect=[BadRequest("Can't parse entities"), "sent", "sent"])
+    queue = SendQueue(chat_rate=100, chat_burst=10)
+    text = "a" * 4000 + "\n\n" + "b" * 100
+
+    #act
+    sent = await queue.reply(message, text, ParseMode.HTML)
+
+    #assert
+    assert sent == ["sent", "sent"]
+    assert message.reply_text.call_args_list == [
+        call("a" * 4000, parse_mode=ParseMode.HTML),
+        call("a" * 4000),
+        call("b" * 100, parse_mode=ParseMode.HTML),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_queued_replies_to_same_chat_are_coalesced():
+    #arrange
+    message = mock_message()
+    queue = SendQueue(chat_rate=100, chat_burst=1)
+
+    #act
+    results = await asyncio.gather(queue.send(message, "first"), queue.send(message, "second"), queue.send(message, "third"))
+
+    #assert
+    assert results == ["sent", "sent", "sent"]
+    assert message.reply_text.call_args_list == [call("first\n\nsecond\n\nthird")]
+    assert queue.coalesced == 2
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_retried():
+    #arrange
+    message = mock_message(side_effect=[RetryAfter(datetime.timedelta(seconds=0.05)), "sent"])
+    queue = SendQueue(chat_rate=100, chat_burst=1)
+
+    #act
+    result = await queue.send(message, "Hello")
+
+    #assert
+    assert result == "sent"
+    assert message.reply_text.await_count == 2
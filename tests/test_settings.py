@@ -0,0 +1,65 @@
+import pytest
+import yaml
+
+from src.ba_ragmas_chatbot import settings as settings_module
+from src.ba_ragmas_chatbot.settings import CONFIG_FILE, SettingsError, get_settings, load_settings, reload_settings
+
+
+def write_config(tmp_path, config):
+    path = tmp_path / "configs.yaml"
+    path.write_text(yaml.safe_dump(config))
+    return str(path)
+
+
+def read_config():
+    with open(CONFIG_FILE, "r") as file:
+        return yaml.safe_load(file)
+
+
+def test_load_settings_parses_config():
+    #act
+    settings = load_settings()
+
+    #assert
+    assert settings.chatbot.llm.name == read_config()["chatbot"]["llm"]["name"]
+    assert isinstance(settings.ingestion.progress_interval, float)
+    assert settings.fact_check.search.cache.path is None
+
+
+def test_load_settings_missing_setting(tmp_path):
+    #arrange
+    config = read_config()
+    del config["generation"]["max_workers"]
+
+    #act & assert
+    with pytest.raises(SettingsError, match="generation.max_workers"):
+        load_settings(write_config(tmp_path, config))
+
+
+def test_load_settings_wrong_type(tmp_path):
+    #arrange
+    config = read_config()
+    config["ingestion"]["batch_size"] = "many"
+
+    #act & assert
+    with pytest.raises(SettingsError, match="ingestion.batch_size"):
+        load_settings(write_config(tmp_path, config))
+
+
+def test_get_settings_is_cached(monkeypatch, tmp_path):
+    #arrange
+    config = read_config()
+    path = write_config(tmp_path, config)
+    monkeypatch.setattr(settings_module, "load_settings", lambda: load_settings(path))
+    monkeypatch.setattr(settings_module, "_settings", None)
+
+    #act
+    first = get_settings()
+    config["generation"]["max_workers"] = 7
+    write_config(tmp_path, config)
+    second = get_settings()
+    reloaded = reload_settings()
+
+    #assert
+    assert first is second
+    assert reloaded.generation.max_workers == 7
@@ -0,0 +1,131 @@
+import threading
+
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from src.ba_ragmas_chatbot.embedding_store import EmbeddingStore, StoredSource
+from src.ba_ragmas_chatbot.ingestion import IngestionPipeline
+from src.ba_ragmas_chatbot.source_catalog import SourceCatalog
+from src.ba_ragmas_chatbot.tools.store_adapter import StoreAdapter
+
+
+def stored_source(name="cats.txt"):
+    return StoredSource(name, name, ["Cats sleep a lot."], np.ones((1, 2), dtype=np.float32))
+
+
+def test_source_is_loaded_once_and_released_with_the_last_chat():
+    #arrange
+    catalog = SourceCatalog()
+    load = MagicMock(return_value=stored_source())
+
+    #act
+    first = catalog.acquire("sha256:cats", 1, load)
+    second = catalog.acquire("sha256:cats", 2, load)
+    catalog.acquire("sha256:cats", 2, load)
+    dropped_first = catalog.release(1)
+    references = catalog.references("sha256:cats")
+    dropped_second = catalog.release(2)
+
+    #assert
+    load.assert_called_once()
+    assert first is second
+    assert catalog.shared == 2
+    assert dropped_first == []
+    assert references == {2: 2}
+    assert dropped_second == ["sha256:cats"]
+    assert len(catalog) == 0
+
+
+def test_chats_wait_for_a_source_that_is_being_loaded():
+    #arrange
+    catalog = SourceCatalog()
+    loading = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def load():
+        loading.set()
+        release.wait(5)
+        return stored_source()
+
+    loader = threading.Thread(target=lambda: results.append(catalog.acquire("sha256:cats", 1, load)))
+    loader.start()
+    loading.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(catalog.acquire("sha256:cats", 2, MagicMock())))
+
+    #act
+    waiter.start()
+    release.set()
+    loader.join(5)
+    waiter.join(5)
+
+    #assert
+    assert len(results) == 2
+    assert results[0] is results[1]
+    assert catalog.references("sha256:cats") == {1: 1, 2: 1}
+
+
+def test_failed_load_is_not_kept():
+    #arrange
+    catalog = SourceCatalog()
+    load = MagicMock(side_effect=[ValueError("Broken PDF"), stored_source()])
+
+    #act
+    with pytest.raises(ValueError):
+        catalog.acquire("sha256:cats", 1, load)
+    stored = catalog.acquire("sha256:cats", 1, load)
+
+    #assert
+    assert stored.source == "cats.txt"
+    assert catalog.references("sha256:cats") == {1: 1}
+
+
+def test_adapters_of_different_chats_share_a_document(tmp_path):
+    #arrange
+    document = tmp_path / "dogs.txt"
+    document.write_text("Dogs are loyal animals.")
+    copy = tmp_path / "copy of dogs.txt"
+    copy.write_text("Dogs are loyal animals.")
+    store = EmbeddingStore(str(tmp_path / "db"), "ollama/mxbai-embed-large", chunk_size=100, chunk_overlap=10)
+    client = MagicMock()
+    client.embed.return_value = {"embeddings": [[1.0, 0.0]]}
+    pipeline = IngestionPipeline(client, "mxbai-embed-large")
+    catalog = SourceCatalog()
+    first = StoreAdapter(store=store, pipeline=pipeline, catalog=catalog, chat_id=1)
+    second = StoreAdapter(store=store, pipeline=pipeline, catalog=catalog, chat_id=2)
+
+    #act
+    first.add(str(document), data_type="text_file")
+    second.add(str(copy), data_type="text_file")
+
+    #assert
+    client.embed.assert_called_once()
+    assert first.sources[0] is second.sources[0]
+    assert len(catalog) == 1
+
+
+def test_released_adapter_drops_only_its_own_references(tmp_path):
+    #arrange
+    document = tmp_path / "dogs.txt"
+    document.write_text("Dogs are loyal animals.")
+    store = EmbeddingStore(str(tmp_path / "db"), "ollama/mxbai-embed-large", chunk_size=100, chunk_overlap=10)
+    client = MagicMock()
+    client.embed.return_value = {"embeddings": [[1.0, 0.0]]}
+    pipeline = IngestionPipeline(client, "mxbai-embed-large")
+    catalog = SourceCatalog()
+    kept = StoreAdapter(store=store, pipeline=pipeline, catalog=catalog, chat_id=1)
+    cancelled = StoreAdapter(store=store, pipeline=pipeline, catalog=catalog, chat_id=1)
+    kept.add(str(document), data_type="text_file")
+    cancelled.add(str(document), data_type="text_file")
+    key = cancelled.keys[0]
+
+    #act
+    cancelled.release()
+    references = catalog.references(key)
+    kept.release()
+
+    #assert
+    assert references == {1: 1}
+    assert len(catalog) == 0
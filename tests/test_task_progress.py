@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from unittest.mock import AsyncMock, MagicMock
+
+from telegram import Message
+
+from src.ba_ragmas_chatbot.send_queue import SendQueue
+from src.ba_ragmas_chatbot.task_progress import TaskProgress
+
+
+@pytest.mark.asyncio
+async def test_task_progress_sends_outline_from_worker_thread():
+    #arrange
+    message = MagicMock(spec=Message)
+    message.reply_text = AsyncMock()
+    progress = TaskProgress(message, asyncio.get_running_loop(), SendQueue(chat_rate=100))
+
+    #act
+    await asyncio.to_thread(progress, "research_task", "10 facts")
+    await asyncio.to_thread(progress, "editor_task", "1. Introduction")
+    await asyncio.to_thread(progress, "proofreader_task", "The article")
+
+    #assert
+    texts = [call.args[0] for call in message.reply_text.call_args_list]
+    assert len(texts) == 2
+    assert texts[0].startswith("Research done")
+    assert "10 facts" not in texts[0]
+    assert texts[1].endswith("Here is the outline:\n\n1. Introduction")
@@ -0,0 +1,72 @@
+from src.ba_ragmas_chatbot.tool_registry import ToolRegistry
+
+
+def test_tools_are_kept_per_chat():
+    #arrange
+    registry = ToolRegistry()
+
+    #act
+    registry.add(1, "pdf_tool", size=10)
+    registry.add(2, "website_tool")
+    registry.clear(2)
+
+    #assert
+    assert registry.get(1) == ["pdf_tool"]
+    assert registry.get(2) == []
+    assert registry.memory_usage() == 10
+
+def test_idle_chats_are_evicted():
+    #arrange
+    registry = ToolRegistry(idle_timeout=0)
+    registry.add(1, "pdf_tool")
+
+    #act
+    evicted = registry.evict_idle()
+
+    #assert
+    assert evicted == [1]
+    assert registry.get(1) == []
+
+def test_least_recently_used_chat_is_evicted_over_memory_limit():
+    #arrange
+    registry = ToolRegistry(max_memory_mb=1)
+    registry.add(1, "old_tool", size=600 * 1024)
+    registry.add(2, "new_tool", size=600 * 1024)
+
+    #act
+    registry.add(2, "another_tool", size=10)
+
+    #assert
+    assert registry.get(1) == []
+    assert registry.get(2) == ["new_tool", "another_tool"]
+
+def test_removed_chats_are_reported():
+    #arrange
+    removed = []
+    registry = ToolRegistry(on_remove=removed.append)
+    registry.add(1, "pdf_tool")
+    registry.add(2, "website_tool")
+
+    #act
+    registry.clear(2)
+    registry.idle_timeout = 0
+    registry.evict_idle()
+
+    #assert
+    assert removed == [2, 1]
+
+def test_evicted_sources_are_reported_once():
+    #arrange
+    registry = ToolRegistry(idle_timeout=0)
+    registry.add(1, "pdf_tool", name="cats.pdf")
+    registry.add(1, "website_tool", name="dogs.com")
+    registry.evict_idle()
+    registry.idle_timeout = 3600
+
+    #act
+    registry.add(1, "website_tool", name="dogs.com")
+    evicted = registry.evicted(1)
+
+    #assert
+    assert evicted == ["cats.pdf"]
+    assert registry.evicted(1) == []
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from unittest.mock import MagicMock
+
+from telegram import Update
+
+from src.ba_ragmas_chatbot.update_processor import ChatUpdateProcessor
+
+
+def chat_update(chat_id):
+    update = MagicMock(spec=Update)
+    update.effective_chat.id = chat_id
+    return update
+
+
+@pytest.mark.asyncio
+async def test_waiting_updates_of_a_busy_chat_do_not_take_the_slots_of_other_chats():
+    #arrange
+    processor = ChatUpdateProcessor(max_concurrent_updates=2)
+    reply_delivered = asyncio.Event()
+    processed = []
+
+    async def handle(chat_id, number, wait=False):
+        if wait:
+            # e.g. a reply that waits for the rate limit of its chat
+            await reply_delivered.wait()
+        processed.append((chat_id, number))
+
+    busy = [asyncio.create_task(processor.process_update(chat_update(1), handle(1, 1, wait=True)))]
+    busy += [asyncio.create_task(processor.process_update(chat_update(1), handle(1, number))) for number in (2, 3, 4)]
+    await asyncio.sleep(0.01)
+
+    #act
+    await asyncio.wait_for(processor.process_update(chat_update(2), handle(2, 1)), timeout=5)
+    reply_delivered.set()
+    await asyncio.gather(*busy)
+
+    #assert
+    assert processed == [(2, 1), (1, 1), (1, 2), (1, 3), (1, 4)]
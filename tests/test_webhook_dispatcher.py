@@ -0,0 +1,58 @@
+import queue
+
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, PropertyMock, patch
+
+import pytest
+from telegram import Chat, Message, Update, User
+from telegram.ext import Application, ExtBot, MessageHandler, filters
+
+from src.ba_ragmas_chatbot.chatbot import TelegramBot
+from src.ba_ragmas_chatbot.webhook_dispatcher import WebhookDispatcher
+
+
+def text_update(update_id, chat_id, text):
+    chat = Chat(chat_id, Chat.PRIVATE)
+    user = User(chat_id, "Anna", False)
+    return Update(update_id, message=Message(update_id, datetime.now(), chat, from_user=user, text=text))
+
+
+@pytest.mark.asyncio
+async def test_updates_of_a_chat_are_forwarded_to_the_same_worker():
+    #arrange
+    queues = [MagicMock(), MagicMock(), MagicMock()]
+    dispatcher = WebhookDispatcher("123:ABC", queues)
+
+    #act
+    for update_id, chat_id in enumerate([4, 5, 4, 7]):
+        await dispatcher.forward(text_update(update_id, chat_id, "cats"), MagicMock())
+
+    #assert
+    assert [call.args[0]["message"]["chat"]["id"] for call in queues[1].put.call_args_list] == [4, 4, 7]
+    assert [call.args[0]["message"]["chat"]["id"] for call in queues[2].put.call_args_list] == [5]
+    queues[0].put.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_worker_processes_the_forwarded_updates_until_it_is_stopped():
+    #arrange
+    received = []
+
+    async def callback(update, context):
+        received.append(update.message.text)
+
+    application = Application.builder().token("123:ABC").build()
+    application.add_handler(MessageHandler(filters.TEXT, callback))
+    updates = queue.Queue()
+    dispatcher = WebhookDispatcher("123:ABC", [updates])
+    await dispatcher.forward(text_update(1, 4, "cats"), MagicMock())
+    await dispatcher.forward(text_update(2, 4, "dogs"), MagicMock())
+    updates.put(None)
+
+    #act
+    with patch.object(ExtBot, "initialize", AsyncMock()), patch.object(ExtBot, "shutdown", AsyncMock()), \
+            patch.object(ExtBot, "id", PropertyMock(return_value=123)):
+        await TelegramBot().serve(application, updates)
+
+    #assert
+    assert received == ["cats", "dogs"]